@@ -0,0 +1,231 @@
+# Animated floors: atlas frames re-composited cell by cell, encoded as APNG, GIF or WebP deltas
+import io
+import time
+import numpy as np
+import matplotlib.colors as mcolors
+from PIL import Image
+from PIL.PngImagePlugin import Blend, Disposal
+
+from . import atlas
+
+# Animation codecs and their extensions, 'PNG' is an APNG
+FORMATS = {'PNG': '.png', 'GIF': '.gif', 'WEBP': '.webp'}
+
+class FrameCompositor:
+    '''
+    One atlas canvas (see `atlas.composite_heatmap`) kept across the frames of an animation.
+
+        compositor = FrameCompositor(figsize, dpi)
+        for shift in range(len(glyphs)):
+            frames.append(compositor.frame(array, glyphs, shift, cmap).copy())
+
+    A frame only re-composites the cells whose value, glyph mask or colors differ from the
+    previous frame, and redraws the label strip when the labels change, so its cost follows
+    what changed. Every frame is identical to `composite_heatmap` of the same arguments.
+
+    `frame` returns the canvas itself, which the next frame draws over.
+    '''
+
+    def __init__(self, figsize=(16, 16), dpi=300):
+
+        self.figsize = figsize
+        self.dpi = dpi
+
+        self.canvas:np.ndarray = None
+        self._grid:np.ndarray = None   # the canvas' grid as (rows, c, cols, c, 3)
+        self._strip:np.ndarray = None  # the canvas' grid and label strip
+        self._atlas:atlas.GlyphAtlas = None
+        self._values:np.ndarray = None # per cell value of the last frame
+        self._masks:np.ndarray = None  # per cell mask id of the last frame
+        self._ramps:dict = {}          # value -> its (256, 3) palette ramp in the last frame
+        self._labels = None
+
+        self.counters = {'frames': 0, 'cells': 0, 'composited': 0, 'labels': 0}
+
+        pass
+
+    def __repr__(self):
+        return f"FrameCompositor({self.counters['frames']} frames, {self.counters['composited']}/{self.counters['cells']} cells composited)"
+
+    def _allocate(self, shape, cell_px:int, labels:bool):
+        rows, cols = shape
+        grid_h, grid_w = rows * cell_px, cols * cell_px
+        strip = (int(round(12 * self.dpi / 72 * 1.6)) if labels else 0)
+        pad = int(round(atlas.PAD_INCHES * self.dpi))
+        # same layout as composite_heatmap: white, padded, the strip below the grid
+        self.canvas = np.full((grid_h + strip + 2 * pad, grid_w + 2 * pad, 3), 255, dtype=np.uint8)
+        self._strip = self.canvas[pad:pad + grid_h + strip, pad:pad + grid_w]
+        # splitting the axes of a slice is always a view, writes land on the canvas
+        self._grid = self.canvas[pad:pad + grid_h, pad:pad + grid_w].reshape(rows, cell_px, cols, cell_px, 3)
+
+    def frame(
+            self,
+            array,
+            glyphs,
+            shift:int,
+            cmap,
+            norm=None,
+            font_path=None,
+            fontsz:int=16,
+            symbol_invert_color=False,
+            symbol_semi_transparent=False,
+            labels=()
+        ) -> np.ndarray:
+        '''Draw the next frame (arguments as `atlas.composite_heatmap`) and return the canvas.'''
+        norm = (norm if norm else mcolors.Normalize(vmin=0, vmax=9))
+        array = np.asarray(array)
+        cell_px = atlas.cell_size_px(array.shape, self.figsize, self.dpi)
+        glyph_atlas = atlas.get_atlas(glyphs, font_path, fontsz, cell_px, self.dpi)
+        labels = tuple(labels)
+
+        if self.canvas is None:
+            self._allocate(array.shape, cell_px, bool(labels))
+        elif array.shape != self._values.shape or bool(labels) != bool(self._labels):
+            raise ValueError('Every frame of an animation needs the same grid, with or without labels')
+
+        alpha = 0.7 if symbol_semi_transparent else 1.0
+        values, inverse = np.unique(array, return_inverse=True)
+        inverse = inverse.reshape(array.shape)
+        palette = atlas.layer_palette(values, cmap, norm, symbol_invert_color, alpha)
+        ramps = palette.reshape(len(values), 256, 3)
+        indices = (array + shift) % len(glyph_atlas)
+        masks = glyph_atlas.mask_ids[indices]
+
+        if self._atlas is not glyph_atlas:
+            changed = np.ones(array.shape, dtype=bool)
+        else:
+            # a cell keeps its pixels when its value, its glyph's mask and that value's colors stay
+            recolored = np.array([not np.array_equal(self._ramps.get(v), ramp) for v, ramp in zip(values.tolist(), ramps)])
+            changed = (array != self._values) | (masks != self._masks) | recolored[inverse]
+
+        r, q = np.nonzero(changed)
+        band = max(1, atlas.BAND_PIXELS // (cell_px * cell_px))
+        for k0 in range(0, len(r), band):
+            rk, qk = r[k0:k0 + band], q[k0:k0 + band]
+            # the same lookup as composite_heatmap: value index << 8 | coverage into the palette
+            lookup = (inverse[rk, qk].astype(np.intp) << 8)[:, None, None] | glyph_atlas.masks[indices[rk, qk]]
+            self._grid[rk, :, qk] = np.take(palette, lookup, axis=0)
+
+        if labels != self._labels:
+            grid_h = self._grid.shape[0] * cell_px
+            self._strip[grid_h:] = 255
+            for text, x_frac in labels:
+                atlas.draw_label(self._strip, text, x_frac, grid_h + (len(self._strip) - grid_h) // 6, dpi=self.dpi)
+            self.counters['labels'] += 1
+
+        self._atlas = glyph_atlas
+        self._values = array.copy()
+        self._masks = masks
+        self._ramps = dict(zip(values.tolist(), ramps))
+        self._labels = labels
+
+        self.counters['frames'] += 1
+        self.counters['cells'] += array.size
+        self.counters['composited'] += len(r)
+        return self.canvas
+
+    def stats(self) -> dict[str, int|float]:
+        return {
+            **self.counters,
+            'composited_ratio': (self.counters['composited'] / self.counters['cells'] if self.counters['cells'] else 0.0),
+        }
+
+def _delta_frames(frames) -> list[Image.Image]:
+    '''
+    RGBA frames for an APNG blended over the previous one: the first frame whole, then only
+    the pixels that changed, everything else transparent (and zero, which deflates to nothing).
+    '''
+    images = [Image.fromarray(frames[0]).convert('RGBA')]
+    for previous, frame in zip(frames, frames[1:]):
+        changed = np.any(frame != previous, axis=-1)
+        delta = np.zeros(frame.shape[:2] + (4,), dtype=np.uint8)
+        delta[changed, :3] = frame[changed]
+        delta[changed, 3] = 255
+        images.append(Image.fromarray(delta, 'RGBA'))
+    return images
+
+def _paletted_frames(frames, colors:int=255) -> list[Image.Image]:
+    '''
+    'P' frames sharing one palette, quantized from a sample of every frame, so a pixel that
+    does not change keeps its index and the GIF encoder can leave it out. One entry stays
+    free for the encoder's transparency.
+    '''
+    step = max(1, min(frames[0].shape[:2]) // 256)
+    sample = Image.fromarray(np.concatenate([frame[::step, ::step] for frame in frames]))
+    palette = sample.quantize(colors, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+    return [Image.fromarray(frame).quantize(palette=palette, dither=Image.Dither.NONE) for frame in frames]
+
+def encode_frames(frames, format:str='PNG', duration:int=100, loop:int=0, quality:int=90, lossless:bool=False) -> tuple[bytes, dict]:
+    '''
+    Encode (H, W, 3) uint8 frames as an animation, `duration` ms per frame, `loop` 0 forever.
+
+    Frames are delta encoded, so the file grows with what changes between frames: an APNG
+    only stores the changed pixels of each frame (see `_delta_frames`), a GIF shares one
+    palette so the encoder makes unchanged pixels transparent, and WebP's encoder crops and
+    blends sub-frames itself (lossy WebP may store a sub-frame losslessly, much smaller for
+    a few changed glyphs). Frames are never scaled, render them at the size wanted.
+    '''
+    format = format.upper()
+    if format not in FORMATS:
+        raise ValueError(f'Unknown animation format {format}, expected one of {tuple(FORMATS)}')
+    start = time.perf_counter()
+
+    buffer = io.BytesIO()
+    if format == 'PNG':
+        images = _delta_frames(frames)
+        images[0].save(buffer, format='PNG', save_all=True, append_images=images[1:], duration=duration, loop=loop,
+                       disposal=Disposal.OP_NONE, blend=Blend.OP_OVER, default_image=False)
+    elif format == 'GIF':
+        images = _paletted_frames(frames)
+        images[0].save(buffer, format='GIF', save_all=True, append_images=images[1:], duration=duration, loop=loop,
+                       disposal=1, optimize=True)
+    else:
+        images = [Image.fromarray(frame) for frame in frames]
+        images[0].save(buffer, format='WEBP', save_all=True, append_images=images[1:], duration=duration, loop=loop,
+                       quality=quality, lossless=lossless, allow_mixed=(not lossless), method=4)
+    data = buffer.getvalue()
+
+    report = {
+        'format': format,
+        'frames': len(frames),
+        'width': frames[0].shape[1],
+        'height': frames[0].shape[0],
+        'bytes': len(data),
+        'encode_seconds': time.perf_counter() - start,
+    }
+    return (data, report)
+
+def describe(report:dict) -> str:
+    '''One line for logs.'''
+    return (f"{report['frames']} frames {report['width']}x{report['height']} {report['format']}, {report['bytes']} bytes, "
+            f"{report.get('composited_ratio', 1.0) * 100:.0f}% of cells composited, encoded in {report['encode_seconds'] * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    import os
+    import argparse
+    from . import grove, loaders, profiles
+    parser = argparse.ArgumentParser(description="Export a floor as an animation: its glyph shift cycling, or a sweep through seeds.")
+    parser.add_argument('--level', type=int, default=0, help='Floor level')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the floor whose glyph shift cycles')
+    parser.add_argument('--seeds', type=str, help='Sweep through seeds instead, a range like 100-131 or a comma separated list')
+    parser.add_argument('--format', type=str.upper, choices=tuple(FORMATS), help='Animation format (default: the profile\'s, else PNG)')
+    parser.add_argument('--profile', type=str, default='discord', help=f'Output profile sizing the frames, one of {tuple(profiles.PROFILES)}')
+    parser.add_argument('--cell-px', type=int, help='Pixels per cell instead of the profile\'s size')
+    parser.add_argument('--duration', type=int, help='Milliseconds per frame')
+    parser.add_argument('--out', type=str, help='Output path (default: output/<name>.shift|seeds.<ext>)')
+    args = parser.parse_args()
+
+    Gf = grove.GroveFloors()
+    assets = dict(saved_maps=loaders.SavedMaps().maps, saved_colors=loaders.SavedColors().maps, saved_glyphs=loaders.SavedGlyphs().maps)
+    options = dict(format=args.format, profile=args.profile, cell_px=args.cell_px, archive=(args.out is None), **({'duration': args.duration} if args.duration else {}))
+    if args.seeds:
+        first, _, last = args.seeds.partition('-')
+        seeds = (range(int(first), int(last) + 1) if last else [int(seed) for seed in args.seeds.split(',')])
+        _, buffer, report = grove.AnimateSeeds(Gf, args.level, seeds, **assets, **options)
+    else:
+        generated, buffer = grove.AnimateShift(Gf, args.level, args.seed, **assets, **options)
+        report = generated['output']
+    if args.out:
+        with open(args.out, 'wb') as file:
+            file.write(buffer.getvalue())
+    print(f"{args.out or os.path.join(Gf.path, 'output')}: {describe(report)}")
@@ -0,0 +1,318 @@
+# Glyph atlas compositor, a NumPy alternative to drawing every cell through ax.text
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import matplotlib.font_manager as fm
+import matplotlib.colors as mcolors
+from matplotlib.backends.backend_agg import get_hinting_flag
+from PIL import Image
+from . import fonts
+
+# matplotlib's default subplot box (left=0.125, right=0.9, bottom=0.11, top=0.88)
+AXES_FRACTION = (0.775, 0.77)
+# savefig(bbox_inches='tight') default pad_inches
+PAD_INCHES = 0.1
+# Pixels composited per band in composite_heatmap
+BAND_PIXELS = 1 << 22
+
+def cell_size_px(shape, figsize=(16, 16), dpi=300):
+    '''Pixel size of one heatmap cell, matching what `imshow` gives on a `figsize` figure.'''
+    rows, cols = shape
+    axes_w = figsize[0] * AXES_FRACTION[0] * dpi
+    axes_h = figsize[1] * AXES_FRACTION[1] * dpi
+    return max(1, int(round(min(axes_w / cols, axes_h / rows))))
+
+def rasterize_text(text, font_path=None, size=12, dpi=300):
+    '''Rasterize `text` once into an alpha mask (uint8, height x width).'''
+    font = fm.get_font(font_path if font_path else fm.findfont(fm.FontProperties()))
+    font.clear()
+    font.set_size(size, dpi)
+    font.set_text(text, 0.0, flags=get_hinting_flag())
+    font.draw_glyphs_to_bitmap(antialiased=True)
+    return np.asarray(font.get_image(), dtype=np.uint8)
+
+def place_centered(mask, height, width):
+    '''Center `mask` on a (height, width) tile, clipping whatever falls outside of it.'''
+    tile = np.zeros((height, width), dtype=np.uint8)
+    mh, mw = mask.shape
+    top, left = (height - mh) // 2, (width - mw) // 2
+    # source / destination windows after clipping
+    sy, sx = max(0, -top), max(0, -left)
+    dy, dx = max(0, top), max(0, left)
+    h, w = min(mh - sy, height - dy), min(mw - sx, width - dx)
+    if h > 0 and w > 0:
+        tile[dy:dy+h, dx:dx+w] = mask[sy:sy+h, sx:sx+w]
+    return tile
+
+class GlyphAtlas:
+    '''
+    Every glyph of a glyphtable rasterized once into a stack of alpha masks.
+
+    `masks[k]` is the (cell_px, cell_px) coverage of `glyphs[k]`, centered the same
+    way `ha='center', va='center'` places it on the matplotlib backend. `mask_ids[k]`
+    is the same number for glyphs that rasterize to the same mask (repeats, blanks).
+    '''
+
+    def __init__(self, glyphs, font_path=None, fontsz:int=16, cell_px:int=116, dpi:int=300):
+
+        self.glyphs = list(glyphs)
+        self.font_path = font_path
+        self.fontsz = fontsz
+        self.cell_px = cell_px
+        self.dpi = dpi
+
+        self.masks = np.stack([
+            place_centered(rasterize_text(glyph, fonts.FONTS.resolve(glyph, font_path), fontsz, dpi), cell_px, cell_px)
+            for glyph in self.glyphs
+        ])
+        self.mask_ids = np.unique(self.masks.reshape(len(self.glyphs), -1), axis=0, return_inverse=True)[1].reshape(-1)
+
+        pass
+
+    def __len__(self):
+        return len(self.glyphs)
+
+    def layer(self, indices):
+        '''Alpha coverage (float 0-1) of the whole grid for an array of glyph indices.'''
+        rows, cols = indices.shape
+        c = self.cell_px
+        # (rows, cols, c, c) -> (rows, c, cols, c) -> (rows*c, cols*c)
+        tiles = self.masks[indices].transpose(0, 2, 1, 3).reshape(rows * c, cols * c)
+        return tiles.astype(np.float32) / 255.0
+
+_ATLASES:dict[tuple, GlyphAtlas] = {}
+
+def get_atlas(glyphs, font_path=None, fontsz:int=16, cell_px:int=116, dpi:int=300) -> GlyphAtlas:
+    '''Returns the atlas for (glyphs, font, size, cell, dpi), rasterizing it on first use.'''
+    key = (''.join(glyphs), font_path, fontsz, cell_px, dpi)
+    if key not in _ATLASES:
+        _ATLASES[key] = GlyphAtlas(glyphs, font_path, fontsz, cell_px, dpi)
+    return _ATLASES[key]
+
+def upscale(cells, cell_px:int):
+    '''Nearest-neighbour upscale of a (rows, cols, ...) array to (rows*cell_px, cols*cell_px, ...).'''
+    return np.repeat(np.repeat(cells, cell_px, axis=0), cell_px, axis=1)
+
+class CompositeImage:
+    '''
+    A composited RGB image with the `savefig`/`close` surface `FromSeed` and
+    `bitstream.py` already use on the pyplot module.
+    '''
+
+    def __init__(self, array):
+        self.array = array
+
+    def to_pil(self):
+        return Image.fromarray(self.array)
+
+    def savefig(self, fname, format=None, dpi=None, **kwargs):
+        # bbox_inches/transparent etc. have no meaning here, the image is already tight
+        fmt = format if format else ('png' if hasattr(fname, 'write') else os.path.splitext(str(fname))[1][1:] or 'png')
+        self.to_pil().save(fname, format=fmt.upper(), dpi=((dpi, dpi) if dpi else (72, 72)))
+
+    def close(self, *args):
+        pass
+
+def draw_label(canvas, text, x_frac, top, color=(128, 128, 128), size=12, dpi=300):
+    '''Alpha-blend a gray label centered at `x_frac` of the canvas width, below row `top`.'''
+    mask = rasterize_text(text, None, size, dpi).astype(np.float32)[..., None] / 255.0
+    mh, mw = mask.shape[:2]
+    height, width = canvas.shape[:2]
+    left = int(x_frac * width) - mw // 2
+    sx, dx = max(0, -left), max(0, left)
+    w = min(mw - sx, width - dx)
+    h = min(mh, height - top)
+    if w <= 0 or h <= 0:
+        return canvas
+    region = canvas[top:top+h, dx:dx+w].astype(np.float32)
+    m = mask[:h, sx:sx+w]
+    canvas[top:top+h, dx:dx+w] = (region * (1 - m) + np.array(color, np.float32) * m).astype(np.uint8)
+    return canvas
+
+def cell_colors(array, cmap, norm, symbol_invert_color=False):
+    '''(background, glyph) RGB float32 colors per cell: one colormap lookup, glyphs black or inverted.'''
+    colors = cmap(norm(array))  # (rows, cols, 4) float
+    background = colors[..., :3].astype(np.float32)
+    if symbol_invert_color:
+        foreground = (1 - colors[..., :3]).astype(np.float32)
+    else:
+        foreground = np.zeros_like(background)
+    return background, foreground
+
+def composite_cells(out, atlas:GlyphAtlas, indices, background, foreground, alpha:float=1.0):
+    '''
+    Composite glyphs over cell colors into `out` ((rows*c, cols*c, 3) uint8), a band of
+    rows at a time so memory stays bounded and time linear in cells for large grids.
+    `background`/`foreground` are (rows, cols, 3) float colors in 0-1.
+    '''
+    rows, cols = indices.shape
+    c = atlas.cell_px
+    band = max(1, BAND_PIXELS // (cols * c * c))
+    for r0 in range(0, rows, band):
+        r1 = min(rows, r0 + band)
+        # (band, cols, c, c, 1) coverage against (band, cols, 1, 1, 3) cell colors
+        coverage = (atlas.masks[indices[r0:r1]].astype(np.float32) / 255.0)[..., None] * alpha
+        bg = background[r0:r1, :, None, None]
+        fg = foreground[r0:r1, :, None, None]
+        tiles = ((bg * (1 - coverage) + fg * coverage) * 255 + 0.5).astype(np.uint8)
+        # (band, cols, c, c, 3) -> (band, c, cols, c, 3) -> (band*c, cols*c, 3)
+        out[r0 * c:r1 * c] = tiles.transpose(0, 2, 1, 3, 4).reshape((r1 - r0) * c, cols * c, 3)
+    return out
+
+class LayerCache:
+    '''
+    Glyph layers (see `glyph_layer`) by key, an in-memory LRU limited to `memory_bytes`.
+
+    A layer only depends on the heightmap, shift, glyphtable, font, size and cell size,
+    so colormap, alpha, glyph inversion and label changes reuse it and only rebuild the
+    palette. One cache (`LAYERS`) is shared by every render of the process, batch jobs included.
+    '''
+
+    def __init__(self, memory_bytes:int=128*2**20):
+
+        self.memory_bytes = memory_bytes
+
+        self._lock = threading.Lock()
+        self._layers:OrderedDict[tuple, tuple[np.ndarray, np.ndarray]] = OrderedDict()
+        self._used = 0
+
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+        pass
+
+    def __repr__(self):
+        return f"LayerCache({len(self._layers)} layers, {self._used} bytes)"
+
+    def get(self, key):
+        with self._lock:
+            entry = self._layers.get(key)
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            self._layers.move_to_end(key)
+            self.counters['hits'] += 1
+            return entry
+
+    def put(self, key, entry):
+        size = sum(a.nbytes for a in entry)
+        if size > self.memory_bytes:
+            return
+        with self._lock:
+            if key in self._layers:
+                self._used -= sum(a.nbytes for a in self._layers.pop(key))
+            self._layers[key] = entry
+            self._used += size
+            while self._used > self.memory_bytes:
+                _, evicted = self._layers.popitem(last=False)
+                self._used -= sum(a.nbytes for a in evicted)
+                self.counters['evictions'] += 1
+
+    def stats(self) -> dict[str, int|float]:
+        with self._lock:
+            total = self.counters['hits'] + self.counters['misses']
+            return {
+                **self.counters,
+                'hit_ratio': (self.counters['hits'] / total if total else 0.0),
+                'layers': len(self._layers),
+                'bytes': self._used,
+            }
+
+# Process-wide glyph layers, used by composite_heatmap unless told otherwise
+LAYERS = LayerCache()
+
+def glyph_layer(array, atlas:GlyphAtlas, shift:int) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    (layer, values): `layer` is (rows*c, cols*c) uint16, per pixel the index of its cell's
+    value in `values` (the distinct heightmap values) << 8 | the glyph coverage (0-255).
+    '''
+    values, inverse = np.unique(array, return_inverse=True)
+    inverse = inverse.reshape(array.shape).astype(np.uint16) << 8
+    indices = (array + shift) % len(atlas)
+
+    rows, cols = array.shape
+    c = atlas.cell_px
+    layer = np.empty((rows * c, cols * c), dtype=np.uint16)
+    band = max(1, BAND_PIXELS // (cols * c * c))
+    for r0 in range(0, rows, band):
+        r1 = min(rows, r0 + band)
+        tiles = atlas.masks[indices[r0:r1]] | inverse[r0:r1, :, None, None]
+        layer[r0 * c:r1 * c] = tiles.transpose(0, 2, 1, 3).reshape((r1 - r0) * c, cols * c)
+    return layer, values
+
+def layer_palette(values, cmap, norm, symbol_invert_color=False, alpha:float=1.0) -> np.ndarray:
+    '''
+    The colors a glyph layer indexes, (len(values) * 256, 3) uint8: every heightmap value
+    blended with its glyph color at every coverage, with the same arithmetic as `composite_cells`.
+    '''
+    background, foreground = cell_colors(values, cmap, norm, symbol_invert_color)
+    coverage = (np.arange(256, dtype=np.uint8).astype(np.float32) / 255.0)[None, :, None] * alpha
+    bg = background[:, None]
+    fg = foreground[:, None]
+    return ((bg * (1 - coverage) + fg * coverage) * 255 + 0.5).astype(np.uint8).reshape(-1, 3)
+
+def composite_heatmap(
+        array,
+        glyphs,
+        shift:int,
+        cmap,
+        norm=None,
+        font_path=None,
+        figsize=(16, 16),
+        dpi=300,
+        fontsz:int=16,
+        symbol_invert_color=False,
+        symbol_semi_transparent=False,
+        labels=(),
+        layers:LayerCache=LAYERS
+    ) -> CompositeImage:
+    '''
+    Composite the heatmap and its glyphs with NumPy.
+
+    `labels` are (text, x_frac) pairs drawn in a strip below the grid, like the
+    `Level N` / generation name texts on the matplotlib backend.
+
+    The image is a glyph layer (`glyph_layer`, cached in `layers`, None to not cache)
+    looked up in a color palette (`layer_palette`, from the colormap, glyph inversion
+    and alpha), so a colormap or label change costs one lookup per pixel.
+    '''
+    norm = (norm if norm else mcolors.Normalize(vmin=0, vmax=9))
+    array = np.asarray(array)
+    cell_px = cell_size_px(array.shape, figsize, dpi)
+    atlas = get_atlas(glyphs, font_path, fontsz, cell_px, dpi)
+
+    key = None
+    entry = None
+    if layers is not None:
+        key = (hashlib.blake2b(array.tobytes(), digest_size=16).hexdigest(), array.shape, array.dtype.str, shift, ''.join(glyphs), font_path, fontsz, cell_px, dpi)
+        entry = layers.get(key)
+    if entry is None:
+        entry = glyph_layer(array, atlas, shift)
+        if key is not None:
+            layers.put(key, entry)
+    layer, values = entry
+
+    alpha = 0.7 if symbol_semi_transparent else 1.0
+    palette = layer_palette(values, cmap, norm, symbol_invert_color, alpha)
+
+    rows, cols = array.shape
+    grid_h, grid_w = rows * cell_px, cols * cell_px
+    strip = (int(round(12 * dpi / 72 * 1.6)) if labels else 0)
+    pad = int(round(PAD_INCHES * dpi))
+
+    # the whole image is allocated once, white, and the grid looked up into it a band at a time
+    canvas = np.full((grid_h + strip + 2 * pad, grid_w + 2 * pad, 3), 255, dtype=np.uint8)
+    band = max(1, BAND_PIXELS // grid_w)
+    for y0 in range(0, grid_h, band):
+        y1 = min(grid_h, y0 + band)
+        # np.take is about twice as fast as fancy indexing for this
+        canvas[pad + y0:pad + y1, pad:pad + grid_w] = np.take(palette, layer[y0:y1], axis=0)
+
+    if labels:
+        # labels are placed relative to the grid (and the strip below it), not the padding
+        framed = canvas[pad:pad + grid_h + strip, pad:pad + grid_w]
+        for text, x_frac in labels:
+            draw_label(framed, text, x_frac, grid_h + strip // 6, dpi=dpi)
+
+    return CompositeImage(canvas)
@@ -0,0 +1,339 @@
+# Compiled asset bundle: every heightmap, colormap, glyphtable, biome and floor in one memory-mappable file
+import os
+import json
+import time
+import hashlib
+import threading
+from types import MappingProxyType
+import numpy as np
+from .catalog import CATALOG
+
+BUNDLE_NAME = 'assets.bundle'
+BUNDLE_MAGIC = b'GLYPHBND'
+BUNDLE_VERSION = 3
+
+# Sections and the loose files they are compiled from
+SECTIONS = {
+    'heightmaps': 'heightmaps',
+    'colors': 'colors',
+    'glyphtables': 'glyphtables',
+    'biomes': 'biomes',
+}
+FLOORFILE = 'floors.json'
+
+# Seconds a freshness check is trusted before the section's files are stat'ed again
+FRESH_SECONDS = 1.0
+
+# Arrays are aligned so every memmap view starts on a cache line
+ALIGN = 64
+
+def fingerprint(root, section) -> str:
+    '''Digest of (filename, mtime, size) for every file of a section, what freshness is checked against.'''
+    if section == 'floors':
+        paths = [os.path.join(root, FLOORFILE)]
+    else:
+        directory = os.path.join(root, SECTIONS[section])
+        paths = [os.path.join(directory, f) for f in sorted(CATALOG.listdir(directory))]
+    digest = hashlib.sha1()
+    for p in paths:
+        st = os.stat(p)
+        digest.update(f'{os.path.basename(p)}:{st.st_mtime_ns}:{st.st_size};'.encode())
+    return digest.hexdigest()
+
+def build_bundle(root=os.getcwd(), fontdir='/usr/share/fonts/truetype/noto/', out=None):
+    '''
+    Compile every loose asset under `root` into one bundle file and return its path.
+
+    Layout: magic, version (uint32), header length (uint64), JSON header, then the raw
+    arrays the header points at (offset/dtype/shape), each aligned to `ALIGN` bytes.
+    '''
+    # heavy imports are only needed at build time
+    import matplotlib.colors as mcolors
+    from . import engine
+    from . import loaders
+    from . import heightmaps
+
+    out = (out if out else os.path.join(root, BUNDLE_NAME))
+    arrays:dict[str, np.ndarray] = {}
+    header = {'version': BUNDLE_VERSION, 'fontdir': fontdir, 'fingerprints': {}, 'arrays': {}}
+
+    # Heightmaps: the raw text (for SavedMaps.maps) and the parsed (N, 32, 32) uint8 stack,
+    # which every process' HeightmapBank maps instead of parsing its own copy
+    directory = os.path.join(root, SECTIONS['heightmaps'])
+    files = CATALOG.listdir(directory)
+    texts = [loaders.read_file_as_string(os.path.join(directory, f)) for f in files]
+    encoded = [t.encode('UTF-8') for t in texts]
+    header['heightmaps'] = [os.path.splitext(f)[0] for f in files]
+    arrays['heightmap_text'] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    arrays['heightmap_text_offsets'] = np.cumsum([0] + [len(e) for e in encoded]).astype(np.int64)
+    arrays['heightmaps'] = heightmaps.parse_heightmaps(texts)
+
+    # Colormaps: the hex lists (SavedColors.maps) and their RGBA tables (padded to the
+    # longest file), what the floors' custom colormaps are built from
+    directory = os.path.join(root, SECTIONS['colors'])
+    files = CATALOG.listdir(directory)
+    hexes = [loaders.read_file_as_list(os.path.join(directory, f)) for f in files]
+    header['colors'] = {os.path.splitext(f)[0]: h for f, h in zip(files, hexes)}
+    rgba = np.zeros((len(hexes), max((len(h) for h in hexes), default=0), 4), dtype=np.float64)
+    for k, h in enumerate(hexes):
+        rgba[k, :len(h)] = mcolors.to_rgba_array(h)
+    arrays['colors_rgba'] = rgba
+    arrays['colors_count'] = np.array([len(h) for h in hexes], dtype=np.int64)
+
+    # Glyphtables: glyph string, font filename and the font path resolved against `fontdir`
+    directory = os.path.join(root, SECTIONS['glyphtables'])
+    files = CATALOG.listdir(directory)
+    header['glyphtables'] = {}
+    for f in files:
+        filedata = loaders.read_file_as_list(os.path.join(directory, f))
+        font_path = os.path.join(fontdir, filedata[0])
+        header['glyphtables'][os.path.splitext(f)[0]] = {
+            'glyphs': filedata[1],
+            'font': filedata[0],
+            'font_path': font_path,
+            'font_found': os.path.exists(font_path),
+            'font_size': int(filedata[2]),
+        }
+
+    # Biomes and floors: their JSON, and every weight dict normalized once (as
+    # engine.Sampler.from_weights does) into one array the samplers are built from.
+    # Weights that do not validate are left out, the loose JSON raises as before.
+    weights = []
+    def compile_weights(table) -> list|None:
+        try:
+            p = engine.WeightedDictRandomizer(table).normalized_weights
+        except (ValueError, AttributeError, TypeError):
+            return None
+        weights.append(np.array(list(p.values()), dtype=np.float64))
+        return [list(p.keys()), len(weights) - 1]
+
+    directory = os.path.join(root, SECTIONS['biomes'])
+    header['biomes'] = {}
+    for f in CATALOG.listdir(directory):
+        with open(os.path.join(directory, f), 'r') as file:
+            db = json.load(file)
+        compiled = {kind: compile_weights(db.get(kind)) for kind in ('heightmaps', 'colormaps', 'glyphs')}
+        header['biomes'][os.path.splitext(f)[0]] = {'db': db, 'weights': {kind: entry for kind, entry in compiled.items() if entry}}
+
+    floors_path = os.path.join(root, FLOORFILE)
+    floors = {}
+    if os.path.exists(floors_path):
+        with open(floors_path, 'r') as file:
+            floors = json.load(file)
+    header['floors'] = {'db': floors, 'weights': [compile_weights(floor) for floor in floors.get('floors', [])]}
+
+    arrays['weights'] = (np.concatenate(weights) if weights else np.zeros(0, dtype=np.float64))
+    arrays['weights_offsets'] = np.cumsum([0] + [len(w) for w in weights]).astype(np.int64)
+
+    for section in list(SECTIONS) + ['floors']:
+        header['fingerprints'][section] = fingerprint(root, section)
+
+    # Lay the arrays out after the header, then write everything in one go
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        header['arrays'][name] = {'offset': offset, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+
+    blob = json.dumps(header).encode('UTF-8')
+    preamble = len(BUNDLE_MAGIC) + 4 + 8
+    data_start = -(-(preamble + len(blob)) // ALIGN) * ALIGN
+
+    tmp = out + '.tmp'
+    with open(tmp, 'wb') as file:
+        file.write(BUNDLE_MAGIC)
+        file.write(np.uint32(BUNDLE_VERSION).tobytes())
+        file.write(np.uint64(len(blob)).tobytes())
+        file.write(blob)
+        for name, array in arrays.items():
+            file.seek(data_start + header['arrays'][name]['offset'])
+            file.write(array.tobytes())
+        file.truncate(data_start + offset)
+    os.replace(tmp, out) # readers never see a half written bundle
+    return out
+
+class AssetBundle:
+    '''
+    A compiled bundle opened read-only through `np.memmap`.
+
+    The arrays are views on one file mapping, so every process that opens the same
+    bundle shares its pages through the OS page cache instead of holding private copies:
+    `heightmap_bank` is the `heightmaps.HeightmapBank` renders read (see `heightmaps.bank_for`).
+    '''
+
+    def __init__(self, path):
+
+        self.path = path
+        self.root = os.path.dirname(os.path.abspath(path))
+
+        with open(path, 'rb') as file:
+            if file.read(len(BUNDLE_MAGIC)) != BUNDLE_MAGIC:
+                raise ValueError(f'{path} is not an asset bundle')
+            version = int(np.frombuffer(file.read(4), dtype=np.uint32)[0])
+            if version != BUNDLE_VERSION:
+                raise ValueError(f'{path} is bundle version {version}, expected {BUNDLE_VERSION}')
+            length = int(np.frombuffer(file.read(8), dtype=np.uint64)[0])
+            self.header = json.loads(file.read(length).decode('UTF-8'))
+
+        preamble = len(BUNDLE_MAGIC) + 4 + 8
+        data_start = -(-(preamble + length) // ALIGN) * ALIGN
+        self._mmap = np.memmap(path, dtype=np.uint8, mode='r')
+        self.arrays = {}
+        for name, spec in self.header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape'])) if spec['shape'] else 1
+            start = data_start + spec['offset']
+            self.arrays[name] = self._mmap[start:start + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+
+        self._heightmap_index = {name: k for k, name in enumerate(self.header['heightmaps'])}
+        self._color_index = {name: k for k, name in enumerate(self.header['colors'])}
+        self._texts = None
+        self._bank = None
+        self._fresh:dict[str, tuple[float, bool]] = {} # section -> (checked at, fresh)
+
+        pass
+
+    def __repr__(self):
+        return f"AssetBundle({self.path}, v{self.header['version']})"
+
+    def is_fresh(self, section:str) -> bool:
+        '''
+        True while the loose files of `section` are unchanged since the bundle was built.
+        The answer is kept for `FRESH_SECONDS`, so loaders read on every render stat nothing.
+        '''
+        checked = self._fresh.get(section)
+        if checked is not None and time.monotonic() - checked[0] < FRESH_SECONDS:
+            return checked[1]
+        try:
+            fresh = (fingerprint(self.root, section) == self.header['fingerprints'].get(section))
+        except OSError:
+            fresh = False
+        self._fresh[section] = (time.monotonic(), fresh)
+        return fresh
+
+    # --- heightmaps ---
+    @property
+    def heightmap_names(self) -> list[str]:
+        return self.header['heightmaps']
+
+    @property
+    def heightmaps(self) -> np.ndarray:
+        '''(N, 32, 32) uint8 stack, in `heightmap_names` order.'''
+        return self.arrays['heightmaps']
+
+    def heightmap(self, name) -> np.ndarray:
+        return self.arrays['heightmaps'][self._heightmap_index[name]]
+
+    def heightmap_text(self, name) -> str:
+        k = self._heightmap_index[name]
+        offsets = self.arrays['heightmap_text_offsets']
+        return self.arrays['heightmap_text'][offsets[k]:offsets[k+1]].tobytes().decode('UTF-8')
+
+    @property
+    def heightmap_texts(self) -> MappingProxyType:
+        '''Every heightmap's original text, decoded once; always the same strings (see `bundle_of`).'''
+        if self._texts is None:
+            self._texts = MappingProxyType({name: self.heightmap_text(name) for name in self.heightmap_names})
+        return self._texts
+
+    @property
+    def heightmap_bank(self):
+        '''`heightmaps.HeightmapBank` over the mapped stack, no parsing and no private copy.'''
+        if self._bank is None:
+            from .heightmaps import HeightmapBank
+            self._bank = HeightmapBank(self.heightmap_names, self.heightmaps)
+        return self._bank
+
+    # --- colormaps ---
+    @property
+    def colors(self) -> dict[str, list[str]]:
+        return self.header['colors']
+
+    def color_rgba(self, name) -> np.ndarray:
+        '''(n, 4) float RGBA of the colormap's colors, what `matplotlib.colors.to_rgba_array` gives its hex list.'''
+        k = self._color_index[name]
+        return self.arrays['colors_rgba'][k, :self.arrays['colors_count'][k]]
+
+    # --- glyphtables ---
+    @property
+    def glyphtables(self) -> dict[str, dict]:
+        return self.header['glyphtables']
+
+    # --- biomes & floors ---
+    @property
+    def biomes(self) -> dict[str, dict]:
+        '''biome_ID -> {'db': the biome's JSON, 'weights': its compiled weight dicts}.'''
+        return self.header['biomes']
+
+    @property
+    def floors(self) -> dict:
+        '''floors.json as compiled.'''
+        return self.header['floors']['db']
+
+    def _weights(self, entry) -> tuple[list, np.ndarray]|None:
+        if entry is None:
+            return None
+        keys, k = entry
+        offsets = self.arrays['weights_offsets']
+        return keys, self.arrays['weights'][offsets[k]:offsets[k+1]]
+
+    def biome_weights(self, biome_ID:str, kind:str) -> tuple[list, np.ndarray]|None:
+        '''(keys, normalized weights) of a biome's 'heightmaps', 'colormaps' or 'glyphs', for `engine.Sampler`.'''
+        return self._weights(self.header['biomes'][biome_ID]['weights'].get(kind))
+
+    def floor_weights(self, level:int) -> tuple[list, np.ndarray]|None:
+        '''(biome_IDs, normalized weights) of a floor, for `engine.Sampler`.'''
+        return self._weights(self.header['floors']['weights'][int(level)])
+
+_BUNDLES:dict[str, tuple] = {}
+_BUNDLES_LOCK = threading.Lock()
+
+def open_bundle(path) -> AssetBundle|None:
+    '''The process-wide `AssetBundle` at `path`, reopened when the file is rebuilt. None if absent or unreadable.'''
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _BUNDLES_LOCK:
+        cached = _BUNDLES.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        try:
+            bundle = AssetBundle(path)
+        except (ValueError, OSError, KeyError):
+            return None
+        _BUNDLES[path] = (stamp, bundle)
+        return bundle
+
+def fresh_bundle(root, section) -> AssetBundle|None:
+    '''The bundle under `root` if it exists and `section` is still up to date, otherwise None.'''
+    bundle = open_bundle(os.path.join(root, BUNDLE_NAME))
+    if bundle is not None and bundle.is_fresh(section):
+        return bundle
+    return None
+
+def bundle_of(saved_maps) -> AssetBundle|None:
+    '''The open bundle a `SavedMaps.maps` dict came from (it holds that bundle's strings), None for loose files.'''
+    with _BUNDLES_LOCK:
+        bundles = [bundle for _, bundle in _BUNDLES.values()]
+    for bundle in bundles:
+        texts = bundle._texts
+        if texts is not None and len(texts) == len(saved_maps) and all(saved_maps.get(name) is text for name, text in texts.items()):
+            return bundle
+    return None
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Compile heightmaps, colors, glyphtables, biomes and floors into one asset bundle.")
+    parser.add_argument('--root', type=str, default=os.getcwd(), help='Directory holding the asset folders (default: cwd)')
+    parser.add_argument('--fontdir', type=str, default='/usr/share/fonts/truetype/noto/', help='Font directory glyphtable fonts are resolved against')
+    parser.add_argument('--out', type=str, help=f'Output path (default: <root>/{BUNDLE_NAME})')
+    args = parser.parse_args()
+
+    out = build_bundle(args.root, args.fontdir, args.out)
+    bundle = AssetBundle(out)
+    print(f"Wrote {out} ({os.path.getsize(out)} bytes): "
+          f"{len(bundle.heightmap_names)} heightmaps, {len(bundle.colors)} colormaps, "
+          f"{len(bundle.glyphtables)} glyphtables, {len(bundle.biomes)} biomes, {len(bundle.floors.get('floors', []))} floors")
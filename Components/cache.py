@@ -0,0 +1,181 @@
+# Two-tier (memory LRU -> disk) cache of rendered image bytes, keyed by content hashes
+import os
+import time
+import threading
+from collections import OrderedDict
+
+class RenderCache:
+    '''
+    Rendered images by key: an in-memory LRU limited to `memory_bytes`, in front of
+    an on-disk store under `directory` limited to `disk_bytes` (least recently used
+    files are deleted first). `directory=None` keeps the cache in memory only.
+
+    Several processes (the render pool's workers) can share one `directory`: a key
+    missing from this instance's index is looked up on disk before counting as a miss,
+    and the index is rebuilt from the directory at least every `scan_seconds` when
+    writing, so `disk_bytes` bounds the directory, not each process' share of it.
+
+    Files are named `key + suffix`. The default '.bin' makes no claim about the bytes,
+    which can be PNG, WebP or JPEG depending on the render's profile; a cache that only
+    holds one format (tiles) can pass its extension.
+
+    Keys are expected to be content hashes (see `grove.RenderKey`), so an entry never
+    goes stale; entries whose assets changed are simply never asked for again and
+    age out through the LRU.
+    '''
+
+    def __init__(self, memory_bytes:int=64*2**20, directory=None, disk_bytes:int=512*2**20, suffix='.bin', scan_seconds:float=10.0):
+
+        self.memory_bytes = memory_bytes
+        self.directory = directory
+        self.disk_bytes = disk_bytes
+        self.suffix = suffix
+        self.scan_seconds = scan_seconds
+
+        self._lock = threading.Lock()
+        self._memory:OrderedDict[str, bytes] = OrderedDict()
+        self._memory_used = 0
+        self._disk:OrderedDict[str, int] = OrderedDict() # key -> size, oldest first
+        self._disk_used = 0
+        self._scanned = 0.0
+
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'memory_evictions': 0, 'disk_evictions': 0}
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._scan_disk()
+
+        pass
+
+    def __repr__(self):
+        return f"RenderCache({len(self._memory)} in memory, {len(self._disk)} on disk)"
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._memory or key in self._disk
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + self.suffix)
+
+    def _scan_disk(self):
+        '''
+        Rebuild the disk index from the directory (what previous or other processes wrote),
+        oldest access first, and trim it to `disk_bytes`. Called with the lock held.
+        '''
+        self._disk.clear()
+        self._disk_used = 0
+        self._scanned = time.monotonic()
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for f in files:
+                if f.endswith(self.suffix):
+                    try:
+                        st = os.stat(os.path.join(root, f))
+                    except OSError:
+                        continue # removed by another process meanwhile
+                    entries.append((st.st_mtime_ns, f[:-len(self.suffix)], st.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_used += size
+        self._trim_disk()
+
+    def _remember(self, key, data:bytes):
+        '''Insert into the memory tier (lock held), evicting least recently used entries over budget.'''
+        if len(data) > self.memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_used -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_used += len(data)
+        while self._memory_used > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= len(evicted)
+            self.counters['memory_evictions'] += 1
+
+    def _trim_disk(self):
+        while self._disk_used > self.disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_used -= size
+            self.counters['disk_evictions'] += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def get(self, key) -> bytes|None:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return data
+            # not indexed here can still be on disk, written by another process sharing the directory
+            on_disk = (key in self._disk or bool(self.directory))
+
+        if on_disk:
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as file:
+                    data = file.read()
+                os.utime(path) # mtime doubles as the disk tier's recency
+            except OSError:
+                data = None
+            with self._lock:
+                if data is None:
+                    self._disk_used -= self._disk.pop(key, 0)
+                else:
+                    if key not in self._disk:
+                        self._disk[key] = len(data)
+                        self._disk_used += len(data)
+                    self._disk.move_to_end(key)
+                    self.counters['disk_hits'] += 1
+                    self._remember(key, data)
+                    return data
+
+        with self._lock:
+            self.counters['misses'] += 1
+        return None
+
+    def put(self, key, data:bytes):
+        with self._lock:
+            self._remember(key, data)
+            if not self.directory or key in self._disk or len(data) > self.disk_bytes:
+                return
+
+        path = self._path(key)
+        if os.path.exists(path):
+            # another process already wrote it, adopt it
+            with self._lock:
+                if key not in self._disk:
+                    self._disk[key] = len(data)
+                    self._disk_used += len(data)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # unique per process, two writers of the same key must not share a temp file
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as file:
+            file.write(data)
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._disk[key] = len(data)
+            self._disk_used += len(data)
+            if time.monotonic() - self._scanned > self.scan_seconds:
+                # other processes' writes count against the same budget
+                self._scan_disk()
+            else:
+                self._trim_disk()
+
+    def stats(self) -> dict[str, int|float]:
+        '''Hit ratio, per-tier hits, misses, evictions and bytes used.'''
+        with self._lock:
+            hits = self.counters['memory_hits'] + self.counters['disk_hits']
+            total = hits + self.counters['misses']
+            return {
+                **self.counters,
+                'hit_ratio': (hits / total if total else 0.0),
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_used,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_used,
+            }
@@ -0,0 +1,92 @@
+# Process-wide cache of parsed asset files (heightmaps, colors, glyphtables)
+import os
+import threading
+
+def file_stamp(path):
+    '''(mtime_ns, size) of a file or directory, what the catalog revalidates against.'''
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+class AssetCatalog:
+    '''
+    Parses each asset file once and hands the parsed (immutable) value out on every
+    later access. A `stat` per access is enough to pick up edits: when a file's
+    mtime or size changes it is parsed again, without restarting the process.
+    '''
+
+    def __init__(self):
+
+        self._lock = threading.Lock()
+        self._files:dict[tuple, tuple] = {}   # (path, parser) -> (stamp, value)
+        self._dirs:dict[str, tuple] = {}      # directory -> (stamp, filenames)
+
+        self.hits = 0
+        self.misses = 0
+
+        pass
+
+    def __repr__(self):
+        return f"AssetCatalog({len(self._files)} files, {self.hits} hits, {self.misses} misses)"
+
+    def listdir(self, directory) -> tuple[str]:
+        '''
+        Filenames in `directory` in `os.walk` order (what the loaders always iterated, so
+        "the first table" stays the same), re-listed only when the directory itself changes.
+        '''
+        stamp = file_stamp(directory)
+        with self._lock:
+            cached = self._dirs.get(directory)
+            if cached and cached[0] == stamp:
+                return cached[1]
+        filenames = tuple(next(os.walk(directory))[2])
+        with self._lock:
+            self._dirs[directory] = (stamp, filenames)
+        return filenames
+
+    def load(self, path, parser):
+        '''
+        Returns `parser(path)`, parsing only on the first access or after the file changed.
+        `parser` must return something immutable, the same object is shared by every caller.
+        '''
+        try:
+            stamp = file_stamp(path)
+        except OSError:
+            # let the parser report missing files the way it always has
+            return parser(path)
+
+        key = (path, parser)
+        with self._lock:
+            cached = self._files.get(key)
+            if cached and cached[0] == stamp:
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        value = parser(path)
+        with self._lock:
+            self._files[key] = (stamp, value)
+        return value
+
+    def invalidate(self, path=None):
+        '''Forget one file (or everything), forcing a re-parse on the next access.'''
+        with self._lock:
+            if path is None:
+                self._files.clear()
+                self._dirs.clear()
+                return
+            for key in [key for key in self._files if key[0] == path]:
+                del self._files[key]
+
+    def stats(self) -> dict[str, int|float]:
+        '''Hit/miss counters of the catalog.'''
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'files': len(self._files),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits / total if total else 0.0)
+            }
+
+# The catalog shared by every loader in this process
+CATALOG = AssetCatalog()
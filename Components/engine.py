@@ -1,4 +1,5 @@
 import random
+from functools import lru_cache
 import numpy as np
 
 def NewRandomSeed():
@@ -59,8 +60,85 @@ class WeightedDictRandomizer:
         # Use the randomly generated number to select an item from the normalized weights
         return np.random.default_rng(self.seed).choice(list(self.normalized_weights.keys()), p=list(self.normalized_weights.values()))
 
+    def results(self, uniforms):
+        """
+        Vectorized `result()` for many seeds at once.
+
+        Args:
+            uniforms (np.ndarray): `SeedUniforms(seeds)`, the draw `result()` would consume for each seed.
+
+        Returns:
+            np.ndarray: The item `result()` returns for each seed.
+        """
+
+        return Sampler(list(self.normalized_weights.keys()), list(self.normalized_weights.values())).sample(uniforms=uniforms)
+
+class Sampler:
+    def __init__(self, keys:list, p:list[float]):
+        """
+        A weighted choice compiled once into a key array and a cumulative distribution.
+
+        `sample(seed)` returns exactly what `np.random.default_rng(seed).choice(keys, p=p)`
+        would: the same normalized cdf, searched with the seed's first uniform draw.
+
+        Args:
+            keys (list): The items to choose from.
+            p (list[float]): Their probabilities, used as given (see `from_weights`).
+        """
+
+        self.keys = np.array(keys)
+
+        # Same cdf Generator.choice builds from p
+        cdf = np.array(p, dtype=np.double).cumsum()
+        cdf /= cdf[-1]
+        self.cdf = cdf
+
+    def __repr__(self):
+        return f"Sampler({len(self.keys)} keys)"
 
+    @classmethod
+    def from_weights(cls, weights:dict[str, float]):
+        """`WeightedDictRandomizer(weights).result()` compiled, validated and normalized once."""
+        return cls(list(weights.keys()), list(WeightedDictRandomizer(weights).normalized_weights.values()))
 
+    @classmethod
+    def boolean(cls, weight:float):
+        """`BooleanFromSeedWeight(seed, weight)` compiled."""
+        return cls([True, False], [weight, 1 - weight])
+
+    def sample(self, seeds=None, uniforms=None):
+        """
+        Returns the choice for one seed (scalar) or for an array of seeds.
+
+        Args:
+            seeds (int | array-like): Seed(s) for the random number generator.
+            uniforms (float | np.ndarray): Precomputed `SeedUniform`/`SeedUniforms` draws, instead of seeds.
+        """
+
+        if uniforms is None:
+            uniforms = (SeedUniform(seeds) if np.ndim(seeds) == 0 else SeedUniforms(seeds))
+        return self.keys[self.cdf.searchsorted(uniforms, side='right')]
+
+@lru_cache(maxsize=4096)
+def _SeedUniform(seed) -> float:
+    return np.random.default_rng(seed).random()
+
+def SeedUniform(seed) -> float:
+    """
+    The first `random()` draw of `np.random.default_rng(seed)`.
+
+    `WeightedDictRandomizer.result()` and `BooleanFromSeedWeight` each consume exactly
+    this draw, so one per seed is enough to resolve every decision for it. Cached, since
+    one request makes several decisions from the same seed.
+    """
+    if seed is None:
+        # fresh entropy every call, nothing to cache
+        return np.random.default_rng().random()
+    return _SeedUniform(seed)
+
+def SeedUniforms(seeds) -> np.ndarray:
+    """`SeedUniform` for each seed."""
+    return np.array([SeedUniform(seed) for seed in np.asarray(seeds).tolist()], dtype=np.double)
 
 def BooleanFromSeedWeight(seed, weight) -> bool:
     """
@@ -75,3 +153,11 @@ def BooleanFromSeedWeight(seed, weight) -> bool:
     rng = np.random.default_rng(seed)
     # Generate a boolean value based on the weight
     return rng.choice([True, False], p=[weight, 1 - weight])
+
+def BooleansFromSeedWeight(uniforms, weight) -> np.ndarray:
+    """
+    Vectorized `BooleanFromSeedWeight` over `SeedUniforms(seeds)`.
+    Returns:
+        np.ndarray: bool array, True with the specified probability.
+    """
+    return Sampler.boolean(weight).sample(uniforms=uniforms)
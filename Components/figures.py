@@ -0,0 +1,27 @@
+# Figures on their own Agg canvas, for renders that must not go through pyplot's global state
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+def new_figure(figsize, **kwargs):
+    '''
+    (Figure, Axes) on an Agg canvas of their own, outside pyplot's global figure list,
+    so renders can run in parallel threads.
+    '''
+    fig = Figure(figsize=figsize, **kwargs)
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot()
+
+class FigureState:
+    '''
+    A matplotlib render, with the `savefig`/`close` surface `FromSeed` and `bitstream.py`
+    use (like `atlas.CompositeImage`). Nothing is kept in pyplot, closing just frees the artists.
+    '''
+
+    def __init__(self, figure:Figure):
+        self.figure = figure
+
+    def savefig(self, fname, **kwargs):
+        self.figure.savefig(fname, **kwargs)
+
+    def close(self, *args):
+        self.figure.clear()
@@ -0,0 +1,269 @@
+# Font registry: FontProperties per font file, glyph coverage and laid-out glyph paths, shared by every render of the process
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import matplotlib.font_manager as fm
+from matplotlib import ft2font
+from matplotlib.path import Path
+from matplotlib.textpath import TextPath, text_to_path
+from matplotlib.transforms import Affine2D
+from matplotlib.collections import PathCollection
+from .catalog import CATALOG
+
+def read_charmap(font_path) -> frozenset[int]|None:
+    '''Codepoints the font file has a glyph for, None when it is missing or unreadable.'''
+    try:
+        return frozenset(ft2font.FT2Font(font_path).get_charmap())
+    except (OSError, RuntimeError):
+        return None
+
+def glyph_metrics(glyph:str, font_path) -> tuple[float]:
+    '''
+    (advance, xmin, ymin, xmax, ymax) in ems of a one codepoint glyph the font has, unscaled
+    and unhinted. A glyph with no ink (xmin == xmax) draws nothing.
+    '''
+    font = fm.get_font(font_path)
+    em = font.units_per_EM
+    metrics = font.load_char(ord(glyph), flags=ft2font.LoadFlags.NO_SCALE)
+    return (metrics.horiAdvance / em, *(v / em for v in metrics.bbox))
+
+class GlyphCoverage:
+    '''
+    Which font draws each glyph of a glyphtable, resolved once from the fonts' cmaps
+    (see `FontRegistry.coverage`).
+
+    `fonts[k]` is the font file of `glyphs[k]`: `font_path` when it has the glyph, else the
+    first fallback that does, else None (no installed font has it, it renders as tofu).
+    `metrics[k]` is its (advance, xmin, ymin, xmax, ymax) in ems from that font, or None.
+    '''
+
+    def __init__(self, glyphs, font_path, fonts, metrics, font_found:bool):
+
+        self.glyphs = tuple(glyphs)
+        self.font_path = font_path
+        self.fonts = tuple(fonts)
+        self.metrics = tuple(metrics)
+        self.font_found = font_found
+
+        pass
+
+    def __repr__(self):
+        return f"GlyphCoverage({os.path.basename(str(self.font_path))}, {len(self.glyphs)} glyphs, {len(self.fallback)} fallback, {len(self.missing)} missing)"
+
+    @property
+    def fallback(self) -> dict[str, str]:
+        '''Glyphs drawn with another font than the table's, and that font.'''
+        return {glyph: font for glyph, font in zip(self.glyphs, self.fonts) if font and font != self.font_path}
+
+    @property
+    def missing(self) -> tuple[str]:
+        '''Glyphs no font has.'''
+        return tuple(glyph for glyph, font in zip(self.glyphs, self.fonts) if font is None)
+
+    @property
+    def blank(self) -> tuple[str]:
+        '''Glyphs a font has but that draw nothing (no ink), e.g. spaces or unsupported marks.'''
+        return tuple(glyph for glyph, m in zip(self.glyphs, self.metrics) if m is not None and m[1] == m[3])
+
+    @property
+    def complete(self) -> bool:
+        return self.font_found and not self.fallback and not self.missing
+
+    def describe(self, name=None) -> str:
+        '''One line for the load time report, e.g. "Brahmi1: 3 glyphs from DejaVuSans.ttf, 2 in no font: ..."'''
+        parts = []
+        if not self.font_found:
+            parts.append(f"font {self.font_path} not found")
+        by_font = {}
+        for font in self.fallback.values():
+            by_font[font] = by_font.get(font, 0) + 1
+        parts += [f"{count} glyphs from {os.path.basename(font)}" for font, count in by_font.items()]
+        if self.missing:
+            parts.append(f"{len(self.missing)} in no font: {''.join(self.missing[:16])}{'...' if len(self.missing) > 16 else ''}")
+        if self.blank:
+            parts.append(f"{len(self.blank)} blank")
+        return f"{name or os.path.basename(str(self.font_path))}: {', '.join(parts) if parts else 'complete'}"
+
+class FontRegistry:
+    '''
+    Loads each font once and keeps the outline of every glyph drawn with it.
+
+        props = FONTS.properties(font_path)         # shared FontProperties (None for the default font)
+        font = FONTS.resolve('A', font_path)        # font_path, or the fallback that has the glyph
+        path = FONTS.glyph_path('A', font_path, 16) # TextPath in points, centered like ha/va='center'
+
+    A glyph missing from its font is drawn with the first of `fallbacks` that has it, by
+    default matplotlib's default font then the other fonts next to `font_path`. Tables are
+    indexed once with `coverage` (SavedGlyphs does it at load time), so renders only look
+    the resolved font up.
+
+    Glyph paths are an LRU of at most `max_paths` (font, glyph, size) entries; fonts are never evicted.
+    `stats()` reports hits, misses and memory of both.
+    '''
+
+    def __init__(self, max_paths:int=8192, fallbacks=None):
+
+        self.max_paths = max_paths
+        self.fallbacks = fallbacks
+
+        self._lock = threading.Lock()
+        self._properties:dict[str, fm.FontProperties] = {}
+        self._resolved:dict[tuple, str|None] = {}
+        self._coverage:dict[tuple, GlyphCoverage] = {}
+        self._paths:OrderedDict[tuple, Path] = OrderedDict()
+        self._path_bytes = 0
+
+        self.counters = {
+            'font_hits': 0, 'font_misses': 0,
+            'path_hits': 0, 'path_misses': 0, 'path_evictions': 0,
+        }
+
+        pass
+
+    def __repr__(self):
+        return f"FontRegistry({len(self._properties)} fonts, {len(self._paths)} glyph paths)"
+
+    def properties(self, font_path=None) -> fm.FontProperties|None:
+        '''The FontProperties of `font_path`, or None (matplotlib's default font) without one.'''
+        if not font_path:
+            return None
+        with self._lock:
+            props = self._properties.get(font_path)
+            if props is not None:
+                self.counters['font_hits'] += 1
+                return props
+            self.counters['font_misses'] += 1
+            props = self._properties[font_path] = fm.FontProperties(fname=font_path)
+            return props
+
+    def fallback_fonts(self, font_path=None) -> list[str]:
+        '''Fonts tried in order for a glyph `font_path` does not have.'''
+        if self.fallbacks is not None:
+            return [font for font in self.fallbacks if font != font_path]
+        fallbacks = [os.fspath(fm.findfont(fm.FontProperties()))]
+        directory = (os.path.dirname(font_path) if font_path else '')
+        if os.path.isdir(directory):
+            fallbacks += [os.path.join(directory, name) for name in sorted(CATALOG.listdir(directory))]
+        return [font for font in dict.fromkeys(fallbacks) if font != font_path]
+
+    def has_glyph(self, glyph:str, font_path) -> bool:
+        charmap = CATALOG.load(font_path, read_charmap)
+        return charmap is not None and all(ord(c) in charmap for c in glyph)
+
+    def resolve(self, glyph:str, font_path=None):
+        '''
+        The font file to draw `glyph` with: `font_path` when it has it, else the first fallback
+        that does. `font_path` itself when none does, and None (the default font) stays None.
+        '''
+        if not font_path:
+            return None
+        key = (font_path, glyph)
+        font = self._resolved.get(key, False)
+        if font is False:
+            font = self._find(glyph, font_path)
+            with self._lock:
+                self._resolved[key] = font
+        return (font if font else font_path)
+
+    def _find(self, glyph, font_path):
+        for font in [font_path, *self.fallback_fonts(font_path)]:
+            if self.has_glyph(glyph, font):
+                return font
+        return None
+
+    def indexed(self, glyphs, font_path) -> bool:
+        return (font_path, tuple(glyphs)) in self._coverage
+
+    def coverage(self, glyphs, font_path) -> GlyphCoverage:
+        '''
+        Check every glyph of a glyphtable against its font's cmap (and the fallbacks' for the
+        missing ones) and keep the result, built once per (glyphs, font_path).
+        '''
+        key = (font_path, tuple(glyphs))
+        coverage = self._coverage.get(key)
+        if coverage is not None:
+            return coverage
+        fonts = [(self._find(glyph, font_path) if font_path else None) for glyph in glyphs]
+        metrics = [(glyph_metrics(glyph, font) if font and len(glyph) == 1 else None) for glyph, font in zip(glyphs, fonts)]
+        coverage = GlyphCoverage(glyphs, font_path, fonts, metrics, font_found=(CATALOG.load(font_path, read_charmap) is not None))
+        with self._lock:
+            self._coverage[key] = coverage
+            self._resolved.update({(font_path, glyph): font for glyph, font in zip(glyphs, fonts)})
+        return coverage
+
+    def glyph_path(self, glyph:str, font_path=None, size:float=16) -> Path:
+        '''
+        Outline of `glyph` at `size` points, in points and centered on (0, 0) the way
+        ax.text(ha='center', va='center') places it.
+        '''
+        key = (font_path, glyph, size)
+        with self._lock:
+            path = self._paths.get(key)
+            if path is not None:
+                self._paths.move_to_end(key)
+                self.counters['path_hits'] += 1
+                return path
+            self.counters['path_misses'] += 1
+
+        path = self._layout(glyph, font_path, size)
+
+        with self._lock:
+            if key not in self._paths:
+                self._paths[key] = path
+                self._path_bytes += _path_nbytes(path)
+                while len(self._paths) > self.max_paths:
+                    _, evicted = self._paths.popitem(last=False)
+                    self._path_bytes -= _path_nbytes(evicted)
+                    self.counters['path_evictions'] += 1
+        return path
+
+    def _layout(self, glyph, font_path, size) -> Path:
+        props = (self.properties(self.resolve(glyph, font_path)) or fm.FontProperties()).copy()
+        props.set_size(size)
+        text = TextPath((0, 0), glyph, prop=props)
+        # the box matplotlib's text layout centers: the glyph's width from the pen position,
+        # the line height and descent at least those of "lp"
+        width, height, descent = text_to_path.get_text_width_height_descent(glyph, props, ismath=False)
+        _, lp_height, lp_descent = text_to_path.get_text_width_height_descent('lp', props, ismath=False)
+        height, descent = max(height, lp_height), max(descent, lp_descent)
+        if not len(text.vertices):
+            return Path(np.empty((0, 2)), readonly=True)
+        return Path(text.vertices - (width / 2, height / 2 - descent), text.codes, readonly=True)
+
+    def stats(self) -> dict[str, int|float]:
+        with self._lock:
+            fonts = self.counters['font_hits'] + self.counters['font_misses']
+            paths = self.counters['path_hits'] + self.counters['path_misses']
+            return {
+                **self.counters,
+                'font_hit_ratio': (self.counters['font_hits'] / fonts if fonts else 0.0),
+                'path_hit_ratio': (self.counters['path_hits'] / paths if paths else 0.0),
+                'fonts': len(self._properties),
+                'tables': len(self._coverage),
+                'resolved': len(self._resolved),
+                'paths': len(self._paths),
+                'bytes': self._path_bytes,
+            }
+
+def _path_nbytes(path:Path) -> int:
+    return path.vertices.nbytes + (path.codes.nbytes if path.codes is not None else 0)
+
+# Process-wide registry, used by the matplotlib renders in generators and to_terminal
+FONTS = FontRegistry()
+
+def glyph_collection(ax, glyphs, offsets, font_path=None, size:float=16, colors='black', alpha:float=1.0, registry:FontRegistry=None) -> PathCollection:
+    '''
+    Draw every glyph of `glyphs` centered on its (x, y) data position in `offsets` as one
+    PathCollection on `ax`, from the registry's glyph paths: one artist for the whole grid
+    instead of a Text per glyph. `colors` is one color or one per glyph.
+    '''
+    registry = (registry or FONTS)
+    paths = [registry.glyph_path(glyph, font_path, size) for glyph in glyphs]
+    points = Affine2D().scale(1 / 72) + ax.figure.dpi_scale_trans # points -> pixels at any savefig dpi
+    collection = PathCollection(
+        paths, offsets=offsets, offset_transform=ax.transData, transform=points,
+        facecolors=colors, edgecolors='none', linewidths=0, alpha=alpha, clip_on=False, zorder=3
+    )
+    ax.add_collection(collection, autolim=False)
+    return collection
@@ -1,11 +1,37 @@
 import streamlit as st
 import numpy as np
-import matplotlib.pyplot as plt
+import matplotlib
 import matplotlib.font_manager as fm
 import matplotlib.colors as mcolors
 import noise
 from PIL import Image
 import os
+import io
+from . import atlas
+from . import fonts
+from .figures import new_figure, FigureState
+from . import perlin
+from . import profiles
+
+# 'matplotlib' draws every cell through ax.text, 'paths' draws all cells as one collection of cached
+# glyph outlines (fonts.FONTS), 'atlas' composites pre-rasterized glyphs with NumPy
+BACKENDS = ('matplotlib', 'paths', 'atlas')
+
+# (rows, cols) of the heightmap assets and of every floor unless a grid is given
+GRID = (32, 32)
+# Figure inches per cell, so a 32x32 grid gets the original 16 inch figure
+CELL_INCHES = 0.5
+
+def grid_figsize(shape, cell_inches:float=CELL_INCHES):
+    '''(width, height) in inches of the figure for a (rows, cols) grid, the same size per cell at any grid size.'''
+    rows, cols = shape
+    return (cols * cell_inches, rows * cell_inches)
+
+def cell_dpi(cell_px:int, shape, figsize=None) -> float:
+    '''The dpi at which each cell of a `shape` grid on `figsize` is `cell_px` pixels wide.'''
+    rows, cols = shape
+    figsize = (figsize if figsize else grid_figsize(shape))
+    return cell_px / min(figsize[0] * atlas.AXES_FRACTION[0] / cols, figsize[1] * atlas.AXES_FRACTION[1] / rows)
 
 # Define the Symbol class
 class Symbol:
@@ -14,25 +40,27 @@ class Symbol:
         self.font_path = font_path
 
     def draw(self, ax, x, y, size=16, cell_value=None, cmap=None, norm=None, invert_color=False, alpha=1.0):  # Reduced font size to 10
-        # If a font path is provided, use it; otherwise, default to system font
-        font_properties = fm.FontProperties(fname=self.font_path) if self.font_path else None
-        
-        if invert_color and cell_value is not None and cmap is not None and norm is not None:
-            color = cmap(norm(cell_value))
-            inverted_color = [1 - c for c in color[:3]] + [color[3]]
-            color = inverted_color
-        else:
-            color = 'black'
+        # If a font path is provided, use it (or the fallback that has the glyph, loaded once, see fonts.FONTS); otherwise, default to system font
+        font_properties = fonts.FONTS.properties(fonts.FONTS.resolve(self.symbol, self.font_path))
+        color = Symbol.color(cell_value, cmap, norm, invert_color)
 
         ax.text(x, y, self.symbol, fontsize=size, ha='center', va='center', color=color, fontproperties=font_properties, alpha=alpha)
 
+    @staticmethod
+    def color(cell_value=None, cmap=None, norm=None, invert_color=False):
+        '''Black, or the inverse of the cell's color with `invert_color`.'''
+        if invert_color and cell_value is not None and cmap is not None and norm is not None:
+            color = cmap(norm(cell_value))
+            return [1 - c for c in color[:3]] + [color[3]]
+        return 'black'
+
 # Create a function to generate the heatmap and overlay symbols
 def create_heatmap_with_symbols(
         array,                     
         glyphs, 
         seed=None, 
         font_path=None, 
-        figsize=(16, 16), 
+        figsize=None, 
         dpi=300, 
         text=None, 
         cmap='viridis',
@@ -43,26 +71,66 @@ def create_heatmap_with_symbols(
         fontsz:int=16,
         symbol_invert_color=False,
         symbol_semi_transparent=False,
-        base_directory = os.getcwd()
+        base_directory = os.getcwd(),
+        backend:str='matplotlib',
+        profile=None,
+        cell_px:int=None,
+        layers=atlas.LAYERS
     ):
+    '''
+    `array` can have any (rows, cols); `figsize=None` sizes the figure by the grid
+    (`grid_figsize`, 16 inches for 32x32) so glyphs stay the same size per cell.
+    `cell_px` sets the pixel size of a cell instead of `dpi`, so the output dimensions
+    follow the grid. The atlas backend composites band by band, its time and memory
+    stay linear in cells for large grids; the matplotlib backend draws a text per cell,
+    the paths backend one collection of cached glyph outlines (`fonts.FONTS`).
+
+    `profile` (a name in `profiles.PROFILES` or an `OutputProfile`) renders at the dpi
+    matching its pixel size and saves with its codec; None keeps `dpi` and plain PNG.
+
+    On the atlas backend the glyph layer is kept in `layers` (an `atlas.LayerCache`,
+    process-wide by default, None to not cache): re-rendering the same heightmap and
+    glyphs with another colormap, alpha or label only recolors it.
+
+    Nothing global is touched (no pyplot, no global RNG): the matplotlib and paths backends
+    draw on a `new_figure` and return a `FigureState`, so renders can run in parallel threads.
+    '''
 
     array = (string_to_heightmap(array) if type(array) == str else array)
+    figsize = (figsize if figsize else grid_figsize(np.shape(array)))
 
-    np.random.seed(seed)  # Ensure reproducibility with seed
+    profile = profiles.get_profile(profile)
+    if cell_px:
+        dpi = cell_dpi(cell_px, np.shape(array), figsize)
+    elif profile:
+        dpi = profile.render_dpi(figsize, dpi)
 
     # Create a colormap for the heatmap
-    if isinstance(cmap, mcolors.ListedColormap):
-        cmap = cmap
-    else:
-        cmap = plt.get_cmap(cmap)
-    #cmap = (cmap if custom_cmap else plt.get_cmap(cmap))
+    cmap = heatmap_cmap(cmap)
+    #cmap = (cmap if custom_cmap else matplotlib.colormaps.get_cmap(cmap))
     norm = mcolors.Normalize(vmin=0, vmax=9)
 
     # Calculate the shift based on the seed (to make the symbols shift predictably)
     shift = seed % len(glyphs)  # Calculate the shift based on the seed
 
+    if backend not in BACKENDS:
+        raise ValueError(f'Unknown backend {backend}, expected one of {BACKENDS}')
+
+    if backend == 'atlas':
+        State = atlas.composite_heatmap(
+            array, glyphs, shift, cmap, norm,
+            font_path=font_path, figsize=figsize, dpi=dpi, fontsz=fontsz,
+            symbol_invert_color=symbol_invert_color,
+            symbol_semi_transparent=symbol_semi_transparent,
+            labels=heatmap_labels(text, display_zone, save_name),
+            layers=layers
+        )
+        if save:
+            _save(State, base_directory, save_name, dpi, profile)
+        return State
+
     # Create the plot with a larger figsize
-    fig, ax = plt.subplots(figsize=figsize)  # Adjusted figsize for better clarity
+    fig, ax = new_figure(figsize)  # Adjusted figsize for better clarity
     
     cax = ax.imshow(array, cmap=cmap, norm=norm)
 
@@ -70,11 +138,20 @@ def create_heatmap_with_symbols(
     alpha = 0.7 if symbol_semi_transparent else 1.0
 
     # Overlay symbols based on the array values and the shift from the seed
-    for i in range(array.shape[0]):
-        for j in range(array.shape[1]):
-            symbol_idx = (array[i, j] + shift) % len(glyphs)  # Apply the shift to the array value
-            symbol = Symbol(glyphs[symbol_idx], font_path=font_path)  # Pick symbol based on the shifted index
-            symbol.draw(ax, j, i, fontsz, array[i,j], cmap, norm, symbol_invert_color, alpha)
+    if backend == 'paths':
+        rows, cols = np.shape(array)
+        fonts.glyph_collection(
+            ax, [glyphs[(v + shift) % len(glyphs)] for v in np.ravel(array)],
+            [(j, i) for i in range(rows) for j in range(cols)],
+            font_path=font_path, size=fontsz, alpha=alpha,
+            colors=[Symbol.color(v, cmap, norm, symbol_invert_color) for v in np.ravel(array)]
+        )
+    else:
+        for i in range(array.shape[0]):
+            for j in range(array.shape[1]):
+                symbol_idx = (array[i, j] + shift) % len(glyphs)  # Apply the shift to the array value
+                symbol = Symbol(glyphs[symbol_idx], font_path=font_path)  # Pick symbol based on the shifted index
+                symbol.draw(ax, j, i, fontsz, array[i,j], cmap, norm, symbol_invert_color, alpha)
 
     # Remove axis labels for a clean view
     ax.axis('off')
@@ -86,58 +163,150 @@ def create_heatmap_with_symbols(
         #ax.text(.1, -0.01, f'{"".join(glyphs)}', ha='center', va='center', fontsize=12, color='gray', fontproperties=(fm.FontProperties(fname=font_path) if font_path else None), transform=ax.transAxes)
         ax.text(.2, -0.01, f'{save_name.replace(".png","")}', ha='center', va='center', fontsize=12, color='gray', transform=ax.transAxes)
 
+    State = FigureState(fig)
     if save:
+        _save(State, base_directory, save_name, dpi, profile)
+    
+    return State
+
+def heatmap_cmap(cmap):
+    '''The Colormap of a name, a custom `ListedColormap` as is.'''
+    if isinstance(cmap, mcolors.ListedColormap):
+        return cmap
+    return matplotlib.colormaps.get_cmap(cmap)
+
+def heatmap_labels(text=None, display_zone:bool=False, save_name=''):
+    '''The (text, x_frac) labels below the grid on the atlas backend: the level text and the generation name.'''
+    labels = []
+    if text:
+        labels.append((text, .94))
+    if display_zone:
+        labels.append((save_name.replace(".png",""), .2))
+    return labels
+
+def composite_heatmap_frame(
+        compositor,
+        array,
+        glyphs,
+        seed=None,
+        shift:int=None,
+        font_path=None,
+        text=None,
+        cmap='viridis',
+        save_name='heatmap_with_symbols_shifted.png',
+        display_zone:bool=False,
+        fontsz:int=16,
+        symbol_invert_color=False,
+        symbol_semi_transparent=False
+    ) -> np.ndarray:
+    '''
+    One animation frame: what `create_heatmap_with_symbols(backend='atlas')` renders for the
+    same arguments, composited on an `animation.FrameCompositor` so only the cells that
+    differ from its previous frame are redrawn. `shift` overrides the seed's glyph shift.
+    Returns the compositor's canvas (copy it to keep it).
+    '''
+    shift = (seed % len(glyphs) if shift is None else shift % len(glyphs))
+    return compositor.frame(
+        np.asarray(array), glyphs, shift, heatmap_cmap(cmap), mcolors.Normalize(vmin=0, vmax=9),
+        font_path=font_path, fontsz=fontsz,
+        symbol_invert_color=symbol_invert_color,
+        symbol_semi_transparent=symbol_semi_transparent,
+        labels=heatmap_labels(text, display_zone, save_name)
+    )
+
+def _save(State, base_directory, save_name, dpi, profile=None):
+    '''Write `State` to output/, with `profile`'s codec and extension when there is one.'''
+    if not profile:
         output_dir = os.path.join(base_directory, 'output', save_name + ('.png' if not save_name.endswith('.png') else ''))
         # Save the figure with high resolution (higher dpi)
-        plt.savefig(output_dir, dpi=dpi, bbox_inches='tight')  # Save image with larger resolution
+        State.savefig(output_dir, dpi=dpi, bbox_inches='tight')  # Save image with larger resolution
         print(f"Image saved to: {output_dir}")
-    
-    return plt
+        return
+
+    output_dir = os.path.join(base_directory, 'output', (save_name[:-len('.png')] if save_name.endswith('.png') else save_name) + profile.suffix)
+    data, report = profiles.encode(profiles.to_image(State, dpi), profile, dpi)
+    with open(output_dir, 'wb') as file:
+        file.write(data)
+    print(f"Image saved to: {output_dir} ({profiles.describe(report)})")
 
 
 # Function to create a preview of the selected colormap
-def show_cmap_preview(cmap_name):
+def cmap_preview_png(cmap_name) -> bytes:
+    '''PNG bytes of the colormap preview strip (nothing is kept in pyplot).'''
     # Create a gradient image to show the colormap
     gradient = np.linspace(0, 1, 256).reshape(1, -1)
     gradient = np.vstack((gradient, gradient))
 
-    fig, ax = plt.subplots(figsize=(6, 1))  # Preview size
+    fig, ax = new_figure((6, 1))  # Preview size
     ax.set_title(f"Colormap: {cmap_name}")
     ax.imshow(gradient, aspect='auto', cmap=cmap_name)
     ax.set_axis_off()  # Hide axis
-    st.sidebar.pyplot(fig)
-
-
-# Function to generate a 32x32 array of random values between 0 and 9
-def generate_array(seed=None):
-    np.random.seed(seed)  # Ensure reproducibility with seed
-    return np.random.randint(0, 10, size=(32, 32))
-
-def generate_perlin_noise(width, height, scale=10.0, octaves=6, seed=None):
-    """Generates a heightmap using Perlin noise with integer values between 0 and 9."""
-    shape = (width, height)
-    world = np.zeros(shape)
-
-    # Generate Perlin noise and scale it to values between 0 and 9
-    for i in range(width):
-        for j in range(height):
-            # Generate noise value between -1 and 1
-            value = noise.pnoise2(i / scale,
-                                  j / scale,
-                                  octaves=octaves,
-                                  persistence=0.5,
-                                  lacunarity=2.0,
-                                  repeatx=1024,
-                                  repeaty=1024,
-                                  base=seed)
-            # Scale the value to between 0 and 9 and ensure it's an integer
-            value = (value + 1) * 4.5  # Maps -1,1 to 0,9
-            value = int(value)  # Ensure it's an integer
-            
-            # Ensure the value is within bounds (0 to 9)
-            world[i][j] = max(0, min(9, value))
-
-    return world.astype(np.int32)  # Ensuring the array type is integer (0-9)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight')
+    return buffer.getvalue()
+
+def show_cmap_preview(cmap_name):
+    st.sidebar.image(cmap_preview_png(cmap_name))
+
+
+# Function to generate a rows x cols (default 32x32) array of random values between 0 and 9
+def generate_array(seed=None, rows:int=GRID[0], cols:int=GRID[1], rng:np.random.Generator=None):
+    '''
+    Drawn from `rng` when given, else from a RandomState of its own seeded with `seed`
+    (the same arrays the global `np.random.seed` gave, without touching global state).
+    '''
+    if rng is not None:
+        return rng.integers(0, 10, size=(rows, cols))
+    return np.random.RandomState(seed).randint(0, 10, size=(rows, cols))
+
+def generate_perlin_noise(width, height, scale=10.0, octaves=6, seed=None, persistence=0.5, lacunarity=2.0, repeat=1024, exact:bool=False, origin=(0, 0), step:int=1):
+    """
+    Generates a heightmap using Perlin noise with integer values between 0 and 9.
+
+    The whole field is computed at once with `perlin.pnoise2`. It agrees with the `noise`
+    C extension (what floors have always been rendered with) for every `seed` up to about
+    2700 on a 32x32 card, including the extension's reads past its permutation table
+    (`perlin.TABLE`). Past those the extension reads relocated or unmapped memory: its
+    values change from process to process and it can crash. `exact=True` still calls it
+    for every cell there, the slow path (`python benchmark.py noise`).
+
+    `origin` and `step` pick a window of the noise field: cell (i, j) is sampled at
+    (origin[0] + i*step, origin[1] + j*step), so a 32x32 card is the window at the origin
+    of the same world the tiles (see `tiles.TileWorld`) are cut from.
+    """
+    base = (0 if seed is None else int(seed))
+    xs = ((origin[0] + np.arange(width) * step) / scale)[:, None]
+    ys = ((origin[1] + np.arange(height) * step) / scale)[None, :]
+
+    if exact and not perlin.reproduces(xs, ys, octaves, lacunarity, repeat, repeat, base):
+        world = np.array([
+            [noise.pnoise2((origin[0] + i * step) / scale,
+                           (origin[1] + j * step) / scale,
+                           octaves=octaves,
+                           persistence=persistence,
+                           lacunarity=lacunarity,
+                           repeatx=repeat,
+                           repeaty=repeat,
+                           base=base)
+             for j in range(height)]
+            for i in range(width)
+        ])
+    else:
+        # Generate noise values between -1 and 1 for every (i, j) at once
+        world = perlin.pnoise2(
+            xs,
+            ys,
+            octaves=octaves,
+            persistence=persistence,
+            lacunarity=lacunarity,
+            repeatx=repeat,
+            repeaty=repeat,
+            base=base
+        )
+
+    # Maps -1,1 to 0,9, truncating like int() and keeping the values within bounds
+    world = np.trunc((world + 1) * 4.5)
+    return np.clip(world, 0, 9).astype(np.int32)  # Ensuring the array type is integer (0-9)
 
 # Custom colormap from a list of colors
 def custom_colormap(colorHex:list, colorName):
@@ -147,7 +316,7 @@ def custom_colormap(colorHex:list, colorName):
 def gradient_colormap(colorHex:list, colorName):
     return mcolors.LinearSegmentedColormap.from_list(colorName, colorHex)
 
-def string_to_heightmap(input_string, height=32, width=32, value_range=(0, 9)):
+def string_to_heightmap(input_string, height=GRID[0], width=GRID[1], value_range=(0, 9)):
     """
     Converts a long string into a heightmap (2D array) based on character ASCII values.
     
@@ -161,18 +330,11 @@ def string_to_heightmap(input_string, height=32, width=32, value_range=(0, 9)):
     - np.ndarray: A 2D array representing the heightmap with integer values.
     """
     
-    # Convert the string to a list of ASCII values (or Unicode code points)
-    ascii_values = [ord(c) for c in input_string]
-    
-    # If the string is too short, repeat it to fill the heightmap
-    while len(ascii_values) < height * width:
-        ascii_values.extend(ascii_values)  # Repeat the list until it's long enough
+    # Convert the string to its Unicode code points
+    ascii_values = np.frombuffer(input_string.encode('utf-32-le'), dtype='<u4').astype(np.int64)
     
-    # Trim to fit the heightmap size
-    ascii_values = ascii_values[:height * width]
-    
-    # Convert the list of ASCII values into a 2D array (height x width)
-    heightmap = np.array(ascii_values).reshape((height, width))
+    # Repeat it if too short and trim to fit the heightmap size, as a 2D array (height x width)
+    heightmap = np.resize(ascii_values, height * width).reshape((height, width))
     
     # Map ASCII values to the specified value range (0-9 or other)
     min_val, max_val = value_range
@@ -181,6 +343,32 @@ def string_to_heightmap(input_string, height=32, width=32, value_range=(0, 9)):
     
     return heightmap
 
+def resample_heightmap(heightmap, rows:int, cols:int, method:str='bilinear'):
+    '''
+    Resample a heightmap (or a stack of them, the last two axes) to (rows, cols).
+
+    'bilinear' interpolates between cell centers and rounds back to integers, so larger
+    grids get smooth slopes; 'nearest' repeats/drops cells, keeping the blocky look.
+    '''
+    heightmap = np.asarray(heightmap)
+    if heightmap.shape[-2:] == (rows, cols):
+        return heightmap
+    h, w = heightmap.shape[-2:]
+    # source coordinates of each target cell center
+    y = np.clip((np.arange(rows) + 0.5) * h / rows - 0.5, 0, h - 1)
+    x = np.clip((np.arange(cols) + 0.5) * w / cols - 0.5, 0, w - 1)
+    if method == 'nearest':
+        return heightmap[..., np.round(y).astype(int)[:, None], np.round(x).astype(int)[None, :]]
+    if method != 'bilinear':
+        raise ValueError(f'Unknown resampling method {method}')
+    y0, x0 = np.floor(y).astype(int), np.floor(x).astype(int)
+    y1, x1 = np.minimum(y0 + 1, h - 1), np.minimum(x0 + 1, w - 1)
+    fy, fx = (y - y0)[:, None], (x - x0)[None, :]
+    source = heightmap.astype(np.float64)
+    top = source[..., y0, :][..., x0] * (1 - fx) + source[..., y0, :][..., x1] * fx
+    bottom = source[..., y1, :][..., x0] * (1 - fx) + source[..., y1, :][..., x1] * fx
+    return np.round(top * (1 - fy) + bottom * fy).astype(heightmap.dtype)
+
 def invert_values(heightmap):
     '''Assuming heightmap values range from 0 to 9'''
     heightmap = 9 - heightmap
@@ -189,15 +377,15 @@ def invert_values(heightmap):
 def blend_noise(heightmap, noisemap, flagged_int:int):
     return np.where(heightmap == flagged_int, noisemap, heightmap)
 
-def image_to_integer_string(image_path):
+def image_to_integer_string(image_path, rows:int=GRID[0], cols:int=GRID[1]):
     # Open the image
     img = Image.open(image_path)
     
     # Convert the image to grayscale
     img = img.convert('L')
     
-    # Resize the image to 32x32
-    img = img.resize((32, 32))
+    # Resize the image to the grid (32x32 by default), PIL takes (width, height)
+    img = img.resize((cols, rows))
     
     # Normalize pixel values to a range of 0-9
     pixel_values = np.array(img)
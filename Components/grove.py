@@ -1,15 +1,25 @@
 
 # Biome <- floor
 import os
+import copy
 import json
+import time
+import hashlib
 from . import engine
+from . import bundle
 from . import generators
+from . import heightmaps
+from . import animation
 from . import loaders
+from . import writer
+from . import profiles
+from . import timing
+from .timing import span
 import numpy as np
 import io
 
-def Px(percent, prefix):
-    return loaders.print_progress_bar(percent, 100, prefix=prefix)
+# Renderer used by FromSeed when no backend is passed, see generators.BACKENDS
+DEFAULT_BACKEND = 'atlas'
 
 class Biome:
     '''Biome class, contains the weights for heightmaps, colormaps, glyphs, and settings for quirks.'''
@@ -18,12 +28,16 @@ class Biome:
             self,
             path:str=os.getcwd(),
             biome_ID:str='DEFAULT',
+            assets:bundle.AssetBundle=None,
         ):
 
         self.biome_ID = biome_ID
 
         self.path = os.path.join(path, 'biomes', biome_ID+'.json')
+        # a fresh compiled bundle holds the file and its normalized weights, see bundle.py
+        self._bundle = (assets if assets is not None and biome_ID in assets.biomes else None)
         self.DB = self.load_file()
+        self._samplers = None
 
         pass
 
@@ -47,7 +61,30 @@ class Biome:
     def Quirks(self) -> dict[str, any]:
         return self.DB.get('quirks', ValueError('No quirks found in biome.'))
 
+    @property
+    def Samplers(self) -> dict[str, engine.Sampler]:
+        '''the biome's weights and quirk chances compiled into `engine.Sampler`s, built once.'''
+        if self._samplers is None:
+            quirks = self.Quirks
+            self._samplers = {
+                'heightmaps': self._sampler('heightmaps', self.Heightmaps),
+                'colormaps': self._sampler('colormaps', self.Colormaps),
+                'glyphs': self._sampler('glyphs', self.Glyphs),
+                'invert_heightmap': engine.Sampler.boolean(quirks.get('invert_heightmap', 0.5)),
+                'noise': engine.Sampler.boolean(quirks.get('noise', 0.5)),
+                'gradient': engine.Sampler.boolean(quirks.get('gradient', 0.5)),
+            }
+        return self._samplers
+
+    def _sampler(self, kind:str, weights:dict[str, float]) -> engine.Sampler:
+        compiled = (self._bundle.biome_weights(self.biome_ID, kind) if self._bundle else None)
+        if compiled is None:
+            return engine.Sampler.from_weights(weights)
+        return engine.Sampler(*compiled)
+
     def load_file(self):
+        if self._bundle is not None:
+            return copy.deepcopy(self._bundle.biomes[self.biome_ID]['db'])
         if (os.path.exists(self.path)):
             with open(self.path, 'r') as file:
                 return json.load(file)
@@ -70,6 +107,8 @@ class Biome:
         }
         '''
         self.DB.update(biome_data)
+        self._bundle = None
+        self._samplers = None
         self.save_file()
         return
 
@@ -83,18 +122,31 @@ class GroveFloors:
         self.path = path
         self.db_path = os.path.join(path, floorfile)
 
+        # a fresh compiled bundle holds floors.json and its normalized weights, see bundle.py
+        self._bundle = (bundle.fresh_bundle(path, 'floors') if floorfile == bundle.FLOORFILE else None)
         self.DB:dict[str, list[dict]] = self.load_file() # with biome weights for each floor
         self.biomes = self.load_biomes()
         '''# Biomes, 
         `name` (Biome_ID+'.json'), containing combination of `weights` for heightmaps, colormaps, glyphs, and settings for quirks.
         Each floor contains a different biome.'''
+        self._samplers:dict[int, engine.Sampler] = {}
 
         pass
 
     def get_floor_data(self, level:int):
         return self.DB['floors'][int(level)]
 
+    def floor_sampler(self, level:int) -> engine.Sampler:
+        '''The floor's biome weights compiled into an `engine.Sampler`, built once per level.'''
+        level = int(level)
+        if level not in self._samplers:
+            compiled = (self._bundle.floor_weights(level) if self._bundle else None)
+            self._samplers[level] = (engine.Sampler(*compiled) if compiled else engine.Sampler.from_weights(self.get_floor_data(level)))
+        return self._samplers[level]
+
     def load_file(self):
+        if self._bundle is not None:
+            return copy.deepcopy(self._bundle.floors)
         if (os.path.exists(self.db_path)):
             with open(self.db_path, 'r') as file:
                 return json.load(file)
@@ -105,9 +157,13 @@ class GroveFloors:
             json.dump(self.DB, file)
 
     def load_biomes(self):
-        biome_files = [os.path.splitext(biome)[0] for biome in os.listdir(os.path.join(self.path, 'biomes'))]
+        assets = bundle.fresh_bundle(self.path, 'biomes')
+        if assets is not None:
+            biome_files = list(assets.biomes)
+        else:
+            biome_files = [os.path.splitext(biome)[0] for biome in os.listdir(os.path.join(self.path, 'biomes'))]
         return {
-            biome_ID: Biome(self.path, biome_ID)
+            biome_ID: Biome(self.path, biome_ID, assets)
             for biome_ID in biome_files
         }
     
@@ -115,40 +171,15 @@ class GroveFloors:
         floors = self.DB.get('floors', [])
         floors.append(biome_weights)
         self.DB.update({'floors':floors})
+        self._bundle = None
+        self._samplers.clear()
         return self.save_file()
     
-def FromSeed(Gf:GroveFloors, level:int, seed, saved_maps:dict[str, int], saved_colors:dict[str, int], saved_glyphs:dict[str, int]):
-    '''Return generator details from a given level and seed'''
-    Px(5, f'SEEDx{seed}')
-    
-    biome_weights = Gf.get_floor_data(level) # floor.json biome weights
-    selected_biome = Gf.biomes[engine.WeightedDictRandomizer(biome_weights, seed).result()]
-    noise = generators.generate_perlin_noise(32, 32, seed=seed)
-
-    Px(15, f'SEEDx{seed}')
-
-    # strings of selections to use to generate the image
-    selected_heightmap = engine.WeightedDictRandomizer(selected_biome.Heightmaps, seed).result()
-    selected_colormap = engine.WeightedDictRandomizer(selected_biome.Colormaps, seed).result()
-    selected_glyphtable = engine.WeightedDictRandomizer(selected_biome.Glyphs, seed).result()
-
-    Heightmap = generators.string_to_heightmap(saved_maps[selected_heightmap])
-
-    Px(30, f'SEEDx{seed}')
-
-    # settings
-    biome_settings = selected_biome.Quirks
-
-    InvertHeightmap = engine.BooleanFromSeedWeight(seed, biome_settings.get('invert_heightmap', 0.5))
-    AddNoise = engine.BooleanFromSeedWeight(seed, biome_settings.get('noise', 0.5))
-    # heightmap modifiers
-    if (InvertHeightmap != np.False_):
-        Heightmap = generators.invert_values(Heightmap)
-    if (AddNoise != np.False_):
-        Heightmap = generators.blend_noise(Heightmap, noise, 0)
-
-    Px(40, f'SEEDx{seed}')
+# Bumped whenever a change to the renderer alters its output, retiring every cached render
+RENDER_VERSION = 1
 
+def _Generated(seed, level, biome_ID, selected_heightmap, selected_colormap, selected_glyphtable, InvertHeightmap, AddNoise, gradient, biome_settings, saved_colors) -> dict:
+    '''Assemble the selection dict (and generation name) shared by `SelectFromSeed` and `SelectBatch`.'''
     # glyph modifiers
     do_glyph_invert = biome_settings.get('invert_glyphs', False)
     do_glyph_alpha = biome_settings.get('alpha_glyphs', False)
@@ -156,23 +187,11 @@ def FromSeed(Gf:GroveFloors, level:int, seed, saved_maps:dict[str, int], saved_c
     IS_CUSTOM = (True if selected_colormap in saved_colors.keys() else False)
 
     # Determine if custom color is gradient or specific
-    if (IS_CUSTOM and engine.BooleanFromSeedWeight(seed, biome_settings.get('gradient', 0.5))):
+    if (IS_CUSTOM and gradient):
         do_gradient = True
     else:
         do_gradient = False
 
-    Px(50, f'SEEDx{seed}')
-
-    #Heightmap = saved_maps[selected_heightmap]
-    Glyphs = [g for g in saved_glyphs[selected_glyphtable][0]]
-    Glyphs_fontpath = saved_glyphs[selected_glyphtable][1]
-    Glyphs_fontsize = saved_glyphs[selected_glyphtable][2]
-
-    if (IS_CUSTOM == True):
-        selected_cmap = (generators.custom_colormap(saved_colors[selected_colormap], 'Gradient') if do_gradient else generators.custom_colormap(saved_colors[selected_colormap], 'Specified'))
-    else:
-        selected_cmap = selected_colormap
-
     GenerationName = [
         # .cg = gradient
         # .cs = specific
@@ -187,50 +206,403 @@ def FromSeed(Gf:GroveFloors, level:int, seed, saved_maps:dict[str, int], saved_c
         str(seed)
     ]
 
-    GENERATION_NAME = '_'.join(GenerationName)
-
-    Px(60, GENERATION_NAME)
-
-    dpi=300
-
-    State = generators.create_heatmap_with_symbols(
-        array=Heightmap,
-        glyphs=Glyphs,
-        seed=seed,
-        font_path=Glyphs_fontpath,
-        figsize=(16, 16),
-        dpi=dpi,
-        text=f'Level {level}',
-        cmap=selected_cmap,
-        save=True,
-        save_name=GENERATION_NAME,
-        display_zone=True,
-        custom_cmap=IS_CUSTOM,
-        fontsz=Glyphs_fontsize,
-        symbol_invert_color=do_glyph_invert,
-        symbol_semi_transparent=do_glyph_alpha,
-        base_directory=Gf.path
-    )
-
-    generated = {
+    return {
         'seed': seed,
         'level': level,
-        'biome': selected_biome.biome_ID,
+        'biome': biome_ID,
         'heightmap': selected_heightmap,
         'colormap': selected_colormap,
         'glyphtable': selected_glyphtable,
         'inverted': InvertHeightmap,
         'noise': AddNoise,
-        'generation_name': GENERATION_NAME
+        'custom': IS_CUSTOM,
+        'gradient': do_gradient,
+        'invert_glyphs': do_glyph_invert,
+        'alpha_glyphs': do_glyph_alpha,
+        'generation_name': '_'.join(GenerationName)
     }
 
-    Px(80, GENERATION_NAME)
+def SelectFromSeed(Gf:GroveFloors, level:int, seed, saved_colors:dict[str, int]) -> dict:
+    '''Resolve every seed-driven decision (biome, assets, quirks) for a level, without rendering.'''
+    # every decision consumes the same first draw of the seed's generator, see engine.Sampler
+    u = engine.SeedUniform(seed)
+    selected_biome = Gf.biomes[Gf.floor_sampler(level).sample(uniforms=u)]
+    samplers = selected_biome.Samplers
 
-    # write png to IO buffer
-    png_buffer = io.BytesIO()
-    State.savefig(png_buffer, format='PNG', dpi=dpi, bbox_inches='tight')
+    # strings of selections to use to generate the image
+    selected_heightmap = samplers['heightmaps'].sample(uniforms=u)
+    selected_colormap = samplers['colormaps'].sample(uniforms=u)
+    selected_glyphtable = samplers['glyphs'].sample(uniforms=u)
 
-    Px(95, GENERATION_NAME)
-    State.close()
+    # settings
+    biome_settings = selected_biome.Quirks
 
-    return (generated, png_buffer)
\ No newline at end of file
+    InvertHeightmap = samplers['invert_heightmap'].sample(uniforms=u)
+    AddNoise = samplers['noise'].sample(uniforms=u)
+    Gradient = (selected_colormap in saved_colors.keys()) and samplers['gradient'].sample(uniforms=u)
+
+    return _Generated(seed, level, selected_biome.biome_ID, selected_heightmap, selected_colormap, selected_glyphtable, InvertHeightmap, AddNoise, Gradient, biome_settings, saved_colors)
+
+def SelectBatch(Gf:GroveFloors, level:int, seeds, saved_colors:dict[str, int]) -> list[dict]:
+    '''
+    `SelectFromSeed` for many seeds: one uniform draw per seed (see `engine.SeedUniforms`),
+    then every decision resolved as an array, one biome at a time.
+    '''
+    seeds = list(seeds)
+    uniforms = engine.SeedUniforms(seeds)
+
+    biome_IDs = Gf.floor_sampler(level).sample(uniforms=uniforms)
+
+    selections = [None] * len(seeds)
+    for biome_ID in np.unique(biome_IDs):
+        members = np.flatnonzero(biome_IDs == biome_ID)
+        u = uniforms[members]
+        biome = Gf.biomes[biome_ID]
+        biome_settings = biome.Quirks
+        samplers = biome.Samplers
+
+        heightmaps = samplers['heightmaps'].sample(uniforms=u)
+        colormaps = samplers['colormaps'].sample(uniforms=u)
+        glyphtables = samplers['glyphs'].sample(uniforms=u)
+        inverted = samplers['invert_heightmap'].sample(uniforms=u)
+        noise = samplers['noise'].sample(uniforms=u)
+        gradient = samplers['gradient'].sample(uniforms=u)
+
+        for k, i in enumerate(members):
+            selections[i] = _Generated(seeds[i], level, biome.biome_ID, heightmaps[k], colormaps[k], glyphtables[k], inverted[k], noise[k], gradient[k], biome_settings, saved_colors)
+
+    return selections
+
+def RenderKey(Gf:GroveFloors, generated:dict, saved_maps:dict[str, int], saved_colors:dict[str, int], saved_glyphs:dict[str, int], backend:str=None, exact_noise:bool=False, profile=None, grid=None, cell_px:int=None) -> str:
+    '''
+    Content address of a render: the selection plus a hash of every asset it reads
+    (floor weights, biome, heightmap, colormap, glyphtable), the output profile and grid.
+    Editing an asset changes the key of exactly the renders that used it.
+    '''
+    colormap = generated['colormap']
+    assets = [
+        RENDER_VERSION,
+        (backend if backend else DEFAULT_BACKEND),
+        exact_noise,
+        {k: (v.item() if isinstance(v, np.generic) else v) for k, v in generated.items() if k not in ('output', 'timings')},
+        Gf.get_floor_data(generated['level']),
+        Gf.biomes[generated['biome']].DB,
+        saved_maps[generated['heightmap']],
+        (list(saved_colors[colormap]) if generated['custom'] else colormap),
+        list(saved_glyphs[generated['glyphtable']]),
+    ]
+    profile = profiles.get_profile(profile)
+    if profile:
+        # appended only when set, so renders without a profile keep their old keys
+        assets.append(vars(profile))
+    if (grid and tuple(grid) != generators.GRID) or cell_px:
+        assets.append({'grid': (list(grid) if grid else None), 'cell_px': cell_px})
+    return hashlib.sha256(json.dumps(assets, sort_keys=True, default=str).encode('UTF-8')).hexdigest()
+
+def _Shared(shared:dict, key, make):
+    '''Memoize `make()` under `key` in `shared` (a plain dict, or None for no sharing).'''
+    if shared is None:
+        return make()
+    if key not in shared:
+        shared[key] = make()
+    return shared[key]
+
+def _ColorTable(Gf:GroveFloors, saved_colors:dict[str, int], name:str):
+    '''A custom colormap's colors: the bundle's RGBA table while it holds the same hex list, else the list.'''
+    colors = saved_colors[name]
+    assets = bundle.fresh_bundle(Gf.path, 'colors')
+    if assets is not None and assets.colors.get(name) == list(colors):
+        return assets.color_rgba(name)
+    return colors
+
+def PrepareSelection(Gf:GroveFloors, generated:dict, saved_maps:dict[str, int], saved_colors:dict[str, int], saved_glyphs:dict[str, int], exact_noise:bool=False, shared:dict=None, timer:timing.Timer=None, grid=None) -> dict:
+    '''
+    Everything but the rendering of a `SelectFromSeed` result: the heightmap (with its
+    modifiers), glyphs, font and colormap, as keyword arguments of
+    `generators.create_heatmap_with_symbols` (and `generators.composite_heatmap_frame`).
+    See `RenderSelection` for `shared`, `timer` and `grid`.
+    '''
+    seed = generated['seed']
+    level = generated['level']
+    grid = (tuple(grid) if grid else generators.GRID)
+
+    with span(timer, 'heightmap'):
+        # a read-only uint8 view of the templates parsed once per process (see heightmaps.HeightmapBank)
+        Heightmap = heightmaps.bank_for(saved_maps).resampled(*grid).get(generated['heightmap'])
+
+        # heightmap modifiers (the first one copies, the bank is never modified)
+        if (generated['inverted'] != np.False_):
+            Heightmap = heightmaps.invert(Heightmap)
+    if (generated['noise'] != np.False_):
+        with span(timer, 'noise'):
+            noise = generators.generate_perlin_noise(*grid, seed=seed, exact=exact_noise)
+            Heightmap = heightmaps.blend(Heightmap, noise, 0, out=(Heightmap if Heightmap.flags.writeable else None))
+
+    with span(timer, 'colormap'):
+        Glyphs = _Shared(shared, ('glyphs', generated['glyphtable']), lambda: [g for g in saved_glyphs[generated['glyphtable']][0]])
+        Glyphs_fontpath = saved_glyphs[generated['glyphtable']][1]
+        Glyphs_fontsize = saved_glyphs[generated['glyphtable']][2]
+
+        if (generated['custom'] == True):
+            selected_cmap = _Shared(shared, ('cmap', generated['colormap'], generated['gradient']), lambda: generators.custom_colormap(_ColorTable(Gf, saved_colors, generated['colormap']), ('Gradient' if generated['gradient'] else 'Specified')))
+        else:
+            selected_cmap = generated['colormap']
+
+    return {
+        'array': Heightmap,
+        'glyphs': Glyphs,
+        'seed': seed,
+        'font_path': Glyphs_fontpath,
+        'text': f'Level {level}',
+        'cmap': selected_cmap,
+        'save_name': generated['generation_name'],
+        'display_zone': True,
+        'fontsz': Glyphs_fontsize,
+        'symbol_invert_color': generated['invert_glyphs'],
+        'symbol_semi_transparent': generated['alpha_glyphs'],
+    }
+
+def RenderSelection(Gf:GroveFloors, generated:dict, saved_maps:dict[str, int], saved_colors:dict[str, int], saved_glyphs:dict[str, int], backend:str=None, exact_noise:bool=False, shared:dict=None, profile=None, timer:timing.Timer=None, grid=None, cell_px:int=None) -> io.BytesIO:
+    '''Render the image for a `SelectFromSeed` result.
+
+    `shared` is a dict reused across calls (see `FromSeedBatch`) so colormaps and glyph
+    lists are prepared once per asset instead of once per seed. Heightmaps come from the
+    process-wide `heightmaps.HeightmapBank` of `saved_maps`, parsed once.
+
+    `profile` (see `profiles.PROFILES`) sets the pixel size and codec, and its encode
+    report is stored in `generated['output']`; None is the full size 300 dpi PNG.
+
+    With a `timing.Timer`, the heightmap, noise, colormap, glyphs (drawing/compositing),
+    rasterize and encode stages are timed as spans.
+
+    `grid` (rows, cols) resamples the heightmap asset (`generators.resample_heightmap`)
+    and sizes the noise and figure to it; `cell_px` fixes the pixel size of a cell.'''
+    grid = (tuple(grid) if grid else generators.GRID)
+    selection = PrepareSelection(Gf, generated, saved_maps, saved_colors, saved_glyphs, exact_noise, shared, timer, grid)
+
+    profile = profiles.get_profile(profile)
+    figsize = generators.grid_figsize(grid)
+    if cell_px:
+        dpi = generators.cell_dpi(cell_px, grid, figsize)
+    else:
+        dpi = (profile.render_dpi(figsize, 300) if profile else 300)
+
+    with span(timer, 'glyphs'):
+        State = generators.create_heatmap_with_symbols(
+            **selection,
+            figsize=figsize,
+            dpi=dpi,
+            save=False,
+            custom_cmap=generated['custom'],
+            base_directory=Gf.path,
+            backend=(backend if backend else DEFAULT_BACKEND)
+        )
+
+    if profile:
+        data, generated['output'] = profiles.render(State, profile, dpi)
+        if timer is not None:
+            timer.add('rasterize', generated['output']['rasterize_seconds'])
+            timer.add('encode', generated['output']['encode_seconds'])
+        return io.BytesIO(data)
+
+    # write png to IO buffer, the only rasterize & encode pass
+    # (the atlas image is already rasterized, matplotlib rasterizes here)
+    with span(timer, 'encode'):
+        png_buffer = io.BytesIO()
+        State.savefig(png_buffer, format='PNG', dpi=dpi, bbox_inches='tight')
+        State.close()
+
+    return png_buffer
+
+def FromSeed(Gf:GroveFloors, level:int, seed, saved_maps:dict[str, int], saved_colors:dict[str, int], saved_glyphs:dict[str, int], backend:str=None, exact_noise:bool=False, archive:bool=True, cache=None, profile=None, grid=None, cell_px:int=None):
+    '''Return generator details from a given level and seed.
+
+    Noise is vectorized, the `noise` C extension's values for every seed whose reads it
+    makes deterministically (see perlin.TABLE). `exact_noise` calls the extension per cell
+    for the larger seeds, the slow path (`python benchmark.py noise`), for values that
+    depend on the process anyway (see generators.generate_perlin_noise).
+
+    The figure is rasterized and encoded once; the same PNG bytes are returned and, with
+    `archive`, handed to the background writer for the copy in `output/`.
+
+    With a `cache.RenderCache`, renders are looked up by `RenderKey` first and only
+    rendered (and archived) on a miss.
+
+    `profile` picks the output size and codec (see `profiles.PROFILES`); the encode
+    report ends up in `generated['output']`.
+
+    Every stage is timed (see `timing.Timer`); the record is published to `timing.SINKS`
+    and kept in `generated['timings']`.
+
+    `grid` renders the floor at (rows, cols) cells instead of 32x32 and `cell_px` sets
+    the pixel size of each cell (see `RenderSelection`).'''
+    timer = timing.Timer('render', level=level, seed=seed)
+
+    with timer.span('selection'):
+        generated = SelectFromSeed(Gf, level, seed, saved_colors)
+    GENERATION_NAME = generated['generation_name']
+    timer.labels['generation'] = GENERATION_NAME
+
+    key = None
+    if cache is not None:
+        with timer.span('cache'):
+            key = RenderKey(Gf, generated, saved_maps, saved_colors, saved_glyphs, backend, exact_noise, profile, grid, cell_px)
+            cached = cache.get(key)
+        if cached is not None:
+            if profile:
+                generated['output'] = {'profile': profiles.get_profile(profile).name, 'bytes': len(cached), 'cached': True}
+            timer.labels['cached'] = True
+            generated['timings'] = timer.finish()
+            return (generated, io.BytesIO(cached))
+
+    png_buffer = RenderSelection(Gf, generated, saved_maps, saved_colors, saved_glyphs, backend, exact_noise, profile=profile, timer=timer, grid=grid, cell_px=cell_px)
+
+    with timer.span('save'):
+        if key is not None:
+            cache.put(key, png_buffer.getvalue())
+
+        if archive:
+            # archive copy is written off the request's critical path
+            writer.archive_writer().submit(os.path.join(Gf.path, 'output', GENERATION_NAME + profiles.suffix(profile)), png_buffer.getvalue())
+
+    generated['timings'] = timer.finish()
+    return (generated, png_buffer)
+
+def FromSeedBatch(Gf:GroveFloors, level:int, seeds, saved_maps:dict[str, int], saved_colors:dict[str, int], saved_glyphs:dict[str, int], backend:str=None, exact_noise:bool=False, archive:bool=True, cache=None, profile=None, grid=None, cell_px:int=None):
+    '''
+    `FromSeed` for an array of seeds on one level, yielding `(generated, png_bytes)` per
+    seed in order, each identical to what `FromSeed` gives for that seed.
+
+    Selections are resolved for all seeds up front (`SelectBatch`) and seeds are rendered
+    grouped by the assets they use, sharing each colormap and glyph list.
+    Results are still yielded in seed order, held back only until their turn comes.
+
+    Each seed gets its own timing record like `FromSeed`, with an equal share of the
+    batch selection as its 'selection' span.
+    '''
+    start = time.perf_counter()
+    selections = SelectBatch(Gf, level, seeds, saved_colors)
+    selection_seconds = (time.perf_counter() - start) / max(1, len(selections))
+
+    order = sorted(range(len(selections)), key=lambda i: (selections[i]['heightmap'], selections[i]['glyphtable'], selections[i]['colormap']))
+    shared = {}
+    done = {}
+    next_index = 0
+
+    for i in order:
+        generated = selections[i]
+        GENERATION_NAME = generated['generation_name']
+        timer = timing.Timer('render', level=level, seed=generated['seed'], generation=GENERATION_NAME)
+        timer.add('selection', selection_seconds)
+        timer.start -= selection_seconds # so the total includes it too
+
+        key = None
+        png_bytes = None
+        if cache is not None:
+            with timer.span('cache'):
+                key = RenderKey(Gf, generated, saved_maps, saved_colors, saved_glyphs, backend, exact_noise, profile, grid, cell_px)
+                png_bytes = cache.get(key)
+            timer.labels['cached'] = (png_bytes is not None)
+
+        if png_bytes is None:
+            png_bytes = RenderSelection(Gf, generated, saved_maps, saved_colors, saved_glyphs, backend, exact_noise, shared, profile, timer, grid, cell_px).getvalue()
+            with timer.span('save'):
+                if key is not None:
+                    cache.put(key, png_bytes)
+                if archive:
+                    writer.archive_writer().submit(os.path.join(Gf.path, 'output', GENERATION_NAME + profiles.suffix(profile)), png_bytes)
+
+        generated['timings'] = timer.finish()
+        done[i] = (generated, png_bytes)
+
+        while next_index in done:
+            yield done.pop(next_index)
+            next_index += 1
+
+def _AnimationSize(profile, grid, cell_px:int=None):
+    '''(figsize, dpi) of animation frames, sized like `RenderSelection` sizes a still.'''
+    figsize = generators.grid_figsize(grid)
+    if cell_px:
+        return figsize, generators.cell_dpi(cell_px, grid, figsize)
+    return figsize, (profile.render_dpi(figsize, 300) if profile else 300)
+
+def _EncodeAnimation(frames, compositor, profile, format, duration:int, loop:int, timer:timing.Timer) -> tuple[bytes, dict]:
+    format = (format if format else (profile.format if profile and profile.format in animation.FORMATS else 'PNG'))
+    with timer.span('encode'):
+        data, report = animation.encode_frames(
+            frames, format, duration, loop,
+            quality=(profile.quality if profile else 90), lossless=(profile.lossless if profile else False)
+        )
+    report.update(compositor.stats())
+    return data, report
+
+def AnimateShift(Gf:GroveFloors, level:int, seed, saved_maps:dict[str, int], saved_colors:dict[str, int], saved_glyphs:dict[str, int], shifts=None, format:str=None, duration:int=120, loop:int=0, exact_noise:bool=False, archive:bool=True, profile='discord', grid=None, cell_px:int=None):
+    '''Return generator details and an animation of the floor of a level and seed as its glyph shift cycles.
+
+    `shifts` are the glyph shifts of the frames, by default every shift of the glyphtable
+    starting from the seed's own, so the first frame is the floor `FromSeed` renders (atlas
+    backend). Frames are composited on one `animation.FrameCompositor`: the heightmap,
+    colors and labels are prepared once and each frame only redraws the cells whose glyph
+    changes.
+
+    `format` is 'PNG' (APNG), 'GIF' or 'WEBP' (see `animation.FORMATS`), by default the
+    profile's codec when it is one of them. `profile` only sizes the frames (never scaled
+    afterwards, that would spoil the deltas) and sets the WebP quality. `duration` is ms per frame.
+
+    The encode report (frames, bytes, share of cells composited) ends up in
+    `generated['output']`, the timings in `generated['timings']`.'''
+    timer = timing.Timer('animation', level=level, seed=seed, sweep='shift')
+    profile = profiles.get_profile(profile)
+    grid = (tuple(grid) if grid else generators.GRID)
+
+    with timer.span('selection'):
+        generated = SelectFromSeed(Gf, level, seed, saved_colors)
+    selection = PrepareSelection(Gf, generated, saved_maps, saved_colors, saved_glyphs, exact_noise, timer=timer, grid=grid)
+    glyph_count = len(selection['glyphs'])
+    shifts = (list(shifts) if shifts is not None else [(seed + k) % glyph_count for k in range(glyph_count)])
+
+    compositor = animation.FrameCompositor(*_AnimationSize(profile, grid, cell_px))
+    with timer.span('glyphs'):
+        frames = [generators.composite_heatmap_frame(compositor, shift=shift, **selection).copy() for shift in shifts]
+
+    data, generated['output'] = _EncodeAnimation(frames, compositor, profile, format, duration, loop, timer)
+
+    if archive:
+        writer.archive_writer().submit(os.path.join(Gf.path, 'output', generated['generation_name'] + '.shift' + animation.FORMATS[generated['output']['format']]), data)
+
+    generated['timings'] = timer.finish()
+    return (generated, io.BytesIO(data))
+
+def AnimateSeeds(Gf:GroveFloors, level:int, seeds, saved_maps:dict[str, int], saved_colors:dict[str, int], saved_glyphs:dict[str, int], format:str=None, duration:int=250, loop:int=0, exact_noise:bool=False, archive:bool=True, profile='discord', grid=None, cell_px:int=None):
+    '''Return the selections of `seeds` on a level and an animation sweeping through their floors, one frame per seed.
+
+    Each frame is what `FromSeed` renders for its seed (atlas backend). Selections are
+    resolved at once (`SelectBatch`), colormaps and glyph lists shared, and frames composited
+    on one `animation.FrameCompositor`, so seeds that keep the heightmap and colors (only the
+    noise or glyph shift differ) only redraw the cells that change. See `AnimateShift` for
+    `format`, `profile` and `duration`.
+
+    The encode report is returned in a dict with the timings: `(selections, buffer, report)`.'''
+    seeds = list(seeds)
+    timer = timing.Timer('animation', level=level, seeds=len(seeds), sweep='seeds')
+    profile = profiles.get_profile(profile)
+    grid = (tuple(grid) if grid else generators.GRID)
+
+    with timer.span('selection'):
+        selections = SelectBatch(Gf, level, seeds, saved_colors)
+
+    shared = {}
+    compositor = animation.FrameCompositor(*_AnimationSize(profile, grid, cell_px))
+    frames = []
+    for generated in selections:
+        selection = PrepareSelection(Gf, generated, saved_maps, saved_colors, saved_glyphs, exact_noise, shared, timer, grid)
+        with timer.span('glyphs'):
+            frames.append(generators.composite_heatmap_frame(compositor, **selection).copy())
+
+    data, report = _EncodeAnimation(frames, compositor, profile, format, duration, loop, timer)
+
+    if archive:
+        writer.archive_writer().submit(os.path.join(Gf.path, 'output', f'level{level}_{seeds[0]}-{seeds[-1]}.seeds' + animation.FORMATS[report['format']]), data)
+
+    report['timings'] = timer.finish()
+    return (selections, io.BytesIO(data), report)
@@ -0,0 +1,154 @@
+# Heightmap bank: every heightmap template parsed once into one (N, H, W) uint8 stack, with vectorized transforms
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from . import generators
+from .bundle import fresh_bundle, bundle_of
+
+# Heightmap values run 0..MAX_VALUE
+MAX_VALUE = 9
+
+def parse_heightmaps(texts, height:int=generators.GRID[0], width:int=generators.GRID[1]) -> np.ndarray:
+    '''
+    `string_to_heightmap` of many strings at once, as an (N, height, width) uint8 stack.
+    Every string is tiled to height*width code points and rescaled to 0-9 per map, with
+    the same arithmetic, so each map is identical to its `string_to_heightmap`.
+    '''
+    cells = height * width
+    codes = np.stack([np.resize(np.frombuffer(text.encode('utf-32-le'), dtype='<u4'), cells) for text in texts]).astype(np.int64)
+    low = codes.min(axis=1, keepdims=True)
+    high = codes.max(axis=1, keepdims=True)
+    scaled = (codes - low) / (high - low) * MAX_VALUE
+    return scaled.astype(int).astype(np.uint8).reshape(len(texts), height, width)
+
+def invert(maps, out=None) -> np.ndarray:
+    '''9 - value for one map or a stack, in uint8; `out=maps` inverts in place.'''
+    return np.subtract(np.uint8(MAX_VALUE), maps, out=out, dtype=np.uint8)
+
+def blend(maps, noise, flagged:int=0, out=None) -> np.ndarray:
+    '''
+    Cells equal to `flagged` take the `noise` value (`generators.blend_noise`), for one map
+    or a stack (noise broadcasts); `out=maps` blends in place, otherwise a copy is returned.
+    '''
+    flagged_cells = (maps == flagged)
+    if out is None:
+        out = np.array(maps, dtype=np.uint8)
+    elif out is not maps:
+        np.copyto(out, maps)
+    np.copyto(out, noise, where=flagged_cells, casting='unsafe')
+    return out
+
+class HeightmapBank:
+    '''
+    Heightmap templates as one contiguous (N, H, W) uint8 array with a name index.
+
+        bank = bank_for(saved_maps)        # parsed once per set of templates
+        heightmap = bank.get('heightmap1') # read-only view, no parsing
+        stack = bank.apply(names, inverted=[True, False], noise=noise_stack)
+
+    `get` hands out read-only views of the shared stack; `take`/`apply` return new
+    arrays the transforms (`invert`, `blend`) can work on in place.
+    '''
+
+    def __init__(self, names, maps:np.ndarray):
+
+        self.names = list(names)
+        self.maps = maps
+        self.maps.flags.writeable = False
+        self.index = {name: k for k, name in enumerate(self.names)}
+
+        self._lock = threading.Lock()
+        self._resampled:dict[tuple, HeightmapBank] = {}
+
+        pass
+
+    def __repr__(self):
+        return f"HeightmapBank({len(self.names)} maps, {self.shape[0]}x{self.shape[1]}, {self.maps.nbytes} bytes)"
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        '''(rows, cols) of every map.'''
+        return self.maps.shape[1:]
+
+    @classmethod
+    def from_texts(cls, texts:dict[str, str], height:int=generators.GRID[0], width:int=generators.GRID[1]):
+        return cls(texts.keys(), parse_heightmaps(list(texts.values()), height, width))
+
+    @classmethod
+    def load(cls, root=os.getcwd()):
+        '''The compiled bundle's stack when it is fresh (no parsing at all), else the loose files.'''
+        bundle = fresh_bundle(root, 'heightmaps')
+        if bundle is not None:
+            return bundle.heightmap_bank
+        from .loaders import SavedMaps
+        return cls.from_texts(SavedMaps(root).maps)
+
+    def get(self, name) -> np.ndarray:
+        return self.maps[self.index[name]]
+
+    def take(self, names) -> np.ndarray:
+        '''A writable (k, H, W) copy of the named maps.'''
+        return self.maps[[self.index[name] for name in names]]
+
+    def apply(self, names, inverted=None, noise=None, flagged:int=0) -> np.ndarray:
+        '''
+        The named maps with their heightmap modifiers applied as a batch: `inverted` (a bool per
+        map) inverts those maps, then their cells equal to `flagged` take `noise` ((k, H, W) or
+        one (H, W) for all, None for no blending).
+        '''
+        maps = self.take(names)
+        if inverted is not None:
+            inverted = np.asarray(inverted, dtype=bool)
+            maps[inverted] = invert(maps[inverted])
+        if noise is not None:
+            blend(maps, noise, flagged, out=maps)
+        return maps
+
+    def resampled(self, rows:int, cols:int, method:str='bilinear'):
+        '''This bank at (rows, cols) (`generators.resample_heightmap` of the whole stack), kept once made.'''
+        if (rows, cols) == self.shape:
+            return self
+        key = (rows, cols, method)
+        with self._lock:
+            bank = self._resampled.get(key)
+        if bank is None:
+            bank = HeightmapBank(self.names, generators.resample_heightmap(self.maps, rows, cols, method))
+            with self._lock:
+                bank = self._resampled.setdefault(key, bank)
+        return bank
+
+# Banks by set of templates, see bank_for
+_BANKS:OrderedDict[int, tuple] = OrderedDict()
+_BANKS_LOCK = threading.Lock()
+_BANKS_KEPT = 4
+
+def bank_for(saved_maps) -> HeightmapBank:
+    '''
+    The bank of a `SavedMaps.maps` mapping. Maps read from a compiled bundle get its
+    memory-mapped stack (shared by every process, nothing parsed); loose files are parsed
+    on first use and reused while the templates are the same strings (the catalog hands
+    out the same objects until a file changes).
+    '''
+    bundle = bundle_of(saved_maps)
+    if bundle is not None:
+        return bundle.heightmap_bank
+    items = tuple(saved_maps.items())
+    key = hash(items)
+    with _BANKS_LOCK:
+        cached = _BANKS.get(key)
+        if cached is not None and cached[0] == items:
+            _BANKS.move_to_end(key)
+            return cached[1]
+    bank = HeightmapBank.from_texts(dict(items))
+    with _BANKS_LOCK:
+        _BANKS[key] = (items, bank)
+        while len(_BANKS) > _BANKS_KEPT:
+            _BANKS.popitem(last=False)
+    return bank
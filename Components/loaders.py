@@ -1,11 +1,26 @@
 import os
 import json
+from .catalog import CATALOG
+from .bundle import fresh_bundle
 
 def read_file_as_list(file_path):
     '''Returns list of lines from file (UTF-8).'''
     with open(file_path, 'r', encoding='UTF-8') as file:
         return [line.strip() for line in file]
 
+def read_file_as_tuple(file_path):
+    '''Returns tuple of lines from file (UTF-8), the immutable form kept by the catalog.'''
+    return tuple(read_file_as_list(file_path))
+
+def read_file_as_string(file_path):
+    try:
+        with open(file_path, 'r') as file:
+            return file.read()
+    except FileNotFoundError:
+        return f"Error: The file at {file_path} was not found."
+    except Exception as e:
+        return f"Error: {e}"
+
 # Function to display the progress bar
 def print_progress_bar(iteration, total, prefix='', suffix='', length = 20):
     """
@@ -26,27 +41,32 @@ def print_progress_bar(iteration, total, prefix='', suffix='', length = 20):
 class SavedMaps:
     '''
     Loads heightmaps from files.
+
+    Files are parsed once per process through `catalog.CATALOG` and only re-read when their
+    mtime or size changed; `maps` is a new dict over the cached values on every access. A
+    fresh compiled bundle (`python -m Components.bundle`) is preferred over the loose files.
     '''
 
     def __init__(self, path=os.getcwd()):
 
-        self.path = os.path.join(path, 'heightmaps')
+        self.root = path
 
-        self.items = [item for item in next(os.walk(self.path))[2]]
+        self.path = os.path.join(path, 'heightmaps')
 
         pass
+
+    @property
+    def items(self):
+        return CATALOG.listdir(self.path)
     
     def read_file_as_string(self, file_path):
-        try:
-            with open(file_path, 'r') as file:
-                return file.read()
-        except FileNotFoundError:
-            return f"Error: The file at {file_path} was not found."
-        except Exception as e:
-            return f"Error: {e}"
+        return CATALOG.load(file_path, read_file_as_string)
     
     @property
     def maps(self):
+        bundle = fresh_bundle(self.root, 'heightmaps')
+        if bundle is not None:
+            return dict(bundle.heightmap_texts)
         return {
             os.path.splitext(item)[0]:
             self.read_file_as_string(os.path.join(self.path, item)) for item in self.items}
@@ -54,43 +74,67 @@ class SavedMaps:
 
 class SavedColors:
     '''
-    Loads colormaps from files.
+    Loads colormaps from files (cached, see `SavedMaps`).
     '''
 
     def __init__(self, path=os.getcwd()):
 
-        self.path = os.path.join(path, 'colors')
+        self.root = path
 
-        self.items = [item for item in next(os.walk(self.path))[2]]
+        self.path = os.path.join(path, 'colors')
 
         pass
 
+    @property
+    def items(self):
+        return CATALOG.listdir(self.path)
+
     @property
     def maps(self):
+        bundle = fresh_bundle(self.root, 'colors')
+        if bundle is not None:
+            return {name: list(hexes) for name, hexes in bundle.colors.items()}
         return {
             os.path.splitext(item)[0]:
-            read_file_as_list(os.path.join(self.path, item)) for item in self.items
+            list(CATALOG.load(os.path.join(self.path, item), read_file_as_tuple)) for item in self.items
         }
 
+# What SavedGlyphs does with the glyph coverage index when tables are loaded
+COVERAGE_MODES = ('report', 'index', None)
+
 class SavedGlyphs:
     '''
-    Loads glyphs and fonts from files.
+    Loads glyphs and fonts from files (cached, see `SavedMaps`).
+
+    Every table is checked against its font's cmap once per process when loaded
+    (`fonts.FONTS.coverage`): glyphs the font lacks are drawn with the fallback font
+    resolved then, and with `coverage='report'` tables with a missing font, fallback
+    or uncovered glyphs are printed. 'index' checks quietly (worker processes), None skips it.
     '''
 
-    def __init__(self, path=os.getcwd(), fontdir='/usr/share/fonts/truetype/noto/'):
+    def __init__(self, path=os.getcwd(), fontdir='/usr/share/fonts/truetype/noto/', coverage:str|None='report'):
+
+        if coverage not in COVERAGE_MODES:
+            raise ValueError(f'Unknown coverage {coverage}, expected one of {COVERAGE_MODES}')
+
+        self.root = path
 
         self.path = os.path.join(path, 'glyphtables')
 
         self.fontdir = fontdir
 
-        self.items = [item for item in next(os.walk(self.path))[2]]
+        self.check_coverage = coverage
 
         pass
 
+    @property
+    def items(self):
+        return CATALOG.listdir(self.path)
+
     @property
     def maps(self)-> dict[str, list[str|int]]:
         '''
-        Reads glyphs and fonts from files.
+        Reads glyphs and fonts from files (and indexes their coverage, see the class).
         
         ### parameters
             
@@ -103,6 +147,38 @@ class SavedGlyphs:
                 ]
             }
         '''
+        tables = self._tables()
+        if self.check_coverage:
+            self._index(tables)
+        return tables
+
+    @property
+    def coverage(self) -> dict[str, 'GlyphCoverage']:
+        '''The `fonts.GlyphCoverage` of every table, built once per table and font.'''
+        from .fonts import FONTS
+        return {name: FONTS.coverage(glyphs, font_path) for name, (glyphs, font_path, _) in self._tables().items()}
+
+    def _index(self, tables):
+        from .fonts import FONTS
+        for name, (glyphs, font_path, _) in tables.items():
+            if FONTS.indexed(glyphs, font_path):
+                continue
+            coverage = FONTS.coverage(glyphs, font_path)
+            if self.check_coverage == 'report' and not coverage.complete:
+                print(f"Warning: glyphtable {coverage.describe(name)}")
+
+    def _tables(self):
+        bundle = fresh_bundle(self.root, 'glyphtables')
+        if bundle is not None:
+            same_fontdir = (bundle.header['fontdir'] == self.fontdir)
+            return {
+                name: [
+                    table['glyphs'],
+                    (table['font_path'] if same_fontdir else os.path.join(self.fontdir, table['font'])),
+                    table['font_size']
+                ]
+                for name, table in bundle.glyphtables.items()
+            }
         return {
             os.path.splitext(filename)[0]: [
                 filedata[1],                             # Glyphs
@@ -110,5 +186,5 @@ class SavedGlyphs:
                 int(filedata[2])                         # Font Size (Generative Iter)
             ]
             for filename in self.items
-            for filedata in [read_file_as_list(os.path.join(self.path, filename))]
+            for filedata in [CATALOG.load(os.path.join(self.path, filename), read_file_as_tuple)]
         }
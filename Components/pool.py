@@ -0,0 +1,186 @@
+# Pre-warmed process pool for FromSeed renders, so the bot's event loop never renders itself
+import os
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from . import writer
+from . import cache
+from . import profiles
+from . import timing
+
+# Worker-local state, filled once by _warm when the worker process starts
+_STATE = {}
+
+def _warm(path, fontdir, trial_level, cache_dir=None, profile=None):
+    '''Worker initializer: import the renderer, load every asset and do one throwaway render.'''
+    import matplotlib
+    matplotlib.use('Agg')
+    from . import grove
+    from . import loaders
+
+    os.chdir(path)
+    _STATE['Gf'] = grove.GroveFloors(path)
+    _STATE['saved_maps'] = loaders.SavedMaps(path).maps
+    _STATE['saved_colors'] = loaders.SavedColors(path).maps
+    # coverage is indexed quietly, every recycled worker would report the same tables again
+    _STATE['saved_glyphs'] = (loaders.SavedGlyphs(path, fontdir, coverage='index').maps if fontdir else loaders.SavedGlyphs(path, coverage='index').maps)
+    # memory tier per worker, the disk tier is shared by every worker using `cache_dir`
+    _STATE['cache'] = (cache.RenderCache(directory=cache_dir) if cache_dir else None)
+
+    if trial_level is not None:
+        try:
+            # fills the font, glyph atlas and matplotlib caches before the first real job
+            grove.FromSeed(level=trial_level, seed=0, archive=False, profile=profile, **_loaded())
+        except Exception as e:
+            print(f"Warning: trial render failed in worker {os.getpid()}: {e}")
+
+def _loaded():
+    return {k: _STATE[k] for k in ('Gf', 'saved_maps', 'saved_colors', 'saved_glyphs')}
+
+def _render(level, seed, kwargs) -> tuple[dict, bytes]:
+    '''Runs in a worker: one FromSeed render, returned as (generated, png_bytes).'''
+    from . import grove
+    generated, png_buffer = grove.FromSeed(level=level, seed=seed, archive=False, cache=_STATE['cache'], **kwargs, **_loaded())
+    return (generated, png_buffer.getvalue())
+
+def _cache_stats():
+    return (_STATE['cache'].stats() if _STATE['cache'] is not None else {})
+
+def _ping():
+    return os.getpid()
+
+class _Worker:
+    '''One render process, wrapped in its own single-process executor so it can be recycled alone.'''
+
+    def __init__(self, initargs):
+
+        self.executor = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_warm,
+            initargs=initargs
+        )
+        self.jobs = 0
+        # spawning happens on the first submit, so start (and pre-warm) the process right away
+        self.ready = self.executor.submit(_ping)
+
+        pass
+
+    def retire(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+class RenderPool:
+    '''
+    A pool of pre-warmed render processes.
+
+    - `size` worker processes, each loading assets and rendering once at spawn.
+    - A worker is replaced after `max_jobs` renders to cap memory growth; its
+      replacement warms up in the background.
+    - A crashed worker breaks only its own job: it is replaced and the job retried once.
+    - Archive copies are written by this (parent) process, since retired workers
+      exit without running their own background writer to completion. `render`
+      never waits for room in the writer's queue: when the disk falls behind the
+      copy is dropped (and logged) rather than stalling the event loop.
+    - With `cache_dir`, workers look renders up in a `cache.RenderCache` first.
+    - `profile` is the default output profile of `render` (see `profiles.PROFILES`),
+      also used for the warm-up render so the caches match the real jobs.
+    - Each job's stage timings come back from the worker and are published to this
+      process's `timing.SINKS`, with a 'pool' span for the wait and transfer.
+    '''
+
+    def __init__(self, size:int=2, max_jobs:int=50, path=os.getcwd(), fontdir=None, trial_level:int|None=0, cache_dir=None, profile=None):
+
+        self.size = size
+        self.max_jobs = max_jobs
+        self.path = path
+        self.fontdir = fontdir
+        self.trial_level = trial_level
+        self.cache_dir = cache_dir
+        self.profile = profile
+
+        self.workers:list[_Worker] = []
+        self.idle = asyncio.Queue()
+        for _ in range(size):
+            self.idle.put_nowait(self._spawn())
+
+        self.recycled = 0
+        self.crashed = 0
+
+        pass
+
+    def __repr__(self):
+        return f"RenderPool(size={self.size}, max_jobs={self.max_jobs}, recycled={self.recycled}, crashed={self.crashed})"
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker((self.path, self.fontdir, self.trial_level, self.cache_dir, self.profile))
+        self.workers.append(worker)
+        return worker
+
+    def _retire(self, worker:_Worker):
+        self.workers.remove(worker)
+        worker.retire()
+
+    def warm(self):
+        '''Block until every worker has finished warming up, returns their pids.'''
+        return [worker.ready.result() for worker in list(self.workers)]
+
+    async def _run(self, level, seed, kwargs):
+        worker = await self.idle.get()
+        broken = False
+        try:
+            return await asyncio.wrap_future(worker.executor.submit(_render, level, seed, kwargs))
+        except BrokenProcessPool:
+            broken = True
+            raise
+        finally:
+            worker.jobs += 1
+            if broken or worker.jobs >= self.max_jobs:
+                self.crashed += int(broken)
+                self.recycled += int(not broken)
+                self._retire(worker)
+                worker = self._spawn()
+            self.idle.put_nowait(worker)
+
+    async def cache_stats(self) -> list[dict]:
+        '''`RenderCache.stats()` of every idle worker.'''
+        stats = []
+        for _ in range(self.idle.qsize()):
+            worker = self.idle.get_nowait()
+            try:
+                stats.append(await asyncio.wrap_future(worker.executor.submit(_cache_stats)))
+            finally:
+                self.idle.put_nowait(worker)
+        return stats
+
+    async def render(self, level, seed, archive:bool=True, **kwargs) -> tuple[dict, bytes]:
+        '''Await one render; `kwargs` are passed on to `grove.FromSeed`.'''
+        # levels arrive as text from chat commands, '1' and 1 must be the same floor (and cache key)
+        level = int(level)
+        kwargs.setdefault('profile', self.profile)
+        start = time.perf_counter()
+        try:
+            generated, png_bytes = await self._run(level, seed, kwargs)
+        except BrokenProcessPool:
+            print(f"Warning: render worker died on level {level} seed {seed}, retrying on a new worker")
+            generated, png_bytes = await self._run(level, seed, kwargs)
+
+        record = generated.get('timings')
+        if record is not None:
+            # queueing for a worker and moving the job/result between processes
+            elapsed = time.perf_counter() - start
+            record['spans']['pool'] = max(0.0, elapsed - record['total'])
+            record['total'] = elapsed
+            timing.publish(record)
+
+        if archive:
+            # never wait on a full queue here, that would stall the event loop behind the disk
+            writer.archive_writer().submit(os.path.join(self.path, 'output', generated['generation_name'] + profiles.suffix(kwargs.get('profile'))), png_bytes, block=False)
+        return (generated, png_bytes)
+
+    def shutdown(self):
+        for worker in list(self.workers):
+            self.workers.remove(worker)
+            worker.executor.shutdown(wait=True, cancel_futures=True)
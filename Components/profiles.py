@@ -0,0 +1,227 @@
+# Named output profiles: pixel size, codec and compression for rendered floors and cards
+import io
+import time
+import numpy as np
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+from . import atlas
+
+class OutputProfile:
+    '''
+    How a render is rasterized and encoded.
+
+    - `size_px`: longest side of the output in pixels (None keeps the render's own size).
+      The figure is rendered at a dpi that lands close to it, then only ever scaled down.
+    - `format`: any Pillow codec, meant for 'PNG', 'WEBP' or 'JPEG'.
+    - `quality`: WEBP/JPEG quality; `lossless` for WEBP.
+    - `compress_level`: PNG zlib level 0-9, lower encodes faster into bigger files.
+    - `strip_metadata`: drop dpi and text chunks from the file.
+    - `palette`: write PNGs palette-indexed (see `to_palette`) instead of truecolor.
+    '''
+
+    def __init__(self, name:str, size_px:int=None, format:str='PNG', quality:int=90, compress_level:int=6, lossless:bool=False, strip_metadata:bool=True, palette:bool=False):
+
+        self.name = name
+        self.size_px = size_px
+        self.format = format.upper()
+        self.quality = quality
+        self.compress_level = compress_level
+        self.lossless = lossless
+        self.strip_metadata = strip_metadata
+        self.palette = palette
+
+        pass
+
+    def __repr__(self):
+        return f"OutputProfile({self.name}, {self.size_px or 'full'}px, {self.format})"
+
+    @property
+    def suffix(self) -> str:
+        return {'JPEG': '.jpg'}.get(self.format, '.' + self.format.lower())
+
+    def render_dpi(self, figsize=(16, 16), dpi:int=300) -> int:
+        '''The dpi to render `figsize` at, so the tight output is about `size_px` on its longest side.'''
+        if not self.size_px:
+            return dpi
+        inches = max(figsize) * max(atlas.AXES_FRACTION) + 2 * atlas.PAD_INCHES
+        return max(10, min(dpi, int(self.size_px / inches)))
+
+    def save_kwargs(self, dpi:int=None) -> dict:
+        '''Keyword arguments for `PIL.Image.save`.'''
+        kwargs = {'format': self.format}
+        if self.format == 'PNG':
+            kwargs['compress_level'] = self.compress_level
+        elif self.format == 'WEBP':
+            kwargs.update(quality=self.quality, lossless=self.lossless, method=4)
+        elif self.format == 'JPEG':
+            kwargs.update(quality=self.quality, optimize=True)
+
+        if not self.strip_metadata:
+            if dpi:
+                kwargs['dpi'] = (dpi, dpi)
+            if self.format == 'PNG':
+                info = PngInfo()
+                info.add_text('Software', 'glyph')
+                kwargs['pnginfo'] = info
+        return kwargs
+
+PROFILES = {
+    # the full 300 dpi render, what FromSeed always produced
+    'archive': OutputProfile('archive', None, 'PNG', compress_level=6, strip_metadata=False),
+    # full size, palette-indexed: a fraction of the archive's bytes
+    'indexed': OutputProfile('indexed', None, 'PNG', compress_level=6, palette=True),
+    # chat replies: about 1024px, fast to encode and upload
+    'discord': OutputProfile('discord', 1024, 'PNG', compress_level=6, palette=True),
+    'webp': OutputProfile('webp', 1024, 'WEBP', quality=90),
+    'thumb': OutputProfile('thumb', 256, 'JPEG', quality=80),
+}
+
+def get_profile(profile) -> OutputProfile|None:
+    '''A profile by name (see PROFILES), an OutputProfile as is, or None.'''
+    if profile is None or isinstance(profile, OutputProfile):
+        return profile
+    if profile not in PROFILES:
+        raise ValueError(f'Unknown output profile {profile}, expected one of {tuple(PROFILES)}')
+    return PROFILES[profile]
+
+def suffix(profile) -> str:
+    '''File extension for `profile`, '.png' when there is none.'''
+    profile = get_profile(profile)
+    return (profile.suffix if profile else '.png')
+
+# Share of (sampled) pixels a color needs to count as a flat background/label color
+FLAT_SHARE = 0.0005
+
+def _pack(array) -> np.ndarray:
+    '''RGB(A) pixels as one uint32 each, for table lookups.'''
+    packed = np.zeros(array.shape[:2], dtype=np.uint32)
+    for channel in range(array.shape[2]):
+        packed = (packed << 8) | array[..., channel]
+    return packed
+
+def _indexed(array, colors, missing:int=255) -> np.ndarray:
+    '''Index of each pixel's color in `colors` (256 at most), `missing` where it is not one of them.'''
+    keys = _pack(np.array(colors, dtype=np.uint8)[None])[0]
+    packed = _pack(array)
+    if array.shape[2] == 3:
+        lut = np.full(1 << 24, missing, dtype=np.uint8)
+        lut[keys] = np.arange(len(colors), dtype=np.uint8)
+        return lut[packed]
+    # a table over every RGBA value is far too big, search instead (RGBA renders are small cards)
+    order = np.argsort(keys)
+    position = np.searchsorted(keys[order], packed).clip(0, len(keys) - 1)
+    return np.where(keys[order][position] == packed, order[position], missing).astype(np.uint8)
+
+def _with_palette(indices, colors, mode) -> Image.Image:
+    image = Image.fromarray(indices, 'P')
+    image.putpalette([c for color in colors for c in color], rawmode=mode)
+    return image
+
+def to_palette(image:Image.Image) -> tuple[Image.Image, str]:
+    '''
+    Convert a render to a 'P' mode image, returning it and how it was built:
+
+    - 'exact': 256 colors or fewer (flat backgrounds, the 10 heightmap levels), the
+      palette is those colors and the image is unchanged.
+    - 'adaptive': more colors (anti-aliased glyph edges). The flat colors, the ones
+      covering at least FLAT_SHARE of the image, keep exact entries and exact pixels;
+      the rest of the palette is an octree quantization of the image.
+    '''
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    if image.mode == 'RGBA' and image.getextrema()[3][0] == 255:
+        image = image.convert('RGB')
+
+    colors = image.getcolors(256)
+    if colors is not None:
+        colors = [color for _, color in colors]
+        return (_with_palette(_indexed(np.asarray(image), colors), colors, image.mode), 'exact')
+
+    if image.mode == 'RGBA':
+        return (image.quantize(256, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE), 'adaptive')
+
+    width, height = image.size
+    sample = image.resize((max(1, width // 8), max(1, height // 8)), Image.NEAREST).getcolors(1 << 16) or []
+    total = sum(count for count, _ in sample)
+    flat = [color for count, color in sorted(sample, reverse=True) if count >= total * FLAT_SHARE][:128]
+
+    # the octree only needs to see the edge colors, half resolution is plenty
+    adaptive = image.reduce(2).quantize(255 - len(flat), method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE).getpalette()[:3 * (255 - len(flat))]
+    colors = flat + [tuple(adaptive[i:i+3]) for i in range(0, len(adaptive) - 2, 3)]
+    palette = _with_palette(np.zeros((1, 1), dtype=np.uint8), colors, 'RGB')
+
+    indices = np.array(image.quantize(palette=palette, dither=Image.Dither.NONE))
+    if flat:
+        # Pillow's nearest-color search goes through a reduced-precision cache, so pixels of
+        # the flat colors are put back on their exact entries afterwards
+        exact = _indexed(np.asarray(image), flat)
+        np.copyto(indices, exact, where=(exact != 255))
+    return (_with_palette(indices, colors, 'RGB'), 'adaptive')
+
+def to_image(State, dpi:int=300, **savefig_kwargs) -> Image.Image:
+    '''
+    Rasterize a render (`atlas.CompositeImage`, pyplot module or Figure) into a Pillow image.
+    Matplotlib states go through one uncompressed PNG, cropped tight like the original saves.
+    '''
+    if hasattr(State, 'to_pil'):
+        return State.to_pil()
+    buffer = io.BytesIO()
+    State.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight', pil_kwargs={'compress_level': 0}, **savefig_kwargs)
+    buffer.seek(0)
+    image = Image.open(buffer)
+    image.load()
+    return image
+
+def encode(image:Image.Image, profile, dpi:int=None) -> tuple[bytes, dict]:
+    '''
+    Encode `image` with `profile`, scaling it down to `size_px` if it is larger.
+    Returns the bytes and a report of the output size, byte count and encode time.
+    '''
+    profile = get_profile(profile)
+    start = time.perf_counter()
+
+    if profile.size_px and max(image.size) > profile.size_px:
+        image = image.copy()
+        image.thumbnail((profile.size_px, profile.size_px), Image.LANCZOS)
+    if profile.format == 'JPEG' and image.mode != 'RGB':
+        # no alpha in JPEG, flatten onto white
+        rgba = image.convert('RGBA')
+        image = Image.new('RGB', image.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel('A'))
+    palette = None
+    if profile.palette and profile.format == 'PNG':
+        image, palette = to_palette(image)
+
+    buffer = io.BytesIO()
+    image.save(buffer, **profile.save_kwargs(dpi))
+    data = buffer.getvalue()
+
+    report = {
+        'profile': profile.name,
+        'format': profile.format,
+        'width': image.size[0],
+        'height': image.size[1],
+        'bytes': len(data),
+        'encode_seconds': time.perf_counter() - start,
+    }
+    if palette:
+        report['palette'] = palette
+    return (data, report)
+
+def describe(report:dict) -> str:
+    '''One line for logs.'''
+    if report.get('cached'):
+        return f"{report['profile']}: {report['bytes']} bytes (cached)"
+    return f"{report['profile']}: {report['width']}x{report['height']} {report['format']}{' ' + report['palette'] if 'palette' in report else ''}, {report['bytes']} bytes, encoded in {report['encode_seconds'] * 1000:.1f} ms"
+
+def render(State, profile, dpi:int=300, **savefig_kwargs) -> tuple[bytes, dict]:
+    '''`to_image` then `encode`, closing `State`; the report also gets the rasterize time.'''
+    start = time.perf_counter()
+    image = to_image(State, dpi, **savefig_kwargs)
+    if hasattr(State, 'close'):
+        State.close()
+    rasterize_seconds = time.perf_counter() - start
+    data, report = encode(image, profile, dpi)
+    report['rasterize_seconds'] = rasterize_seconds
+    return (data, report)
@@ -0,0 +1,292 @@
+# Tiled "infinite floor": (level, seed, z, x, y) tiles of the noise world behind a floor
+import io
+import json
+import math
+import hashlib
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import matplotlib.colors as mcolors
+from PIL import Image
+from . import atlas
+from . import grove
+from . import generators
+from . import timing
+from .timing import span
+
+# Bump when tiles render differently, so cached tiles are not reused
+TILE_VERSION = 1
+
+# Pixels per tile side
+TILE_PX = 256
+# Pixels per cell at the deepest zoom, so a MAX_ZOOM tile holds 16x16 cells
+LEAF_CELL_PX = 16
+# Zoom levels 0..MAX_ZOOM, the world is (TILE_PX // LEAF_CELL_PX) << MAX_ZOOM cells a side
+MAX_ZOOM = 9
+# Below this many pixels per cell a tile is colors only, glyphs would be unreadable
+GLYPH_MIN_PX = 8
+# Noise samples per overview pixel side, averaged so low zooms don't alias
+SUPERSAMPLE = 4
+# PNG compress_level of a tile
+TILE_COMPRESS = 6
+# generate_perlin_noise defaults, the card and the world share one noise field
+NOISE_SCALE = 10.0
+NOISE_OCTAVES = 6
+
+WORLD_CELLS = (TILE_PX // LEAF_CELL_PX) << MAX_ZOOM
+
+# Cell size of a 32x32 card at 300 dpi, glyphs keep the same size relative to their cell
+CARD_CELL_PX = atlas.cell_size_px(generators.GRID, generators.grid_figsize(generators.GRID), 300)
+
+# Fonts are per thread (matplotlib keys FT2Font on the thread), this only makes concurrent
+# first requests for a zoom rasterize its atlas once instead of once per thread
+_ATLAS_LOCK = threading.Lock()
+
+def tile_cells(z:int) -> int:
+    '''World cells along one side of a tile at zoom `z`.'''
+    return (TILE_PX // LEAF_CELL_PX) << (MAX_ZOOM - z)
+
+def lod_octaves(step:int) -> int:
+    '''Octaves left when a pixel covers `step` cells: finer ones would only alias.'''
+    if step <= 1:
+        return NOISE_OCTAVES
+    return max(1, min(NOISE_OCTAVES, int(math.floor(math.log2(NOISE_SCALE / (2 * step)))) + 1))
+
+class TileWorld:
+    '''
+    The world of one floor (level, seed), cut into slippy-map tiles.
+
+    The floor's selection (`grove.SelectFromSeed`) picks the colormap, glyphtable and
+    glyph quirks; the terrain is the floor's Perlin noise field (the same field a card
+    blends in at its origin), inverted when the selection inverts its heightmap.
+
+    A tile (z, x, y) covers `tile_cells(z)` cells from row y*n, column x*n and is
+    rendered on its own, so panning never re-renders neighbours:
+
+    - zooms with at least `GLYPH_MIN_PX` pixels per cell composite glyphs (atlas backend)
+    - lower zooms are colors only: up to `SUPERSAMPLE`^2 noise samples averaged per
+      pixel, dropping the octaves finer than a pixel (`lod_octaves`)
+
+    With a `cache.RenderCache` (memory LRU in front of a disk LRU), tiles are stored
+    under a hash of the floor's `grove.RenderKey` and (z, x, y), so the cache is a
+    disk-backed pyramid filled lazily as tiles are asked for.
+    '''
+
+    def __init__(self, Gf:grove.GroveFloors, level:int, seed, saved_maps:dict[str, int], saved_colors:dict[str, int], saved_glyphs:dict[str, int], cache=None):
+
+        self.level = level
+        self.seed = seed
+        self.cache = cache
+
+        self.generated = grove.SelectFromSeed(Gf, level, seed, saved_colors)
+        self.key = grove.RenderKey(Gf, self.generated, saved_maps, saved_colors, saved_glyphs, backend='atlas')
+
+        glyphtable = saved_glyphs[self.generated['glyphtable']]
+        self.glyphs = list(glyphtable[0])
+        self.font_path = glyphtable[1]
+        self.fontsz = glyphtable[2]
+        self.shift = seed % len(self.glyphs)
+
+        colormap = self.generated['colormap']
+        if self.generated['custom']:
+            self.cmap = generators.custom_colormap(saved_colors[colormap], ('Gradient' if self.generated['gradient'] else 'Specified'))
+        else:
+            self.cmap = generators.heatmap_cmap(colormap)
+        self.norm = mcolors.Normalize(vmin=0, vmax=9)
+
+        pass
+
+    def __repr__(self):
+        return f"TileWorld(level {self.level}, seed {self.seed}, {self.generated['generation_name']})"
+
+    def tile_key(self, z:int, x:int, y:int) -> str:
+        return hashlib.sha256(json.dumps([TILE_VERSION, self.key, TILE_PX, LEAF_CELL_PX, MAX_ZOOM, z, x, y]).encode('UTF-8')).hexdigest()
+
+    def cells(self, z:int, x:int, y:int) -> tuple[np.ndarray, int, int]:
+        '''
+        (values, pixels per cell, samples per pixel side) of a tile: the terrain (0-9) at
+        every cell, or `SUPERSAMPLE` samples per pixel side once a pixel covers several cells.
+        '''
+        if not (0 <= z <= MAX_ZOOM and 0 <= x < (1 << z) and 0 <= y < (1 << z)):
+            raise ValueError(f'No tile {z}/{x}/{y}, zoom is 0-{MAX_ZOOM} and x, y are 0-2^z-1')
+        n = tile_cells(z)
+        samples = min(n, TILE_PX)
+        pixel_step = n // samples
+        supersample = min(pixel_step, SUPERSAMPLE)
+        step = pixel_step // supersample
+        values = generators.generate_perlin_noise(
+            samples * supersample, samples * supersample,
+            scale=NOISE_SCALE,
+            octaves=lod_octaves(pixel_step),
+            seed=self.seed,
+            origin=(y * n, x * n),
+            step=step
+        )
+        if (self.generated['inverted'] != np.False_):
+            values = generators.invert_values(values)
+        return values, TILE_PX // samples, supersample
+
+    def render(self, z:int, x:int, y:int, timer:timing.Timer=None) -> np.ndarray:
+        '''The (TILE_PX, TILE_PX, 3) uint8 image of a tile.'''
+        with span(timer, 'cells'):
+            values, cell_px, supersample = self.cells(z, x, y)
+
+        with span(timer, 'glyphs'):
+            background, foreground = atlas.cell_colors(values, self.cmap, self.norm, self.generated['invert_glyphs'])
+            if cell_px < GLYPH_MIN_PX:
+                if supersample > 1:
+                    size = len(values) // supersample
+                    background = background.reshape(size, supersample, size, supersample, 3).mean(axis=(1, 3))
+                return atlas.upscale((background * 255 + 0.5).astype(np.uint8), cell_px)
+
+            with _ATLAS_LOCK:
+                glyph_atlas = atlas.get_atlas(self.glyphs, self.font_path, self.fontsz, cell_px, 300 * cell_px / CARD_CELL_PX)
+            image = np.empty((TILE_PX, TILE_PX, 3), dtype=np.uint8)
+            alpha = (0.7 if self.generated['alpha_glyphs'] else 1.0)
+            return atlas.composite_cells(image, glyph_atlas, (values + self.shift) % len(glyph_atlas), background, foreground, alpha)
+
+    def tile(self, z:int, x:int, y:int) -> bytes:
+        '''PNG bytes of a tile, from the cache when it has them.'''
+        timer = timing.Timer('tile', level=self.level, seed=self.seed, z=z)
+
+        key = None
+        if self.cache is not None:
+            with timer.span('cache'):
+                key = self.tile_key(z, x, y)
+                cached = self.cache.get(key)
+            if cached is not None:
+                timer.labels['cached'] = True
+                timer.finish()
+                return cached
+
+        image = self.render(z, x, y, timer)
+
+        with timer.span('encode'):
+            buffer = io.BytesIO()
+            Image.fromarray(image).save(buffer, format='PNG', compress_level=TILE_COMPRESS)
+            data = buffer.getvalue()
+
+        if key is not None:
+            with timer.span('save'):
+                self.cache.put(key, data)
+
+        timer.finish()
+        return data
+
+class Tiles:
+    '''
+    Every floor's world behind one tile cache: the `TileWorld`s of the last `worlds`
+    (level, seed)s stay in memory, their tiles go through `cache`.
+    '''
+
+    def __init__(self, Gf:grove.GroveFloors, saved_maps:dict[str, int], saved_colors:dict[str, int], saved_glyphs:dict[str, int], cache=None, worlds:int=16):
+
+        self.Gf = Gf
+        self.saved_maps = saved_maps
+        self.saved_colors = saved_colors
+        self.saved_glyphs = saved_glyphs
+        self.cache = cache
+        self.max_worlds = worlds
+
+        self._lock = threading.Lock()
+        self._worlds:OrderedDict[tuple[int, int], TileWorld] = OrderedDict()
+
+        pass
+
+    def __repr__(self):
+        return f"Tiles({len(self._worlds)} worlds, {self.cache})"
+
+    def __len__(self):
+        return len(self._worlds)
+
+    def world(self, level:int, seed) -> TileWorld:
+        key = (level, seed)
+        with self._lock:
+            if key in self._worlds:
+                self._worlds.move_to_end(key)
+                return self._worlds[key]
+        world = TileWorld(self.Gf, level, seed, self.saved_maps, self.saved_colors, self.saved_glyphs, self.cache)
+        with self._lock:
+            self._worlds[key] = world
+            while len(self._worlds) > self.max_worlds:
+                self._worlds.popitem(last=False)
+        return world
+
+    def tile(self, level:int, seed, z:int, x:int, y:int) -> bytes:
+        return self.world(level, seed).tile(z, x, y)
+
+def make_tile_server(tiles:Tiles, port:int=8765, host:str='127.0.0.1') -> ThreadingHTTPServer:
+    '''
+    HTTP server for `tiles`:
+
+    - GET /tiles/<level>/<seed>/<z>/<x>/<y>.png, e.g. as a Leaflet/OpenLayers XYZ layer
+      (`http://127.0.0.1:8765/tiles/0/1234/{z}/{x}/{y}.png`, max zoom `MAX_ZOOM`)
+    - GET /stats, the tile cache stats as JSON
+
+    Tiles never change for a given key, so they are sent with an ETag and a long max-age.
+    '''
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = self.path.split('?')[0].strip('/').split('/')
+            if parts == ['stats']:
+                stats = (tiles.cache.stats() if tiles.cache is not None else {})
+                return self._send(200, json.dumps({'worlds': len(tiles), **stats}).encode('UTF-8'), 'application/json')
+            try:
+                if len(parts) != 6 or parts[0] != 'tiles' or not parts[5].endswith('.png'):
+                    raise ValueError(f'Unknown path {self.path}')
+                level, seed, z, x = (int(p) for p in parts[1:5])
+                y = int(parts[5][:-len('.png')])
+                world = tiles.world(level, seed)
+                etag = f'"{world.tile_key(z, x, y)}"'
+                if self.headers.get('If-None-Match') == etag:
+                    return self._send(304, b'', 'image/png', etag)
+                data = world.tile(z, x, y)
+            except (ValueError, KeyError, IndexError) as e:
+                return self._send(404, str(e).encode('UTF-8'), 'text/plain')
+            self._send(200, data, 'image/png', etag)
+
+        def _send(self, status:int, body:bytes, content_type:str, etag:str=None):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            if etag:
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', 'public, max-age=86400')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+def serve_tiles(tiles:Tiles, port:int=8765, host:str='127.0.0.1') -> ThreadingHTTPServer:
+    '''`make_tile_server` running in a daemon thread.'''
+    server = make_tile_server(tiles, port, host)
+    threading.Thread(target=server.serve_forever, name='TileServer', daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    import os
+    import argparse
+    from . import loaders
+    from .cache import RenderCache
+    parser = argparse.ArgumentParser(description="Serve the tiles of every floor's world over HTTP.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--cache-dir', type=str, default=os.path.join('cache', 'tiles'), help='Disk tier of the tile cache, empty for memory only (default: cache/tiles)')
+    parser.add_argument('--cache-mb', type=int, default=1024, help='Disk tier size in MiB (default: 1024)')
+    parser.add_argument('--fontdir', type=str, default='/usr/share/fonts/truetype/noto/', help='Directory of the glyphtable fonts')
+    args = parser.parse_args()
+
+    tiles = Tiles(
+        grove.GroveFloors(),
+        loaders.SavedMaps().maps,
+        loaders.SavedColors().maps,
+        loaders.SavedGlyphs(fontdir=args.fontdir).maps,
+        cache=RenderCache(directory=(args.cache_dir or None), disk_bytes=args.cache_mb * 2**20, suffix='.png'), # tiles are always PNG
+    )
+    print(f"Serving tiles on http://{args.host}:{args.port}/tiles/<level>/<seed>/<z>/<x>/<y>.png (zoom 0-{MAX_ZOOM})")
+    make_tile_server(tiles, args.port, args.host).serve_forever()
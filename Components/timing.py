@@ -0,0 +1,218 @@
+# Stage timings for renders: spans -> records -> sinks (log line, histograms, Prometheus text)
+import os
+import sys
+import json
+import time
+import bisect
+import threading
+import contextlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class Timer:
+    '''
+    Times the stages of one render.
+
+        timer = Timer('render', level=0, seed=1234)
+        with timer.span('noise'):
+            ...
+        record = timer.finish() # published to every sink in SINKS
+
+    A stage timed more than once adds up. Records are plain dicts so they can be
+    returned from worker processes and published again on the other side.
+    '''
+
+    def __init__(self, name:str, **labels):
+
+        self.name = name
+        self.labels = labels
+        self.spans:dict[str, float] = {}
+        self.start = time.perf_counter()
+
+        pass
+
+    def __repr__(self):
+        return f"Timer({self.name}, {len(self.spans)} spans)"
+
+    @contextlib.contextmanager
+    def span(self, stage:str):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def add(self, stage:str, seconds:float):
+        '''Record a stage timed elsewhere (e.g. an encode report).'''
+        self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+
+    def record(self) -> dict:
+        return {
+            'name': self.name,
+            'labels': self.labels,
+            'spans': dict(self.spans),
+            'total': time.perf_counter() - self.start,
+        }
+
+    def finish(self, publish_record:bool=True) -> dict:
+        record = self.record()
+        if publish_record:
+            publish(record)
+        return record
+
+def span(timer:Timer|None, stage:str):
+    '''`timer.span(stage)`, or a no-op when there is no timer.'''
+    return (timer.span(stage) if timer is not None else contextlib.nullcontext())
+
+# --- Sinks ---
+# A sink is anything with emit(record)
+
+class LogSink:
+    '''One JSON line per record, e.g. {"name": "render", "level": 0, ..., "spans_ms": {...}}.'''
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def emit(self, record:dict):
+        line = {
+            'name': record['name'],
+            **record['labels'],
+            'total_ms': round(record['total'] * 1000, 2),
+            'spans_ms': {stage: round(seconds * 1000, 2) for stage, seconds in record['spans'].items()},
+        }
+        print(json.dumps(line, default=str), file=(self.stream or sys.stdout), flush=True)
+
+# Upper bounds (seconds) of the histogram buckets, +Inf is implied
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1) # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds:float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q:float) -> float:
+        '''Upper bound of the bucket holding the q-th observation (inf if it is past the last bucket).'''
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+class HistogramRegistry:
+    '''In-process histograms of seconds per (record name, stage), plus one for the totals.'''
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.histograms:dict[tuple[str, str], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"HistogramRegistry({len(self.histograms)} histograms)"
+
+    def emit(self, record:dict):
+        with self._lock:
+            for stage, seconds in [*record['spans'].items(), ('total', record['total'])]:
+                key = (record['name'], stage)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(self.buckets)
+                self.histograms[key].observe(seconds)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        '''count, mean, p50 and p95 (bucket bounds) per stage, e.g. summary()['render']['noise'].'''
+        with self._lock:
+            summary = {}
+            for (name, stage), histogram in sorted(self.histograms.items()):
+                summary.setdefault(name, {})[stage] = {
+                    'count': histogram.count,
+                    'mean': histogram.sum / histogram.count,
+                    'p50': histogram.quantile(0.5),
+                    'p95': histogram.quantile(0.95),
+                }
+            return summary
+
+    def prometheus(self, prefix:str='glyph') -> str:
+        '''The histograms in Prometheus text exposition format.'''
+        lines = []
+        with self._lock:
+            names = sorted({name for name, _ in self.histograms})
+            for name in names:
+                metric = f'{prefix}_{name}_stage_seconds'
+                lines.append(f'# HELP {metric} Seconds spent per {name} stage.')
+                lines.append(f'# TYPE {metric} histogram')
+                for (record_name, stage), histogram in sorted(self.histograms.items()):
+                    if record_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                        cumulative += count
+                        le = ('+Inf' if bound == float('inf') else repr(bound))
+                        lines.append(f'{metric}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                    lines.append(f'{metric}_sum{{stage="{stage}"}} {histogram.sum!r}')
+                    lines.append(f'{metric}_count{{stage="{stage}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+class PrometheusFileSink:
+    '''
+    Rewrites `path` with the registry's Prometheus text (e.g. for node_exporter's textfile
+    collector) after a record, at most once every `interval` seconds. Written atomically.
+    '''
+
+    def __init__(self, path, registry:HistogramRegistry=None, interval:float=5.0):
+        self.path = path
+        self.registry = registry
+        self.interval = interval
+        self._written = 0.0
+
+    def emit(self, record:dict):
+        now = time.monotonic()
+        if now - self._written < self.interval:
+            return
+        self._written = now
+        self.write()
+
+    def write(self):
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as file:
+            file.write((self.registry or REGISTRY).prometheus())
+        os.replace(tmp, self.path)
+
+def serve_prometheus(port:int, host:str='127.0.0.1', registry:HistogramRegistry=None) -> ThreadingHTTPServer:
+    '''Serve the registry's Prometheus text on http://host:port/metrics from a daemon thread.'''
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = (registry or REGISTRY).prometheus().encode('UTF-8')
+            self.send_response(200 if self.path in ('/', '/metrics') else 404)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='PrometheusServer', daemon=True).start()
+    return server
+
+# Process-wide registry, and the sinks every finished Timer is published to
+REGISTRY = HistogramRegistry()
+SINKS:list = [REGISTRY]
+
+def publish(record:dict):
+    for sink in list(SINKS):
+        try:
+            sink.emit(record)
+        except Exception as e:
+            print(f"Warning: timing sink {sink} failed: {e}")
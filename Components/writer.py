@@ -0,0 +1,74 @@
+# Bounded background writer for archive copies of rendered images
+import os
+import queue
+import atexit
+import threading
+
+class BackgroundWriter:
+    '''
+    Writes (path, bytes) jobs from a single daemon thread so disk I/O stays off the
+    request's critical path. The queue is bounded: when `maxsize` writes are pending,
+    `submit` waits for room instead of letting memory grow without limit, or with
+    `block=False` (callers on an event loop) drops the write and logs it.
+    '''
+
+    def __init__(self, maxsize:int=16):
+
+        self.jobs = queue.Queue(maxsize=maxsize)
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+
+        self._thread = threading.Thread(target=self._run, name='BackgroundWriter', daemon=True)
+        self._thread.start()
+
+        atexit.register(self.flush)
+
+        pass
+
+    def __repr__(self):
+        return f"BackgroundWriter({self.jobs.qsize()} pending, {self.written} written)"
+
+    def submit(self, path, data:bytes, block:bool=True) -> bool:
+        '''Queue `data` to be written to `path`, False when it was dropped on a full queue.'''
+        try:
+            self.jobs.put((path, data), block=block)
+        except queue.Full:
+            self.dropped += 1
+            print(f"Warning: archive queue full, not saving {path}")
+            return False
+        return True
+
+    def flush(self):
+        '''Block until every queued write has finished.'''
+        self.jobs.join()
+
+    def _run(self):
+        while True:
+            path, data = self.jobs.get()
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = path + '.tmp'
+                with open(tmp, 'wb') as file:
+                    file.write(data)
+                os.replace(tmp, path)
+                self.written += 1
+                print(f"Image saved to: {path}")
+            except Exception as e:
+                # any failure only loses this job, the thread keeps draining the queue
+                # (a dead writer would leave every later submit blocked on a full queue)
+                self.failed += 1
+                print(f"Error: could not save {path}: {type(e).__name__}: {e}")
+            finally:
+                self.jobs.task_done()
+
+_WRITER = None
+_WRITER_LOCK = threading.Lock()
+
+def archive_writer() -> BackgroundWriter:
+    '''The process-wide writer, started on first use.'''
+    global _WRITER
+    with _WRITER_LOCK:
+        if _WRITER is None:
+            _WRITER = BackgroundWriter()
+        return _WRITER
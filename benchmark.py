@@ -0,0 +1,509 @@
+# Benchmarks, run from the repository root:
+#   python benchmark.py suite --out before.json     every pipeline stage, written as JSON
+#   python benchmark.py compare before.json after.json
+#   python benchmark.py sampler | palette | grid | ansi   micro-benchmarks
+#   python benchmark.py threads                           serial vs threaded renders must match
+#   python benchmark.py animation                         delta-composited animation frames vs full renders
+#   python benchmark.py noise                             vectorized vs exact (per cell) Perlin noise
+# each takes --fontdir for installations that keep the glyphtable fonts elsewhere
+import io
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import tempfile
+import statistics
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from Components import engine
+from Components import fonts
+from Components import grove
+from Components import loaders
+from Components import profiles
+
+# --fontdir, for installations that keep the glyphtable fonts elsewhere
+FONTDIR = None
+
+def _saved_glyphs():
+    return (loaders.SavedGlyphs(fontdir=FONTDIR).maps if FONTDIR else loaders.SavedGlyphs().maps)
+
+def _per_call(fn, n) -> float:
+    '''Mean seconds per call of fn(i) over n calls.'''
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - start) / n
+
+def bench_sampler(n:int=20000, level:int=0):
+    '''Per-decision cost of WeightedDictRandomizer vs the compiled engine.Sampler, on one floor's biome.'''
+    Gf = grove.GroveFloors()
+    weights = Gf.get_floor_data(level)
+    biome = Gf.biomes[engine.Sampler.from_weights(weights).sample(0)]
+    sampler = biome.Samplers['heightmaps']
+    seeds = np.arange(n) + 1_000_000 # outside SeedUniform's cache on the first pass
+
+    legacy = _per_call(lambda i: engine.WeightedDictRandomizer(biome.Heightmaps, int(seeds[i])).result(), n)
+    compiled = _per_call(lambda i: sampler.sample(int(seeds[i])), n)
+    cached = _per_call(lambda i: sampler.sample(int(seeds[i % 1000])), n) # uniform already drawn, as in SelectFromSeed
+
+    start = time.perf_counter()
+    uniforms = engine.SeedUniforms(seeds + n) # fresh seeds again
+    draw = (time.perf_counter() - start) / n
+    start = time.perf_counter()
+    sampler.sample(uniforms=uniforms)
+    vectorized = (time.perf_counter() - start) / n
+
+    saved_colors = loaders.SavedColors().maps
+    select_legacy = _per_call(lambda i: _legacy_select(Gf, level, int(seeds[i]), saved_colors), n // 10)
+    select = _per_call(lambda i: grove.SelectFromSeed(Gf, level, int(seeds[i]) + 2 * n, saved_colors), n // 10)
+
+    print(f"{'decision':<40}{'us/decision':>12}")
+    for label, t in (
+        ('WeightedDictRandomizer.result', legacy),
+        ('Sampler.sample(seed)', compiled),
+        ('Sampler.sample(seed), uniform cached', cached),
+        ('SeedUniforms, per seed', draw),
+        ('Sampler.sample(uniforms=...), per seed', vectorized),
+    ):
+        print(f"{label:<40}{t * 1e6:>12.2f}")
+    print(f"{'selection (7 decisions)':<40}{'us/seed':>12}")
+    print(f"{'legacy':<40}{select_legacy * 1e6:>12.2f}")
+    print(f"{'SelectFromSeed':<40}{select * 1e6:>12.2f}")
+
+def _legacy_select(Gf, level, seed, saved_colors):
+    '''SelectFromSeed as it was before engine.Sampler, for comparison.'''
+    biome = Gf.biomes[engine.WeightedDictRandomizer(Gf.get_floor_data(level), seed).result()]
+    colormap = engine.WeightedDictRandomizer(biome.Colormaps, seed).result()
+    engine.WeightedDictRandomizer(biome.Heightmaps, seed).result()
+    engine.WeightedDictRandomizer(biome.Glyphs, seed).result()
+    engine.BooleanFromSeedWeight(seed, biome.Quirks.get('invert_heightmap', 0.5))
+    engine.BooleanFromSeedWeight(seed, biome.Quirks.get('noise', 0.5))
+    return (colormap in saved_colors.keys()) and engine.BooleanFromSeedWeight(seed, biome.Quirks.get('gradient', 0.5))
+
+def bench_palette(seeds=(1, 2, 3, 1234), level:int=0):
+    '''Truecolor vs palette-indexed PNG (bytes and encode time) for a few FromSeed renders and a card.'''
+    import matplotlib
+    matplotlib.use('Agg')
+    from PIL import Image
+    import to_terminal
+
+    Gf = grove.GroveFloors()
+    saved_maps = loaders.SavedMaps().maps
+    saved_colors = loaders.SavedColors().maps
+    saved_glyphs = _saved_glyphs()
+
+    images = []
+    for seed in seeds:
+        generated, png_buffer = grove.FromSeed(Gf, level, seed, saved_maps, saved_colors, saved_glyphs, archive=False)
+        images.append((generated['generation_name'], Image.open(png_buffer)))
+
+    glyphs = list('0123456789')
+    arr = to_terminal.uuid_to_heightmap('00000000-89ab-cdef-0123-456789abcdef', rows=2, cols=8)
+    card = io.BytesIO()
+    to_terminal.export_png(to_terminal.build_glyph_grid(arr, glyphs), None, 20, None, 'card', to_terminal.assign_glyph_colors(glyphs, list(saved_colors.values())[0], seed='0'), card)
+    images.append(('to_terminal card', Image.open(card)))
+
+    print(f"{'render':<44}{'truecolor':>12}{'ms':>8}{'indexed':>12}{'ms':>8}{'ratio':>7}  palette")
+    for name, image in images:
+        image.load()
+        true_bytes, true_report = profiles.encode(image, profiles.OutputProfile('truecolor', None, 'PNG', compress_level=6))
+        indexed_bytes, indexed_report = profiles.encode(image, 'indexed')
+        print(f"{name[:43]:<44}{len(true_bytes):>12}{true_report['encode_seconds'] * 1000:>8.0f}{len(indexed_bytes):>12}{indexed_report['encode_seconds'] * 1000:>8.0f}{len(indexed_bytes) / len(true_bytes):>7.2f}  {indexed_report['palette']}")
+
+def bench_grid(sizes=(32, 64, 128, 256, 512), cell_px:int=16, seed:int=1234):
+    '''Time per 1k cells of the atlas render (composite) and PNG encode as the grid grows, at a fixed cell size.'''
+    import matplotlib
+    matplotlib.use('Agg')
+    from Components import generators
+
+    saved_maps = loaders.SavedMaps().maps
+    glyphs, font_path, fontsz = list(_saved_glyphs().values())[0]
+    source = generators.string_to_heightmap(list(saved_maps.values())[0])
+
+    print(f"{'grid':<12}{'cells':>9}{'pixels':>14}{'render ms':>11}{'ms/1k':>8}{'encode ms':>11}{'ms/1k':>8}")
+    for size in sizes:
+        heightmap = generators.resample_heightmap(source, size, size)
+        start = time.perf_counter()
+        State = generators.create_heatmap_with_symbols(heightmap, list(glyphs), seed=seed, font_path=font_path, fontsz=fontsz, text='Level 0', save=False, backend='atlas', cell_px=cell_px)
+        render = time.perf_counter() - start
+        image = State.to_pil()
+        start = time.perf_counter()
+        profiles.encode(image, profiles.OutputProfile('png', None, 'PNG', compress_level=1))
+        encode = time.perf_counter() - start
+        cells = size * size / 1000
+        print(f"{f'{size}x{size}':<12}{size * size:>9}{image.size[0] * image.size[1]:>14}{render * 1000:>11.0f}{render * 1000 / cells:>8.2f}{encode * 1000:>11.0f}{encode * 1000 / cells:>8.2f}")
+
+def bench_ansi(n:int=20000):
+    '''Terminal patterns per second: print_pattern per UUID vs stream_patterns, truecolor and 256 colors.'''
+    import uuid
+    import to_terminal
+
+    glyphs = list(_saved_glyphs().values())[0][0]
+    glyph_color_map = to_terminal.assign_glyph_colors(glyphs, list(loaders.SavedColors().maps.values())[0], seed='0')
+    uuids = [str(uuid.UUID(int=i * 7919 + 12345)) for i in range(n)]
+
+    def per_call():
+        for u in uuids[:n // 4]:
+            arr_glyphs = to_terminal.build_glyph_grid(to_terminal.uuid_to_heightmap(u), glyphs)
+            to_terminal.print_pattern(arr_glyphs, glyph_color_map, None, u)
+        return n // 4
+
+    print(f"{'mode':<32}{'patterns/s':>12}")
+    for label, run in (
+        ('print_pattern per UUID', per_call),
+        ('stream_patterns truecolor', lambda: to_terminal.stream_patterns(uuids, glyphs, glyph_color_map, stream=io.StringIO())),
+        ('stream_patterns 256', lambda: to_terminal.stream_patterns(uuids, glyphs, glyph_color_map, mode='256', stream=io.StringIO())),
+    ):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            count = run()
+            seconds = time.perf_counter() - start
+        print(f"{label:<32}{count / seconds:>12.0f}")
+
+def bench_threads(jobs:int=16, workers:int=8):
+    '''
+    Stress check of thread safety: the same renders (every heatmap backend and glyph cards) done
+    serially, then from a thread pool, must give identical pixels. Exits 1 when they do not.
+    '''
+    import hashlib
+    import matplotlib
+    matplotlib.use('Agg')
+    from concurrent.futures import ThreadPoolExecutor
+    import to_terminal
+    from Components import generators
+
+    saved_glyphs = _saved_glyphs()
+    saved_colors = loaders.SavedColors().maps
+    tables, palettes = sorted(saved_glyphs), sorted(saved_colors)
+    heightmap = generators.string_to_heightmap(list(loaders.SavedMaps().maps.values())[0])
+    backends = ('matplotlib', 'paths', 'atlas')
+
+    def render(i):
+        if i % 4 == 3:
+            data = to_terminal.generate_glyph_png(tables[i % len(tables)], palettes[i % len(palettes)], seed=str(i), passed_uuid=CARD_UUID, output='bytes',
+                                                  saved_colors=saved_colors, saved_glyphs=saved_glyphs, backend=('paths' if i % 2 else 'matplotlib'))
+            return hashlib.md5(data).hexdigest()
+        glyphs, font_path, fontsz = saved_glyphs[tables[i % len(tables)]]
+        array = (generators.generate_array(seed=i) if i % 2 else heightmap)
+        State = generators.create_heatmap_with_symbols(array, list(glyphs), seed=i, font_path=font_path, fontsz=fontsz, dpi=50, text=f'Level {i}', save=False,
+                                                       cmap=('viridis', 'magma', 'cividis')[i % 3], symbol_invert_color=bool(i % 2), backend=backends[i % 4])
+        image = profiles.to_image(State, 50)
+        State.close()
+        return hashlib.md5(image.tobytes()).hexdigest()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        serial = [render(i) for i in range(jobs)]
+        serial_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            threaded = list(executor.map(render, range(jobs)))
+        threaded_seconds = time.perf_counter() - start
+
+    same = sum(a == b for a, b in zip(serial, threaded))
+    print(f"serial {serial_seconds:.2f}s, {workers} threads {threaded_seconds:.2f}s, {same}/{jobs} identical")
+    if same != jobs:
+        print(f"Mismatched jobs: {[i for i, (a, b) in enumerate(zip(serial, threaded)) if a != b]}")
+        sys.exit(1)
+
+def bench_animation(level:int=0, seed:int=1234, frames:int=24, cell_px:int=24):
+    '''
+    A glyph shift animation of one floor: every frame re-rendered with composite_heatmap vs
+    composited on one animation.FrameCompositor (must match), then the bytes of each
+    animation format against the frames as separate PNGs.
+    '''
+    from Components import animation, atlas, generators
+
+    Gf = grove.GroveFloors()
+    saved_maps, saved_colors, saved_glyphs = loaders.SavedMaps().maps, loaders.SavedColors().maps, _saved_glyphs()
+    generated = grove.SelectFromSeed(Gf, level, seed, saved_colors)
+    selection = grove.PrepareSelection(Gf, generated, saved_maps, saved_colors, saved_glyphs)
+    figsize, dpi = grove._AnimationSize(None, generators.GRID, cell_px)
+    shifts = [(seed + k) % len(selection['glyphs']) for k in range(frames)]
+
+    start = time.perf_counter()
+    full = [generators.create_heatmap_with_symbols(**{**selection, 'seed': shift}, figsize=figsize, dpi=dpi, save=False, backend='atlas', layers=None).array for shift in shifts]
+    full_seconds = time.perf_counter() - start
+
+    compositor = animation.FrameCompositor(figsize, dpi)
+    start = time.perf_counter()
+    delta = [generators.composite_heatmap_frame(compositor, shift=shift, **selection).copy() for shift in shifts]
+    delta_seconds = time.perf_counter() - start
+
+    same = sum(np.array_equal(a, b) for a, b in zip(full, delta))
+    print(f"{generated['generation_name']}: {frames} frames {delta[0].shape[1]}x{delta[0].shape[0]}, {compositor.stats()['composited_ratio']:.0%} of cells composited, {same}/{frames} identical")
+    print(f"  composite_heatmap {full_seconds / frames * 1000:.1f} ms/frame, FrameCompositor {delta_seconds / frames * 1000:.1f} ms/frame")
+
+    png_bytes = sum(len(profiles.encode(atlas.CompositeImage(frame).to_pil(), 'archive')[0]) for frame in delta)
+    print(f"  {frames} PNGs{png_bytes:>12} bytes")
+    for format in animation.FORMATS:
+        data, report = animation.encode_frames(delta, format)
+        print(f"  {format:<8}{len(data):>12} bytes, encoded in {report['encode_seconds'] * 1000:.0f} ms")
+
+def bench_noise(n:int=50):
+    '''
+    Per card time of the vectorized noise and of exact=True, below and past the seeds the
+    vectorized noise reproduces. Exact is the slow path for most seeds the bot draws.
+    '''
+    from Components import generators, perlin
+    xs = (np.arange(32) / 10.0)[:, None]
+    ys = (np.arange(32) / 10.0)[None, :]
+    reproduced = [seed for seed in range(0, 500000, 50) if perlin.reproduces(xs, ys, 6, 2.0, 1024, 1024, seed)]
+    print(f"vectorized noise reproduces the extension for seeds 0-{reproduced[-1]}, {len(reproduced) / 10000:.2%} of engine.NewRandomSeed()")
+
+    print(f"{'seeds':<14}{'vectorized ms':>15}{'exact ms':>10}{'speedup':>9}")
+    # past the table, but short of where the extension's reads leave its own mapping
+    for first in (0, reproduced[-1] + 50):
+        seeds = range(first, first + n)
+        fast = _per_call(lambda i: generators.generate_perlin_noise(32, 32, seed=seeds[i]), n)
+        exact = _per_call(lambda i: generators.generate_perlin_noise(32, 32, seed=seeds[i], exact=True), n)
+        print(f"{f'{first}-{first + n - 1}':<14}{fast * 1000:>15.2f}{exact * 1000:>10.2f}{exact / fast:>8.1f}x")
+
+BENCHMARKS = {
+    'sampler': bench_sampler,
+    'palette': bench_palette,
+    'grid': bench_grid,
+    'ansi': bench_ansi,
+    'threads': bench_threads,
+    'animation': bench_animation,
+    'noise': bench_noise,
+}
+
+# --- Suite ---
+# Fixed inputs, so two runs measure the same work
+SEEDS = (1, 2, 3, 1234, 99991)
+LEVEL = 0
+CARD_UUID = '00000000-89ab-cdef-0123-456789abcdef'
+
+def _assets():
+    return {'saved_maps': loaders.SavedMaps().maps, 'saved_colors': loaders.SavedColors().maps, 'saved_glyphs': _saved_glyphs()}
+
+def _render_bytes(State, dpi=300) -> int:
+    buffer = io.BytesIO()
+    State.savefig(buffer, format='PNG', dpi=dpi, bbox_inches='tight')
+    State.close()
+    return len(buffer.getvalue())
+
+# Each stage does its setup and returns run(seed) -> output bytes (or None); only run is timed
+def stage_loaders_cold():
+    from Components import catalog
+    def run(seed):
+        catalog.CATALOG.invalidate()
+        _assets()
+    return run
+
+def stage_loaders_warm():
+    _assets()
+    def run(seed):
+        _assets()
+    return run
+
+def stage_string_to_heightmap():
+    from Components import generators
+    maps = list(loaders.SavedMaps().maps.values())
+    def run(seed):
+        for text in maps:
+            generators.string_to_heightmap(text)
+    return run
+
+def _stage_perlin_noise(exact):
+    from Components import generators
+    def run(seed):
+        generators.generate_perlin_noise(32, 32, seed=seed, exact=exact)
+    return run
+
+def stage_perlin_noise():
+    return _stage_perlin_noise(False)
+
+def stage_perlin_noise_exact():
+    return _stage_perlin_noise(True)
+
+def _stage_heatmap(backend):
+    from Components import generators
+    assets = _assets()
+    glyphs, font_path, fontsz = list(assets['saved_glyphs'].values())[0]
+    heightmap = generators.string_to_heightmap(list(assets['saved_maps'].values())[0])
+    def run(seed):
+        State = generators.create_heatmap_with_symbols(heightmap, list(glyphs), seed=seed, font_path=font_path, fontsz=fontsz, text='Level 0', save=False, display_zone=True, backend=backend)
+        return _render_bytes(State)
+    return run
+
+def stage_heatmap_atlas():
+    return _stage_heatmap('atlas')
+
+def stage_heatmap_matplotlib():
+    return _stage_heatmap('matplotlib')
+
+def stage_heatmap_paths():
+    return _stage_heatmap('paths')
+
+def _stage_fromseed(**kwargs):
+    Gf = grove.GroveFloors()
+    assets = _assets()
+    return lambda seed: len(grove.FromSeed(Gf, LEVEL, seed, archive=False, **assets, **kwargs)[1].getvalue())
+
+def stage_fromseed():
+    return _stage_fromseed()
+
+def stage_fromseed_discord():
+    return _stage_fromseed(profile='discord')
+
+def stage_fromseed_batch():
+    '''Per seed cost of a FromSeedBatch sweep over SEEDS (run once per repeat, divided back).'''
+    Gf = grove.GroveFloors()
+    assets = _assets()
+    def run(seed):
+        return sum(len(png_bytes) for _, png_bytes in grove.FromSeedBatch(Gf, LEVEL, SEEDS, archive=False, **assets))
+    run.per = len(SEEDS)
+    return run
+
+def stage_glyph_png(backend='matplotlib'):
+    import to_terminal
+    out_path = os.path.join(tempfile.mkdtemp(), 'card.png')
+    def run(seed):
+        to_terminal.generate_glyph_png(None, None, seed=str(seed), passed_uuid=CARD_UUID, out_path=out_path, backend=backend)
+        return os.path.getsize(out_path)
+    return run
+
+def stage_glyph_png_paths():
+    return stage_glyph_png('paths')
+
+STAGES = {
+    'loaders.cold': stage_loaders_cold,
+    'loaders.warm': stage_loaders_warm,
+    'string_to_heightmap': stage_string_to_heightmap,
+    'generate_perlin_noise': stage_perlin_noise,
+    'generate_perlin_noise.exact': stage_perlin_noise_exact,
+    'create_heatmap_with_symbols.atlas': stage_heatmap_atlas,
+    'create_heatmap_with_symbols.matplotlib': stage_heatmap_matplotlib,
+    'create_heatmap_with_symbols.paths': stage_heatmap_paths,
+    'grove.FromSeed': stage_fromseed,
+    'grove.FromSeed.discord': stage_fromseed_discord,
+    'grove.FromSeedBatch': stage_fromseed_batch,
+    'to_terminal.generate_glyph_png': stage_glyph_png,
+    'to_terminal.generate_glyph_png.paths': stage_glyph_png_paths,
+}
+
+def _run_stage(name, repeat, fontdir) -> dict:
+    '''Runs in a fresh process, so its peak RSS is this stage's alone.'''
+    global FONTDIR
+    FONTDIR = fontdir
+    import matplotlib
+    matplotlib.use('Agg')
+
+    with contextlib.redirect_stdout(io.StringIO()): # progress bars
+        start = time.perf_counter()
+        run = STAGES[name]()
+        setup = time.perf_counter() - start
+
+        times = []
+        outputs = []
+        for i in range(repeat + 1): # the first call is reported apart, it fills the caches
+            start = time.perf_counter()
+            outputs.append(run(SEEDS[i % len(SEEDS)]))
+            times.append((time.perf_counter() - start) / getattr(run, 'per', 1))
+
+    return {
+        'setup_seconds': setup,
+        'first_seconds': times[0],
+        'median_seconds': statistics.median(times[1:]),
+        'min_seconds': min(times[1:]),
+        'max_seconds': max(times[1:]),
+        'repeat': repeat,
+        'output_bytes': outputs[0], # always SEEDS[0], comparable whatever the repeat
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, # kilobytes on Linux
+        'fonts': fonts.FONTS.stats(), # font registry hits and memory after the stage
+    }
+
+def run_suite(names=None, repeat:int=5, fontdir=None) -> dict:
+    results = {}
+    for name in (names or STAGES):
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            try:
+                results[name] = executor.submit(_run_stage, name, repeat, fontdir).result()
+            except Exception as e:
+                results[name] = {'error': f'{type(e).__name__}: {e}'}
+        print(_describe_stage(name, results[name]))
+    return {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'seeds': SEEDS,
+            'level': LEVEL,
+        },
+        'stages': results,
+    }
+
+def _describe_stage(name, result) -> str:
+    if 'error' in result:
+        return f"{name:<40}  {result['error']}"
+    return f"{name:<40}{result['median_seconds'] * 1000:>10.2f} ms{result['first_seconds'] * 1000:>10.1f} ms first{result['peak_rss_kb'] / 1024:>8.0f} MiB{result['output_bytes'] or '':>10}"
+
+# How much worse a metric may get before compare flags it
+THRESHOLDS = {'median_seconds': 0.10, 'peak_rss_kb': 0.10, 'output_bytes': 0.05}
+
+def compare(before:dict, after:dict, threshold:float=None) -> list[str]:
+    '''Print stage by stage changes between two suite results, returns the regressions.'''
+    regressions = []
+    print(f"{'stage':<40}{'metric':<16}{'before':>14}{'after':>14}{'change':>9}")
+    for name, new in after['stages'].items():
+        old = before['stages'].get(name)
+        if old is None or 'error' in old or 'error' in new:
+            print(f"{name:<40}{'skipped':<16}")
+            continue
+        for metric, limit in THRESHOLDS.items():
+            limit = (threshold if threshold is not None else limit)
+            if not old.get(metric) or new.get(metric) is None:
+                continue
+            change = new[metric] / old[metric] - 1
+            flag = ''
+            if change > limit:
+                flag = '  REGRESSION'
+                regressions.append(f'{name} {metric} {change:+.1%}')
+            print(f"{name:<40}{metric:<16}{old[metric]:>14.6g}{new[metric]:>14.6g}{change:>+9.1%}{flag}")
+    return regressions
+
+if __name__ == '__main__':
+    import argparse
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--fontdir', type=str, help='Directory of the glyphtable fonts')
+
+    parser = argparse.ArgumentParser(description="Benchmark the generation pipeline.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    suite = commands.add_parser('suite', parents=[common], help='Time every stage, each in a fresh process')
+    suite.add_argument('stages', nargs='*', help=f'Stages to run, of {tuple(STAGES)} (default: all)')
+    suite.add_argument('--repeat', type=int, default=5, help='Timed runs per stage after the first (default: 5)')
+    suite.add_argument('--out', type=str, help='Write the results to this JSON file')
+    comparison = commands.add_parser('compare', help='Compare two suite JSON files, exits 1 on regressions')
+    comparison.add_argument('before', type=str)
+    comparison.add_argument('after', type=str)
+    comparison.add_argument('--threshold', type=float, help=f'Allowed relative increase for every metric (default: {THRESHOLDS})')
+    for name, bench in BENCHMARKS.items():
+        commands.add_parser(name, parents=[common], help=bench.__doc__)
+    args = parser.parse_args()
+
+    if args.command == 'suite':
+        for name in args.stages:
+            if name not in STAGES:
+                parser.error(f'unknown stage {name}')
+        results = run_suite(args.stages, args.repeat, args.fontdir)
+        if args.out:
+            with open(args.out, 'w') as file:
+                json.dump(results, file, indent=2)
+            print(f"Results saved to: {args.out}")
+    elif args.command == 'compare':
+        with open(args.before) as before, open(args.after) as after:
+            regressions = compare(json.load(before), json.load(after), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): " + ', '.join(regressions))
+            sys.exit(1)
+    else:
+        FONTDIR = args.fontdir
+        BENCHMARKS[args.command]()
@@ -5,6 +5,7 @@ import matplotlib.font_manager as fm
 import matplotlib.colors as mcolors
 import random
 import os
+import io
 
 import Components
 import Components.loaders
@@ -20,6 +21,8 @@ SavedGlyphs = Components.loaders.SavedGlyphs
 # https://unicode-explorer.com/b/13000
 
 # Cache Resources in Streamlit
+# Everything expensive is process-wide: the loaders are shared resources and pure computations
+# are memoized on their inputs, so sessions hold no asset copies and an unchanged rerun is cheap.
 
 run_mode = 'Development'
 # Change this to ensure secure environment
@@ -27,20 +30,43 @@ run_mode = 'Development'
 if not (os.path.exists('output')):
     os.makedirs('output/')
 
-if "saved_maps" not in st.session_state:
-    st.session_state.saved_maps = SavedMaps().maps
-
-saved_maps = st.session_state.saved_maps
-
-if "saved_colors" not in st.session_state:
-    st.session_state.saved_colors = SavedColors().maps
-
-saved_colors = st.session_state.saved_colors
-
-if "saved_glyphs" not in st.session_state:
-    st.session_state.saved_glyphs = SavedGlyphs().maps
-
-saved_glyphs = st.session_state.saved_glyphs
+@st.cache_resource
+def asset_loaders():
+    '''One set of loaders per process. Their `.maps` are built from the parsed catalog
+    and only re-read files that changed, so reading them on every rerun is cheap.'''
+    return SavedMaps(), SavedColors(), SavedGlyphs()
+
+def build_cmap(color_mode:str, name:str, colors:tuple=None):
+    if color_mode == 'Specified':
+        return Components.generators.custom_colormap(colors, 'Defined')
+    if color_mode == 'Gradient':
+        return Components.generators.gradient_colormap(colors, 'Gradient')
+    return name
+
+@st.cache_data(max_entries=256)
+def perlin_noise(seed:int):
+    return Components.generators.generate_perlin_noise(32, 32, seed=seed)
+
+@st.cache_data(max_entries=256)
+def text_heightmap(text:str):
+    return Components.generators.string_to_heightmap(text)
+
+@st.cache_data(max_entries=64)
+def cmap_preview(color_mode:str, name:str, colors:tuple=None) -> bytes:
+    return Components.generators.cmap_preview_png(build_cmap(color_mode, name, colors))
+
+@st.cache_data(max_entries=32)
+def render_png(heightmap, glyphs:tuple, seed:int, font_path, text, color_mode:str, cmap_name:str, colors:tuple, display_zone:bool, save_name:str, fontsz:int, symbol_invert_color:bool, symbol_semi_transparent:bool, backend:str='matplotlib') -> bytes:
+    '''The heatmap as PNG bytes, memoized on every input (colors included, so editing a color file re-renders).
+    The matplotlib figure by default; the 'Fast Renderer' toggle picks the atlas backend, whose cached
+    glyph layer makes colormap, alpha and label changes a recolor (a close, not identical, image).'''
+    State = Components.generators.create_heatmap_with_symbols(heightmap, list(glyphs), seed=seed, font_path=font_path, figsize=(16, 16), dpi=300, text=text, cmap=build_cmap(color_mode, cmap_name, colors), save=False, save_name=save_name, display_zone=display_zone, custom_cmap=(color_mode != 'cmap'), fontsz=fontsz, symbol_invert_color=symbol_invert_color, symbol_semi_transparent=symbol_semi_transparent, backend=backend)
+    buffer = io.BytesIO()
+    State.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
+    State.close()
+    return buffer.getvalue()
+
+saved_maps, saved_colors, saved_glyphs = (loader.maps for loader in asset_loaders())
 
 # Display the heightmap in a text area for editing (Streamlit)
 def edit_heightmap(heightmap):
@@ -67,21 +93,18 @@ color_mode = st.sidebar.selectbox('Select Coloring Mode', color_modes, index=0)
 
 custom_colors = (True if color_mode != color_modes[0] else False)
 
+selected_colors = None
 if custom_colors:
     color_list = sorted([i for i in saved_colors.keys()])
     selected_custom_color = st.sidebar.selectbox("Choose a custom color file", color_list)
+    selected_colors = tuple(saved_colors[selected_custom_color])
+    selected_cmap = selected_custom_color
 
 if (color_mode == color_modes[0]):
     cmap_list = ['viridis', 'cividis', 'Reds', 'PuBu', 'Greys', 'Purples', 'Blues', 'Greens', 'YlOrBr', 'YlOrRd', 'YlGnBu', 'BuGn', 'YlGn', 'PuRd', 'bone', 'pink', 'spring', 'summer', 'autumn', 'cool', 'Wistia', 'hot', 'afmhot', 'copper', 'PiYg', 'PRGn', 'Spectral', 'twilight', 'hsv', 'Dark2', 'Pastel1', 'Pastel2', 'plasma', 'inferno', 'magma', 'jet', 'coolwarm', 'YlGnBu', 'tab20c']
     selected_cmap = st.sidebar.selectbox("Choose a colormap", cmap_list)
 
-if (color_mode == color_modes[1]):
-    selected_cmap = Components.generators.custom_colormap(saved_colors[selected_custom_color], 'Defined')
-
-if (color_mode == color_modes[2]):
-    selected_cmap = Components.generators.gradient_colormap(saved_colors[selected_custom_color], 'Gradient')
-
-Components.generators.show_cmap_preview(selected_cmap)
+st.sidebar.image(cmap_preview(color_mode, selected_cmap, selected_colors))
 
 # TAB DEFINITIONS
 tab1, tab2, tab3, tab4 = st.sidebar.tabs(['Glyphs & Font', 'Heightmap', 'Seed', 'Saving'])
@@ -103,6 +126,8 @@ invert_font_colors = tab1.toggle('Invert Glyph Colors', False)
 
 apply_alpha = tab1.toggle('Apply Alpha to Glyphs', False)
 
+fast_render = tab1.toggle('Fast Renderer', False, help='Composite cached glyphs (atlas backend) instead of drawing the matplotlib figure, much faster when only colors change')
+
 hm_opts = ['Unorganized', 'Noise', 'String', 'Template']
 
 if run_mode == 'Development':
@@ -130,7 +155,7 @@ hm_blend_noise = tab2.toggle('Blend Noise', False, disabled=(True if hm_select =
 
 hm_edit_mode = tab2.toggle('Editor', False)
 
-noise_map = Components.generators.generate_perlin_noise(32, 32, seed=seed)
+noise_map = perlin_noise(seed)
 
 if (hm_select == hm_opts[0]):
     Heightmap = Components.generators.generate_array(seed)
@@ -142,10 +167,10 @@ if (hm_select == hm_opts[2]):
     if len(to_height) != 1024:
         tab2.info('String must be 1024 characters encoded 0-9')
     else:
-        Heightmap = Components.generators.string_to_heightmap(to_height)
+        Heightmap = text_heightmap(to_height)
 if (hm_select == hm_opts[3]):
     template_select = tab2.selectbox('Select a template to use', sorted(saved_maps.keys()))
-    Heightmap = Components.generators.string_to_heightmap(saved_maps[template_select])
+    Heightmap = text_heightmap(saved_maps[template_select])
 if (hm_select == hm_opts[4]):
     img_path = tab2.text_input('Image Path')
     Heightmap = Components.generators.string_to_heightmap(Components.generators.image_to_integer_string(img_path))
@@ -174,9 +199,13 @@ st.sidebar.write(f'Saving is {"Enabled" if save_image else "Disabled"}')
 
 if st.sidebar.button('Stream', icon='🐠'):
     toast = st.toast(f'Generating {seed}..', icon='🐠')
-    st.pyplot(Components.generators.create_heatmap_with_symbols(Heightmap, glyphs, seed=(random.randint(0,100000) if more_noise else seed), font_path=font_path, figsize=(16, 16), dpi=300, text=text_input, cmap=selected_cmap, save=save_image, save_name=image_name, display_zone=show_info, custom_cmap=custom_colors, fontsz=font_size, symbol_invert_color=invert_font_colors, symbol_semi_transparent=apply_alpha))
+    png = render_png(Heightmap, tuple(glyphs), (random.randint(0,100000) if more_noise else seed), font_path, text_input, color_mode, selected_cmap, selected_colors, show_info, image_name, font_size, invert_font_colors, apply_alpha, ('atlas' if fast_render else 'matplotlib'))
+    st.image(png)
     if save_image:
+        output_path = os.path.join(os.getcwd(), 'output', image_name + ('.png' if not image_name.endswith('.png') else ''))
+        with open(output_path, 'wb') as file:
+            file.write(png)
+        print(f"Image saved to: {output_path}")
         toast = st.toast(f'{image_name}', icon='💾️')
     else:
-        toast = st.toast(f'Success {seed}', icon='🐠')
-    plt.close()
\ No newline at end of file
+        toast = st.toast(f'Success {seed}', icon='🐠')
\ No newline at end of file
@@ -3,7 +3,6 @@ import asyncio
 import functools
 import logging
 import os
-import tempfile
 from pathlib import Path
 from typing import List, Optional, Sequence
 import uuid
@@ -239,20 +238,10 @@ class AddressView(discord.ui.View):
         gen_kwargs = {k: v for k, v in gen_kwargs.items() if v is not None}
 
         loop = asyncio.get_running_loop()
-        out_path = None
         try:
-            gen_func = functools.partial(to_terminal.generate_glyph_png, **gen_kwargs)
-            out_path = await loop.run_in_executor(None, gen_func)
-
-            if out_path is None:
-                tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-                tmp.close()
-                gen_kwargs_with_out = dict(gen_kwargs)
-                gen_kwargs_with_out["out_path"] = tmp.name
-                out_path = await loop.run_in_executor(None, functools.partial(to_terminal.generate_glyph_png, **gen_kwargs_with_out))
-
-                if out_path is None:
-                    raise RuntimeError("Generator did not return an output path.")
+            # encoded in memory and uploaded from there, no temp file to clean up
+            gen_func = functools.partial(to_terminal.generate_glyph_png, **gen_kwargs, output="buffer")
+            image = await loop.run_in_executor(None, gen_func)
         except Exception as exc:
             log.exception("Generation failed")
             try:
@@ -263,7 +252,7 @@ class AddressView(discord.ui.View):
 
         try: #.\n||`{gen_kwargs}`||
             print(gen_kwargs)
-            await interaction.followup.send(content=f"Generated with glyphtable `{self.glyphtable}` and color `{self.color}`", file=discord.File(out_path, filename=os.path.basename(out_path)))
+            await interaction.followup.send(content=f"Generated with glyphtable `{self.glyphtable}` and color `{self.color}`", file=discord.File(image, filename=image.name))
         except Exception as exc:
             log.exception("Failed to send followup")
             try:
@@ -271,11 +260,6 @@ class AddressView(discord.ui.View):
             except Exception:
                 pass
         finally:
-            try:
-                if out_path and os.path.exists(out_path):
-                    os.remove(out_path)
-            except Exception:
-                log.warning("Could not remove temp file %s", out_path)
             self.stop()
 
 # ---------- Slash command (application command) ----------
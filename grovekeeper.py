@@ -4,6 +4,7 @@ from discord import app_commands
 import json
 import sys
 import os
+import io
 from datetime import datetime
 
 import Components
@@ -11,12 +12,21 @@ import Components.engine
 import Components.loaders
 import Components.generators
 import Components.grove
-
-saved_maps = Components.loaders.SavedMaps().maps
-saved_colors = Components.loaders.SavedColors().maps
-saved_glyphs = Components.loaders.SavedGlyphs().maps
-
-GROVEFLOORS = Components.grove.GroveFloors()
+import Components.pool
+import Components.profiles
+import Components.timing
+
+# Renders run in worker processes (see Components/pool.py), each loading its own assets
+POOL_SIZE = int(os.environ.get('GROVE_POOL_SIZE', 2))
+POOL_RECYCLE = int(os.environ.get('GROVE_POOL_RECYCLE', 50)) # jobs per worker before it is replaced
+CACHE_DIR = os.environ.get('GROVE_CACHE_DIR', os.path.join(os.getcwd(), 'cache', 'renders')) # '' disables the render cache
+PROFILE = (os.environ.get('GROVE_PROFILE', 'discord') or None) # see Components/profiles.py, '' for the original full size PNG
+# Render stage timings (Components/timing.py): a JSON line per render, Prometheus text to a file and/or port
+TIMING_LOG = (os.environ.get('GROVE_TIMING_LOG', '1') == '1')
+METRICS_FILE = os.environ.get('GROVE_METRICS_FILE', '')
+METRICS_PORT = int(os.environ.get('GROVE_METRICS_PORT', 0))
+
+RENDER_POOL:Components.pool.RenderPool = None
 
 __version__ = 'v1.0.1'
 
@@ -69,20 +79,12 @@ async def dream(ctx:commands.context.Context, level):
 
     seed=Components.engine.NewRandomSeed()
 
-    generated, png_buffer = Components.grove.FromSeed(
-        Gf=GROVEFLOORS,
-        level=level,
-        seed=seed,
-        saved_maps=saved_maps,
-        saved_colors=saved_colors,
-        saved_glyphs=saved_glyphs
-    )
+    # awaits the worker, the event loop keeps serving everyone else meanwhile
+    generated, png_bytes = await RENDER_POOL.render(level=int(level), seed=seed)
     GENERATION_NAME = generated['generation_name']
-    Components.loaders.print_progress_bar(98, 100, GENERATION_NAME, str(len(png_buffer.getvalue())))
+    Components.loaders.print_progress_bar(98, 100, GENERATION_NAME, (Components.profiles.describe(generated['output']) if 'output' in generated else str(len(png_bytes))))
 
-    with png_buffer as buffer:
-        buffer.seek(0)
-        discord_buffer = discord.File(fp=buffer, filename=GENERATION_NAME+'.png')
+    discord_buffer = discord.File(fp=io.BytesIO(png_bytes), filename=GENERATION_NAME+Components.profiles.suffix(PROFILE))
 
     embed = def_reply_embed.copy()
     embed.title = GENERATION_NAME
@@ -99,4 +101,14 @@ async def dream(ctx:commands.context.Context, level):
 
     Components.loaders.print_progress_bar(100, 100, GENERATION_NAME, 'Sent to Discord')
 
-client.run(TOKEN)
\ No newline at end of file
+if __name__ == "__main__":
+    # spawned render workers re-import this module, only the parent runs the bot
+    if TIMING_LOG:
+        Components.timing.SINKS.append(Components.timing.LogSink())
+    if METRICS_FILE:
+        Components.timing.SINKS.append(Components.timing.PrometheusFileSink(METRICS_FILE))
+    if METRICS_PORT:
+        Components.timing.serve_prometheus(METRICS_PORT)
+    RENDER_POOL = Components.pool.RenderPool(size=POOL_SIZE, max_jobs=POOL_RECYCLE, cache_dir=(CACHE_DIR if CACHE_DIR else None), profile=PROFILE)
+    RENDER_POOL.warm()
+    client.run(TOKEN)
\ No newline at end of file
@@ -1,9 +1,20 @@
 import uuid
+import functools
 import numpy as np
 import os
+import sys
 from Components.loaders import SavedColors, SavedGlyphs
+from Components import profiles
 
 # --- Utility Functions ---
+@functools.lru_cache(maxsize=4096)
+def _char_value(c):
+    """Heightmap value of one UUID character (digits as is, letters from A=3)."""
+    if c.isdigit():
+        return int(c)
+    v = ord(c.upper()) - ord('A') + 10
+    return (v - 7 if v >= 10 else v)
+
 def uuid_to_heightmap(uuid_str, rows=3, cols=8):
     """
     Convert a UUID string to a heightmap array of shape (rows, cols).
@@ -12,33 +23,96 @@ def uuid_to_heightmap(uuid_str, rows=3, cols=8):
     import random
     parts = str(uuid_str).split('-')
     chars = ''.join(parts[1:])
-    vals = []
-    for c in chars:
-        if c.isdigit():
-            vals.append(int(c))
-        else:
-            v = ord(c.upper()) - ord('A') + 10
-            vals.append(v - 7 if v >= 10 else v)
     total = rows * cols
+    vals = [_char_value(c) for c in chars[:total]]
     if len(vals) < total:
         seed_val = sum([ord(x) for x in str(uuid_str)])
-        random.seed(seed_val)
-        vals += [random.randint(0,9) for _ in range(total - len(vals))]
+        rng = random.Random(seed_val) # per call, the global generator is not thread-safe
+        vals += [rng.randint(0,9) for _ in range(total - len(vals))]
     vals = vals[:total]
     arr = np.array(vals).reshape((rows, cols))
     return arr
 
 # ANSI color helpers for terminal output
-def ansi_color(rgb):
-    """Return ANSI escape code for background color from hex string."""
+# 'truecolor' is 24-bit escapes, '256' the xterm palette for terminals without truecolor
+COLOR_MODES = ('truecolor', '256')
+
+def detect_color_mode():
+    """
+    'truecolor', as always, unless the terminal clearly lacks it: COLORTERM does not
+    advertise it and TERM names neither 256 nor direct colors ('xterm', 'screen', 'vt100').
+    Many truecolor terminals and tmux leave COLORTERM unset, so that alone is not enough.
+    """
+    if os.environ.get('COLORTERM', '').lower() in ('truecolor', '24bit'):
+        return 'truecolor'
+    term = os.environ.get('TERM', '').lower()
+    if term and not any(tag in term for tag in ('256color', 'direct', 'truecolor', '24bit')):
+        return '256'
+    return 'truecolor'
+
+def hex_to_rgb(rgb):
     if rgb.startswith('#'):
         rgb = rgb[1:]
-    r, g, b = int(rgb[0:2],16), int(rgb[2:4],16), int(rgb[4:6],16)
+    return int(rgb[0:2],16), int(rgb[2:4],16), int(rgb[4:6],16)
+
+# Channel levels of the xterm 6x6x6 color cube (indices 16-231)
+CUBE_LEVELS = (0, 95, 135, 175, 215, 255)
+
+def rgb_to_256(r, g, b):
+    """Nearest xterm-256 color index, from the 6x6x6 cube or the 24 step gray ramp."""
+    cube = [min(range(6), key=lambda k: abs(CUBE_LEVELS[k] - c)) for c in (r, g, b)]
+    cube_rgb = [CUBE_LEVELS[k] for k in cube]
+    gray = min(23, max(0, round((r + g + b) / 3 - 8) // 10))
+    gray_rgb = [8 + 10 * gray] * 3
+    distance = lambda other: sum((a - c) ** 2 for a, c in zip(other, (r, g, b)))
+    if distance(gray_rgb) < distance(cube_rgb):
+        return 232 + gray
+    return 16 + 36 * cube[0] + 6 * cube[1] + cube[2]
+
+def ansi_color(rgb, mode='truecolor'):
+    """Return ANSI escape code for background color from hex string."""
+    r, g, b = hex_to_rgb(rgb)
+    if mode == '256':
+        return f"\033[48;5;{rgb_to_256(r, g, b)}m"
     return f"\033[48;2;{r};{g};{b}m"
 
 def reset_color():
     return "\033[0m"
 
+class PatternRenderer:
+    """
+    Terminal frames for one glyph -> color map. The escape sequence of every glyph's cell
+    is built once, a frame is one join over the grid and is written with a single write.
+    """
+
+    def __init__(self, glyph_color_map, mode='truecolor'):
+
+        if mode not in COLOR_MODES:
+            raise ValueError(f'Unknown color mode {mode}, expected one of {COLOR_MODES}')
+        self.mode = mode
+        self.cells = {
+            symbol: f"{ansi_color(color, mode)}\033[30m {symbol}  {reset_color()}"
+            for symbol, color in glyph_color_map.items()
+        }
+
+        pass
+
+    def frame(self, arr_glyphs, uuid_str, just_glyphs=False):
+        """The text print_pattern prints for a grid."""
+        cells = self.cells
+        rows = '\n'.join(''.join([cells[symbol] for symbol in row]) for row in arr_glyphs.tolist())
+        head = ('\n\n' if just_glyphs else '\nGenerated Pattern:\n')
+        return f"{head}{rows}\n\nUUID: {uuid_str}\n\n"
+
+    def write(self, arr_glyphs, uuid_str, stream=None, just_glyphs=False):
+        (stream or sys.stdout).write(self.frame(arr_glyphs, uuid_str, just_glyphs))
+
+def display_uuid(uuid_full, shorten_uuid=None):
+    """The UUID as shown under a pattern, 'PTR-' and the first `shorten_uuid` alphanumerics when shortened."""
+    if shorten_uuid:
+        return 'PTR-' + ''.join([c.upper() for c in uuid_full if c.isalnum()])[:shorten_uuid]
+    return uuid_full
+
 # --- Glyph Grid Construction ---
 def build_glyph_grid(arr, glyphs, glyph_values=None):
     """
@@ -62,10 +136,7 @@ def build_glyph_grid(arr, glyphs, glyph_values=None):
             else:
                 grid.flat[i] = random.choice(glyphs)
     else:
-        for i in range(rows):
-            for j in range(cols):
-                idx = arr[i, j] % len(glyphs)
-                grid[i, j] = glyphs[idx]
+        grid[:] = np.asarray(list(glyphs))[arr % len(glyphs)]
     return grid
 
 # --- Color Assignment ---
@@ -74,7 +145,8 @@ def assign_glyph_colors(glyphs, color_list, color_values=None, seed=None):
     Assign a color to each glyph, optionally using color_values string.
     """
     import random
-    available_colors = color_list.copy()
+    rng = random.Random() # per call, the global generator is not thread-safe
+    available_colors = list(color_list)
     glyph_color_map = {}
     if color_values:
         values = [c for c in color_values if c.isalnum()]
@@ -89,51 +161,76 @@ def assign_glyph_colors(glyphs, color_list, color_values=None, seed=None):
                 glyph_color_map[glyph] = available_colors[idx]
             else:
                 if seed is not None:
-                    random.seed(seed + str(i))
-                random.shuffle(available_colors)
+                    rng.seed(seed + str(i))
+                rng.shuffle(available_colors)
                 glyph_color_map[glyph] = available_colors[i % len(available_colors)]
     else:
         if seed is not None:
-            random.seed(seed)
-        random.shuffle(available_colors)
+            rng.seed(seed)
+        rng.shuffle(available_colors)
         for i, glyph in enumerate(glyphs):
             glyph_color_map[glyph] = available_colors[i % len(available_colors)]
     return glyph_color_map
 
 # --- Terminal Output ---
-def print_pattern(arr_glyphs, glyph_color_map, colors, uuid_str, just_glyphs=False):
+def print_pattern(arr_glyphs, glyph_color_map, colors, uuid_str, just_glyphs=False, mode='truecolor'):
     """
     Print the glyph grid to the terminal with colored backgrounds.
     """
-    if not just_glyphs:
-        print("\nGenerated Pattern:")
-    else:
-        print('\n')
-    for i in range(arr_glyphs.shape[0]):
-        row = ""
-        for j in range(arr_glyphs.shape[1]):
-            symbol = arr_glyphs[i, j]
-            color = glyph_color_map[symbol]
-            row += f"{ansi_color(color)}\033[30m {symbol}  {reset_color()}"
-        print(row)
-    print(f"\nUUID: {uuid_str}\n")
+    PatternRenderer(glyph_color_map, mode).write(arr_glyphs, uuid_str, just_glyphs=just_glyphs)
+    sys.stdout.flush()
+
+def stream_patterns(lines, glyphs, glyph_color_map, rows=3, cols=8, glyph_values=None, shorten_uuid=None, just_glyphs=False, mode='truecolor', stream=None, batch=64):
+    """
+    Print the pattern of every UUID in `lines` (e.g. sys.stdin), reusing one renderer.
+    Frames are written `batch` at a time; returns the number of patterns printed.
+    """
+    renderer = PatternRenderer(glyph_color_map, mode)
+    stream = (stream or sys.stdout)
+    frames = []
+    count = 0
+    for line in lines:
+        uuid_full = line.strip()
+        if not uuid_full:
+            continue
+        arr = uuid_to_heightmap(uuid_full, rows=rows, cols=cols)
+        arr_glyphs = build_glyph_grid(arr, glyphs, glyph_values=glyph_values)
+        frames.append(renderer.frame(arr_glyphs, display_uuid(uuid_full, shorten_uuid), just_glyphs))
+        count += 1
+        if len(frames) >= batch:
+            stream.write(''.join(frames))
+            stream.flush()
+            frames.clear()
+    if frames:
+        stream.write(''.join(frames))
+    stream.flush()
+    return count
 
 # --- PNG Export ---
-def export_png(arr_glyphs, font_path, font_size, colors, uuid_str, glyph_color_map, out_path):
+# 'matplotlib' draws a text per glyph, 'paths' one collection of cached glyph outlines (Components/fonts.py)
+PNG_BACKENDS = ('matplotlib', 'paths')
+
+def render_png(arr_glyphs, font_path, font_size, colors, uuid_str, glyph_color_map, profile=None, format='png', backend='matplotlib'):
     """
-    Export the glyph grid as a PNG image with transparent background.
+    Render the glyph grid with a transparent background and return (encoded bytes, report).
+    With `profile` (see Components/profiles.py) the image is sized and encoded by it and
+    the report is its encode report, otherwise it is a 150 dpi `format` image and None.
+    The font is loaded once per process (`fonts.FONTS`), whichever the `backend`, and glyphs
+    it lacks are drawn with their resolved fallback font.
     """
-    import matplotlib.pyplot as plt
+    import io
     import matplotlib.patches as mpatches
-    import matplotlib.font_manager as fm
+    from Components import fonts
+    from Components.figures import new_figure
+    if backend not in PNG_BACKENDS:
+        raise ValueError(f'Unknown backend {backend}, expected one of {PNG_BACKENDS}')
     rows, cols = arr_glyphs.shape
-    fig, ax = plt.subplots(figsize=(cols, rows+1))
+    fig, ax = new_figure((cols, rows+1)) # no pyplot, safe to call from threads
     fig.patch.set_alpha(0)
     ax.set_xlim(0, cols)
     ax.set_ylim(0, rows+1)
     ax.axis('off')
     ax.set_facecolor('none')
-    font_properties = fm.FontProperties(fname=font_path) if font_path else None
     # Draw colored rectangles and glyphs
     for i in range(rows):
         for j in range(cols):
@@ -141,11 +238,143 @@ def export_png(arr_glyphs, font_path, font_size, colors, uuid_str, glyph_color_m
             color = glyph_color_map[symbol]
             rect = mpatches.Rectangle((j, rows-i-0.5), 1, 1, color=color)
             ax.add_patch(rect)
-            ax.text(j+0.5, rows-i, symbol, ha='center', va='center', color='black', fontsize=font_size, fontproperties=font_properties)
+            if backend == 'matplotlib':
+                font_properties = fonts.FONTS.properties(fonts.FONTS.resolve(symbol, font_path))
+                ax.text(j+0.5, rows-i, symbol, ha='center', va='center', color='black', fontsize=font_size, fontproperties=font_properties)
+    if backend == 'paths':
+        fonts.glyph_collection(ax, np.ravel(arr_glyphs), [(j+0.5, rows-i) for i in range(rows) for j in range(cols)], font_path=font_path, size=font_size)
     # Add UUID at the bottom
     ax.text(cols/2, 0.15, uuid_str, ha='center', va='center', color='gray', fontsize=18)
-    plt.savefig(out_path, bbox_inches='tight', dpi=150, transparent=True)
-    plt.close(fig)
+    if profile:
+        profile = profiles.get_profile(profile)
+        dpi = profile.render_dpi((cols, rows+1), 150)
+        return profiles.encode(profiles.to_image(fig, dpi, transparent=True), profile, dpi)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=format, bbox_inches='tight', dpi=150, transparent=True)
+    return buffer.getvalue(), None
+
+def export_png(arr_glyphs, font_path, font_size, colors, uuid_str, glyph_color_map, out_path, profile=None, backend='matplotlib'):
+    """
+    Export the glyph grid as a PNG image with transparent background (see `render_png`).
+    With `profile` the encode report is returned.
+    """
+    format = (os.path.splitext(str(out_path))[1][1:] or 'png')
+    data, report = render_png(arr_glyphs, font_path, font_size, colors, uuid_str, glyph_color_map, profile=profile, format=format, backend=backend)
+    with open(out_path, 'wb') as file:
+        file.write(data)
+    return report
+
+# --- Batch Minting ---
+MANIFEST_NAME = 'manifest.jsonl'
+UUIDS_NAME = 'uuids.txt'
+
+# Worker-local assets, loaded once per process by _mint_warm
+_MINT = {}
+
+def _mint_warm(fontdir=None):
+    """Worker initializer: load the colors and glyphtables once for every card the worker renders."""
+    import matplotlib
+    matplotlib.use('Agg')
+    _MINT['saved_colors'] = SavedColors().maps
+    _MINT['saved_glyphs'] = (SavedGlyphs(fontdir=fontdir, coverage='index').maps if fontdir else SavedGlyphs(coverage='index').maps)
+
+def mint_card(uuid_full, out_dir, glyphtable=None, cmap=None, profile=None, **kwargs):
+    """
+    Render the card of one UUID into `out_dir` and return its manifest record.
+    A glyphtable or colormap left as None is picked at random, seeded by the UUID, so a
+    resumed batch picks the same ones. `kwargs` go to `generate_glyph_png`.
+    """
+    import time
+    import random
+    if not _MINT:
+        _mint_warm()
+    start = time.perf_counter()
+    rng = random.Random(uuid_full)
+    glyphtable = (glyphtable if glyphtable else rng.choice(sorted(_MINT['saved_glyphs'])))
+    cmap = (cmap if cmap else rng.choice(sorted(_MINT['saved_colors'])))
+    data = generate_glyph_png(glyphtable, cmap, passed_uuid=uuid_full, profile=profile, output='bytes', **kwargs, **_MINT)
+
+    name = f"{uuid_full}{profiles.suffix(profile)}"
+    path = os.path.join(out_dir, name)
+    with open(path + '.tmp', 'wb') as file:
+        file.write(data)
+    os.replace(path + '.tmp', path) # a card on disk is always complete
+    return {'uuid': uuid_full, 'file': name, 'glyphtable': glyphtable, 'cmap': cmap, 'bytes': len(data), 'seconds': round(time.perf_counter() - start, 4)}
+
+def read_manifest(out_dir):
+    """Manifest records of `out_dir` whose card file exists, by UUID."""
+    import json
+    records = {}
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='UTF-8') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue # a line cut short by an interruption
+                if os.path.exists(os.path.join(out_dir, record['file'])):
+                    records[record['uuid']] = record
+    return records
+
+def mint_cards(uuids, out_dir, workers=None, fontdir=None, **card_kwargs):
+    """
+    Render a card per UUID into `out_dir` across `workers` processes (default: one per CPU),
+    each loading the assets once. Every finished card is appended to `out_dir`/manifest.jsonl,
+    and UUIDs already in it are skipped, so an interrupted batch resumes where it stopped.
+    Returns a summary with the cards per second.
+    """
+    import json
+    import time
+    import functools
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    os.makedirs(out_dir, exist_ok=True)
+    done = read_manifest(out_dir)
+    todo = [u for u in dict.fromkeys(str(u) for u in uuids) if u not in done]
+    workers = (workers if workers else os.cpu_count())
+    summary = {'requested': len(todo) + len(done), 'skipped': len(done), 'minted': 0, 'seconds': 0.0, 'cards_per_second': 0.0}
+    if not todo:
+        return summary
+
+    start = time.perf_counter()
+    reported = start
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=_mint_warm, initargs=(fontdir,))
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME), 'a', encoding='UTF-8') as manifest:
+            chunksize = max(1, min(16, len(todo) // (workers * 4)))
+            for record in executor.map(functools.partial(mint_card, out_dir=out_dir, **card_kwargs), todo, chunksize=chunksize):
+                manifest.write(json.dumps(record) + '\n')
+                manifest.flush()
+                summary['minted'] += 1
+                now = time.perf_counter()
+                if now - reported >= 1.0:
+                    reported = now
+                    print(f"{summary['minted']}/{len(todo)} cards, {summary['minted'] / (now - start):.1f} cards/s", flush=True)
+    except KeyboardInterrupt:
+        print(f"Interrupted after {summary['minted']} cards, run again to resume")
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+    summary['seconds'] = round(time.perf_counter() - start, 3)
+    summary['cards_per_second'] = round(summary['minted'] / summary['seconds'], 2)
+    return summary
+
+def batch_uuids(out_dir, count):
+    """`count` UUIDs for a batch, kept in `out_dir`/uuids.txt so a rerun resumes the same ones."""
+    path = os.path.join(out_dir, UUIDS_NAME)
+    uuids = []
+    if os.path.exists(path):
+        with open(path, 'r', encoding='UTF-8') as file:
+            uuids = [line.strip() for line in file if line.strip()]
+    if len(uuids) < count:
+        uuids += [str(uuid.uuid4()) for _ in range(count - len(uuids))]
+        os.makedirs(out_dir, exist_ok=True)
+        with open(path, 'w', encoding='UTF-8') as file:
+            file.write('\n'.join(uuids) + '\n')
+    return uuids[:count]
 
 # --- Main Execution ---
 if __name__ == "__main__":
@@ -163,11 +392,36 @@ if __name__ == "__main__":
     parser.add_argument('--fsize', type=int, help='Manually specify the font size of the glyphs for PNG export')
     parser.add_argument('--glyph_values', type=str, help='String of base16 values to control which glyph is used in each cell')
     parser.add_argument('--color_values', type=str, help='String of values (0-9, A-F) to control glyph colors')
+    parser.add_argument('--profile', type=str, choices=list(profiles.PROFILES), help='Output profile for PNG export (size and codec)')
+    parser.add_argument('--backend', type=str, default='matplotlib', choices=PNG_BACKENDS, help='How glyphs are drawn for PNG export (default: matplotlib, paths is faster)')
+    parser.add_argument('--color-mode', type=str, choices=COLOR_MODES, help='Terminal colors (default: truecolor, 256 when TERM names neither 256 nor direct colors)')
+    parser.add_argument('--stdin', action='store_true', help='Print a pattern for every UUID read from stdin, one per line')
+    parser.add_argument('--count', type=int, help='Batch: mint this many cards with new UUIDs into --out-dir')
+    parser.add_argument('--uuids-file', type=str, help='Batch: mint a card for every UUID in this file, one per line')
+    parser.add_argument('--out-dir', type=str, default=os.path.join('output', 'cards'), help='Batch: output directory, with manifest.jsonl (default: output/cards)')
+    parser.add_argument('--workers', type=int, help='Batch: worker processes (default: one per CPU)')
     args = parser.parse_args()
+    color_mode = (args.color_mode if args.color_mode else detect_color_mode())
+
+    if args.count or args.uuids_file:
+        # glyphtable and colormap are random per card (seeded by its UUID) unless given
+        if args.uuids_file:
+            with open(args.uuids_file, 'r', encoding='UTF-8') as file:
+                batch = [line.strip() for line in file if line.strip()]
+        else:
+            batch = batch_uuids(args.out_dir, args.count)
+        SavedGlyphs().maps # reports glyph coverage once, the workers index it quietly
+        summary = mint_cards(batch, args.out_dir, workers=args.workers, glyphtable=args.glyphtable, cmap=args.cmap,
+                             seed=args.seed, rows=args.rows, cols=args.cols, shorten_uuid=args.shorten_uuid, fsize=args.fsize,
+                             glyph_values=args.glyph_values, color_values=args.color_values, profile=args.profile, backend=args.backend)
+        print(f"{summary['minted']} cards minted, {summary['skipped']} already done, "
+              f"{summary['seconds']}s ({summary['cards_per_second']} cards/s) -> {args.out_dir}")
+        sys.exit(0)
 
     # Load resources
     saved_colors = SavedColors().maps
-    saved_glyphs = SavedGlyphs().maps
+    # glyph coverage only matters (and is reported) when rendering images
+    saved_glyphs = SavedGlyphs(coverage=('report' if args.out else None)).maps
 
     # Glyphtable selection
     if args.glyphtable and args.glyphtable in saved_glyphs:
@@ -183,15 +437,20 @@ if __name__ == "__main__":
         color_name = list(saved_colors.keys())[0]
     color_list = saved_colors[color_name]
 
+    if args.stdin:
+        # colors are assigned once for the whole stream
+        glyph_color_map = assign_glyph_colors(glyphs, color_list, color_values=args.color_values, seed=args.seed)
+        stream_patterns(sys.stdin, glyphs, glyph_color_map, rows=args.rows, cols=args.cols, glyph_values=args.glyph_values,
+                        shorten_uuid=args.shorten_uuid, just_glyphs=args.just_glyphtable, mode=color_mode,
+                        batch=(1 if sys.stdin.isatty() else 64))
+        sys.exit(0)
+
     # UUID handling
     if args.uuid:
         uuid_full = args.uuid
     else:
         uuid_full = str(uuid.uuid4())
-    if args.shorten_uuid:
-        uuid_str = 'PTR-' + ''.join([c.upper() for c in uuid_full if c.isalnum()])[:args.shorten_uuid]
-    else:
-        uuid_str = uuid_full
+    uuid_str = display_uuid(uuid_full, args.shorten_uuid)
 
     # Build heightmap and glyph grid
     arr = uuid_to_heightmap(uuid_full, rows=args.rows, cols=args.cols)
@@ -202,14 +461,19 @@ if __name__ == "__main__":
 
     # Print only glyphtable if requested
     if args.just_glyphtable:
-        print_pattern(arr_glyphs, glyph_color_map, color_list, uuid_str, just_glyphs=True)
+        print_pattern(arr_glyphs, glyph_color_map, color_list, uuid_str, just_glyphs=True, mode=color_mode)
     else:
-        print_pattern(arr_glyphs, glyph_color_map, color_list, uuid_str)
+        print_pattern(arr_glyphs, glyph_color_map, color_list, uuid_str, mode=color_mode)
 
     # Export PNG if requested
     if args.out:
         font_size = args.fsize if args.fsize else default_font_size
-        export_png(arr_glyphs, font_path, font_size, color_list, uuid_str, glyph_color_map, args.out)
+        report = export_png(arr_glyphs, font_path, font_size, color_list, uuid_str, glyph_color_map, args.out, profile=args.profile, backend=args.backend)
+        if report:
+            print(profiles.describe(report))
+
+# What generate_glyph_png can return
+GLYPH_OUTPUTS = ('path', 'bytes', 'buffer')
 
 def generate_glyph_png(
     glyphtable,
@@ -222,14 +486,33 @@ def generate_glyph_png(
     fsize=None,
     glyph_values=None,
     color_values=None,
-    out_path=None
+    out_path=None,
+    profile=None,
+    output='path',
+    saved_colors=None,
+    saved_glyphs=None,
+    backend='matplotlib',
+    report:dict=None
 ):
     """
     Generate a PNG image using the same logic as CLI, for Discord bot integration.
-    Returns the path to the generated PNG file.
+
+    `output` picks what is returned:
+        'path'   - the path of the written file, `out_path` or /tmp/glyph_<uuid>.png (the default)
+        'bytes'  - the encoded image
+        'buffer' - an io.BytesIO of it, its `name` is the file name to upload it as
+    With 'bytes' or 'buffer' nothing touches the filesystem unless `out_path` is given.
+    The image is PNG or the `profile`'s format (see Components/profiles.py).
+
+    `saved_colors`/`saved_glyphs` are loaded when not passed (see `mint_cards` for batches).
+    `backend` is passed to `render_png`. Pass a dict as `report` to have it filled with
+    the profile's encode report (size, bytes, encode time; see `profiles.describe`).
     """
-    saved_colors = SavedColors().maps
-    saved_glyphs = SavedGlyphs().maps
+    if output not in GLYPH_OUTPUTS:
+        raise ValueError(f'Unknown output {output}, expected one of {GLYPH_OUTPUTS}')
+
+    saved_colors = (saved_colors if saved_colors is not None else SavedColors().maps)
+    saved_glyphs = (saved_glyphs if saved_glyphs is not None else SavedGlyphs().maps)
 
     # Glyphtable selection
     if glyphtable and glyphtable in saved_glyphs:
@@ -250,10 +533,7 @@ def generate_glyph_png(
         uuid_full = passed_uuid
     else:
         uuid_full = str(uuid.uuid4())
-    if shorten_uuid:
-        uuid_str = 'PTR-' + ''.join([c.upper() for c in uuid_full if c.isalnum()])[:shorten_uuid]
-    else:
-        uuid_str = uuid_full
+    uuid_str = display_uuid(uuid_full, shorten_uuid)
 
     # Build heightmap and glyph grid
     arr = uuid_to_heightmap(uuid_full, rows=rows, cols=cols)
@@ -265,8 +545,20 @@ def generate_glyph_png(
     # Font size
     font_size = fsize if fsize else default_font_size
 
-    # Output path
-    if not out_path:
-        out_path = f"/tmp/glyph_{uuid_str}.png"
-    export_png(arr_glyphs, font_path, font_size, color_list, uuid_str, glyph_color_map, out_path)
+    if output == 'path' and not out_path:
+        out_path = f"/tmp/glyph_{uuid_str}{profiles.suffix(profile)}"
+    data, encoded = render_png(arr_glyphs, font_path, font_size, color_list, uuid_str, glyph_color_map, profile=profile, backend=backend)
+    if report is not None and encoded:
+        report.update(encoded)
+    if out_path:
+        with open(out_path, 'wb') as file:
+            file.write(data)
+
+    if output == 'bytes':
+        return data
+    if output == 'buffer':
+        import io
+        buffer = io.BytesIO(data)
+        buffer.name = f"glyph_{uuid_str}{profiles.suffix(profile)}"
+        return buffer
     return out_path